@@ -0,0 +1,239 @@
+"""Modo *pushdown*: los conteos que necesita ``analizador`` se calculan en el motor SQL.
+
+En lugar de traer todas las filas y contar en Python, se lanzan unas pocas
+consultas de agregados (frecuencia, última aparición y primer/último día por
+número, pares, tríos, boliyapa, resumen por sorteo y conteos por mes). Lo
+transferido está acotado por el número de bolas y de meses (≤ C(45, 3) filas
+en el peor caso), no por el largo del histórico.
+
+El motor es enchufable: ``backend_snowflake`` para el despliegue real y
+``backend_sqlite``/``backend_duckdb`` como sustitutos locales.
+"""
+from __future__ import annotations
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+import time
+import numpy as np
+import pandas as pd
+
+from config import TABLE_NAME, TOTAL_NUMBERS, LAST_N_WINDOWS
+from utils import is_prime
+from analizador import (
+    Coocurrencias,
+    _frecuencias_desde_conteos,
+    _resumen_coocurrencias,
+    _resumen_boliyapa,
+    _chicuadrado_desde_conteos,
+)
+
+
+@dataclass
+class Backend:
+    """Motor SQL: dialecto, tabla de resultados y una función ``sql -> DataFrame``."""
+    dialecto: str
+    tabla: str
+    ejecutar: Callable[[str], pd.DataFrame]
+
+    def consultar(self, sql: str) -> pd.DataFrame:
+        df = self.ejecutar(sql)
+        df.columns = [str(c).lower() for c in df.columns]
+        return df
+
+
+def backend_snowflake(session=None) -> Backend:
+    from db_connector import get_snowflake_session, _snowflake_table
+    session = session or get_snowflake_session()
+    return Backend("snowflake", _snowflake_table(), lambda sql: session.sql(sql).to_pandas())
+
+
+def backend_sqlite(conn, tabla: str = TABLE_NAME) -> Backend:
+    """``conn`` es una conexión ``sqlite3`` (o cualquiera que acepte ``pd.read_sql_query``)."""
+    return Backend("sqlite", tabla, lambda sql: pd.read_sql_query(sql, conn))
+
+
+def backend_duckdb(conn, tabla: str = TABLE_NAME) -> Backend:
+    return Backend("duckdb", tabla, lambda sql: conn.execute(sql).df())
+
+
+# Una fila por (sorteo, número). ``orden`` es la posición base 1 del sorteo en
+# el histórico (mismo orden que ``SQL_BASE``); los tokens no numéricos se
+# descartan como en ``utils.parse_numbers``.
+_BOLAS = {
+    "snowflake": """bolas AS (
+    SELECT DISTINCT s.orden, TRY_TO_NUMBER(TRIM(f.value)) AS numero
+    FROM sorteos s, LATERAL SPLIT_TO_TABLE(REPLACE(s.numeros, ',', ' '), ' ') f
+    WHERE TRY_TO_NUMBER(TRIM(f.value)) >= 1
+)""",
+    "duckdb": """bolas AS (
+    SELECT DISTINCT orden, TRY_CAST(token AS INTEGER) AS numero
+    FROM (SELECT orden, UNNEST(STRING_SPLIT(REPLACE(numeros, ',', ' '), ' ')) AS token FROM sorteos)
+    WHERE TRY_CAST(token AS INTEGER) >= 1
+)""",
+    "sqlite": """partes(orden, resto, token) AS (
+    SELECT orden, REPLACE(numeros, ',', ' ') || ' ', '' FROM sorteos
+    UNION ALL
+    SELECT orden, SUBSTR(resto, INSTR(resto, ' ') + 1), SUBSTR(resto, 1, INSTR(resto, ' ') - 1)
+    FROM partes WHERE resto <> ''
+),
+bolas AS (
+    SELECT DISTINCT orden, CAST(token AS INTEGER) AS numero
+    FROM partes
+    WHERE token <> '' AND token NOT GLOB '*[^0-9]*' AND CAST(token AS INTEGER) >= 1
+)""",
+}
+
+
+# Día (entero, época 1970), año y mes de ``fecha_sorteo`` por dialecto.
+_FECHA = {
+    "snowflake": ("DATEDIFF(day, '1970-01-01'::DATE, fecha_sorteo::DATE)",
+                  "YEAR(fecha_sorteo)", "MONTH(fecha_sorteo)"),
+    "duckdb": ("DATE_DIFF('day', DATE '1970-01-01', CAST(fecha_sorteo AS DATE))",
+               "YEAR(CAST(fecha_sorteo AS DATE))", "MONTH(CAST(fecha_sorteo AS DATE))"),
+    "sqlite": ("CAST(JULIANDAY(fecha_sorteo) - 2440587.5 AS INTEGER)",
+               "CAST(STRFTIME('%Y', fecha_sorteo) AS INTEGER)", "CAST(STRFTIME('%m', fecha_sorteo) AS INTEGER)"),
+}
+
+
+def _con(backend: Backend, consulta: str) -> str:
+    recursivo = "RECURSIVE " if backend.dialecto == "sqlite" else ""
+    dia, anio, mes = _FECHA[backend.dialecto]
+    return f"""WITH {recursivo}sorteos AS (
+    SELECT ROW_NUMBER() OVER (ORDER BY fecha_sorteo ASC, id_sorteo ASC) AS orden, numeros, boliyapa,
+           {dia} AS dia, {anio} AS anio, {mes} AS mes
+    FROM {backend.tabla}
+    WHERE numeros IS NOT NULL AND numeros <> ''
+),
+{_BOLAS[backend.dialecto]}
+{consulta}"""
+
+
+def _sql_numeros(windows: List[int]) -> str:
+    ventanas = "".join(f",\n       SUM(CASE WHEN b.orden > t.n - {int(w)} THEN 1 ELSE 0 END) AS v_{int(w)}"
+                       for w in windows)
+    return f"""SELECT b.numero, COUNT(*) AS freq, MAX(b.orden) AS ultima,
+       COUNT(s.dia) AS con_fecha, MIN(s.dia) AS primer_dia, MAX(s.dia) AS ultimo_dia{ventanas}
+FROM bolas b JOIN sorteos s ON s.orden = b.orden CROSS JOIN (SELECT COUNT(*) AS n FROM sorteos) t
+GROUP BY b.numero"""
+
+
+_SQL_SORTEOS = "SELECT COUNT(*) AS n FROM sorteos"
+_SQL_PARES = """SELECT a.numero AS a, b.numero AS b, COUNT(*) AS freq, MIN(a.orden) AS primera
+FROM bolas a JOIN bolas b ON a.orden = b.orden AND a.numero < b.numero
+GROUP BY a.numero, b.numero"""
+_SQL_TRIOS = """SELECT a.numero AS a, b.numero AS b, c.numero AS c, COUNT(*) AS freq, MIN(a.orden) AS primera
+FROM bolas a
+JOIN bolas b ON a.orden = b.orden AND a.numero < b.numero
+JOIN bolas c ON b.orden = c.orden AND b.numero < c.numero
+GROUP BY a.numero, b.numero, c.numero"""
+_SQL_BOLIYAPA = """SELECT boliyapa, COUNT(*) AS freq
+FROM sorteos WHERE boliyapa > 0
+GROUP BY boliyapa"""
+# Suma y rango (máx − mín) de cada sorteo, resumidos; ``huecos`` = Σ(k − 1).
+_SQL_POR_SORTEO = """SELECT MIN(suma) AS suma_min, MAX(suma) AS suma_max, AVG(suma) AS suma_prom,
+       SUM(rango) AS rango_total, SUM(huecos) AS huecos
+FROM (SELECT s.orden, COALESCE(SUM(b.numero), 0) AS suma,
+             COALESCE(MAX(b.numero) - MIN(b.numero), 0) AS rango,
+             CASE WHEN COUNT(b.numero) > 1 THEN COUNT(b.numero) - 1 ELSE 0 END AS huecos
+      FROM sorteos s LEFT JOIN bolas b ON b.orden = s.orden
+      GROUP BY s.orden) x"""
+_SQL_POR_MES = """SELECT s.anio, s.mes, b.numero, COUNT(*) AS freq
+FROM bolas b JOIN sorteos s ON s.orden = b.orden
+WHERE s.anio IS NOT NULL
+GROUP BY s.anio, s.mes, b.numero
+ORDER BY s.anio, s.mes, b.numero"""
+
+
+def _simetrico(valores: np.ndarray, idx: List[np.ndarray], forma, relleno) -> np.ndarray:
+    """Tensor indexado por número con ``valores`` en todas las permutaciones de ``idx``."""
+    out = np.full(forma, relleno, dtype=np.int64)
+    if len(idx) == 2:
+        perms = [(0, 1), (1, 0)]
+    else:
+        perms = [(0, 1, 2), (0, 2, 1), (1, 0, 2), (1, 2, 0), (2, 0, 1), (2, 1, 0)]
+    for p in perms:
+        out[tuple(idx[i] for i in p)] = valores
+    return out
+
+
+def analisis_pushdown(backend: Optional[Backend] = None, windows: Optional[List[int]] = None) -> Dict:
+    """``analizador.analisis_completo`` (mismas claves y valores) desde agregados SQL.
+
+    La UI, la exportación JSON y el reporte HTML lo consumen igual;
+    ``transferencia`` resume filas traídas y tiempo.
+    """
+    t0 = time.perf_counter()
+    backend = backend or backend_snowflake()
+    windows = [int(w) for w in (windows or LAST_N_WINDOWS)]
+
+    n = int(backend.consultar(_con(backend, _SQL_SORTEOS)).iloc[0]["n"])
+    nums = backend.consultar(_con(backend, _sql_numeros(windows)))
+    pares = backend.consultar(_con(backend, _SQL_PARES))
+    trios = backend.consultar(_con(backend, _SQL_TRIOS))
+    bol = backend.consultar(_con(backend, _SQL_BOLIYAPA))
+    por_sorteo = backend.consultar(_con(backend, _SQL_POR_SORTEO)).iloc[0]
+    por_mes = backend.consultar(_con(backend, _SQL_POR_MES))
+
+    numero = nums["numero"].to_numpy(dtype=np.int64)
+    ancho = max([TOTAL_NUMBERS] + numero.tolist())
+    cnt = np.zeros(ancho + 1, dtype=np.int64)
+    ultima = np.zeros(ancho + 1, dtype=np.int64)
+    cnt[numero] = nums["freq"].to_numpy(dtype=np.int64)
+    ultima[numero] = nums["ultima"].to_numpy(dtype=np.int64)
+
+    # Mismo cálculo que ``WindowIndex.frecuencias`` a partir de la última aparición global.
+    def _frecuencias(w: Optional[int]) -> Dict:
+        i = 0 if w is None else max(0, n - w)
+        conteos = cnt.copy()
+        if w is not None:
+            conteos[numero] = nums[f"v_{w}"].to_numpy(dtype=np.int64)
+        racha = ultima[1:] > max(i, n - 10)
+        return _frecuencias_desde_conteos(conteos, n - i, racha, np.maximum(ultima[1:] - i, 0))
+
+    base = ancho + 1
+
+    def cols(df: pd.DataFrame, nombres: str) -> List[np.ndarray]:
+        return [df[x].to_numpy(dtype=np.intp) for x in nombres]
+
+    m_pares = _simetrico(pares["freq"].to_numpy(dtype=np.int64), cols(pares, "ab"), (base, base), 0)
+    m_pares[numero, numero] = cnt[numero]
+    p_pares = _simetrico(pares["primera"].to_numpy(dtype=np.int64) - 1, cols(pares, "ab"), (base, base), n)
+    m_trios = _simetrico(trios["freq"].to_numpy(dtype=np.int64), cols(trios, "abc"), (base,) * 3, 0)
+    p_trios = _simetrico(trios["primera"].to_numpy(dtype=np.int64) - 1, cols(trios, "abc"), (base,) * 3, n)
+    cooc = Coocurrencias.from_counts(m_pares, m_trios, p_pares, p_trios)
+
+    # Media de gaps en días = (último − primer día) / (apariciones con fecha − 1), como ``_motor_gaps``.
+    dias = {int(r.numero): (r.con_fecha, r.primer_dia, r.ultimo_dia) for r in nums.itertuples()}
+    gaps = {}
+    for x in range(1, TOTAL_NUMBERS + 1):
+        c, d0, d1 = dias.get(x, (0, None, None))
+        gaps[x] = float((d1 - d0) / (c - 1)) if c >= 2 and not pd.isna(d0) else None
+
+    # Patrones: paridad, rangos y primos salen de las frecuencias; consecutivos de los pares.
+    x = np.arange(len(cnt))
+    consecutivos = int(pares.loc[pares["b"] == pares["a"] + 1, "freq"].sum()) if len(pares) else 0
+    huecos = int(por_sorteo["huecos"] or 0)
+    patrones = {'pares': int(cnt[x % 2 == 0].sum()), 'impares': int(cnt[x % 2 == 1].sum()),
+                'rangos': {f"{a}-{a + 8}": int(cnt[a:min(a + 9, TOTAL_NUMBERS + 1)].sum())
+                           for a in range(1, TOTAL_NUMBERS + 1, 9)},
+                'suma_min': int(por_sorteo["suma_min"]) if n else None,
+                'suma_max': int(por_sorteo["suma_max"]) if n else None,
+                'suma_prom': float(por_sorteo["suma_prom"]) if n else None,
+                'consecutivos_total': consecutivos,
+                'dist_prom': float(por_sorteo["rango_total"]) / huecos if huecos else None,
+                'primos_total': int(sum(int(c) for k, c in enumerate(cnt.tolist()) if c and is_prime(k))),
+                'total_combinaciones': n}
+
+    return {'frecuencias': _frecuencias(None),
+            'temporal': {'por_mes': [{'anio': int(a), 'mes': int(m), 'numero': int(k), 'freq': int(f)}
+                                     for a, m, k, f in por_mes[["anio", "mes", "numero", "freq"]].itertuples(index=False)],
+                         'gaps_prom_dias': gaps,
+                         'ventanas': {str(w): _frecuencias(w) for w in windows}},
+            'patrones': patrones,
+            'coocurrencias': _resumen_coocurrencias(cooc),
+            'boliyapa': _resumen_boliyapa(Counter(dict(zip(bol["boliyapa"].astype(int).tolist(),
+                                                               bol["freq"].astype(int).tolist())))),
+            'chi_cuadrado': _chicuadrado_desde_conteos(cnt),
+            'transferencia': {'sorteos': n,
+                              'filas': 2 + len(nums) + len(pares) + len(trios) + len(bol) + len(por_mes),
+                              'tiempo_s': time.perf_counter() - t0}}
@@ -1,82 +1,223 @@
 """Lógica de análisis estadístico para Tinka/Boliyapa."""
 from __future__ import annotations
-from typing import Dict, List, Tuple
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 import numpy as np
 import pandas as pd
 from itertools import combinations
 from collections import Counter
 from config import TOTAL_NUMBERS, COMBINATION_SIZE, LAST_N_WINDOWS, SUM_RANGE
-from utils import parse_numbers, is_prime
-
-def _explode_numeros(df: pd.DataFrame) -> pd.DataFrame:
-    rows = []
-    for _, r in df.iterrows():
-        nums = parse_numbers(r['numeros'])
-        for n in nums:
-            rows.append({'id_sorteo': r['id_sorteo'], 'fecha_sorteo': r['fecha_sorteo'], 'numero': n})
-    return pd.DataFrame(rows, columns=['id_sorteo','fecha_sorteo','numero'])
-
-def _coocurrencias(df: pd.DataFrame, k: int = 2):
-    cnt = Counter()
-    for _, r in df.iterrows():
-        arr = sorted(parse_numbers(r['numeros']))
-        for combo in combinations(arr, k):
-            cnt[combo] += 1
-    return cnt
-
-def _ultimos(df: pd.DataFrame, n: int):
-    return df.tail(n) if len(df) >= n else df.copy()
-
-def analisis_frecuencias(df: pd.DataFrame) -> Dict:
-    exploded = _explode_numeros(df)
-    freq_abs = Counter(exploded['numero'].tolist())
-    for k in range(1, TOTAL_NUMBERS+1):
-        freq_abs.setdefault(k, 0)
-    total_bolas = len(exploded)
-    freq_rel = {k: (v/total_bolas if total_bolas else 0.0) for k, v in freq_abs.items()}
-    top = sorted(freq_abs.items(), key=lambda x: (-x[1], x[0]))
-    hot = [k for k,_ in top[:15]]
-    cold = [k for k,_ in sorted(freq_abs.items(), key=lambda x: (x[1], x[0]))[:15]]
-    ult10 = set(_explode_numeros(_ultimos(df, 10))['numero'].tolist())
+from utils import is_prime
+from matriz import DrawMatrix, Sorteos, as_draw_matrix
+from espacio import todas_combinaciones
+
+def _explode_numeros(dm: DrawMatrix) -> pd.DataFrame:
+    fila, col = np.nonzero(dm.numeros)
+    return pd.DataFrame({'id_sorteo': dm.id_sorteo[fila],
+                         'fecha_sorteo': dm.fecha_sorteo[fila],
+                         'numero': dm.numeros[fila, col].astype(int)},
+                        columns=['id_sorteo','fecha_sorteo','numero'])
+
+def _ultima_aparicion(inc: np.ndarray) -> np.ndarray:
+    """Índice (base 1) del último sorteo en que salió cada número; 0 si nunca salió."""
+    if len(inc) == 0:
+        return np.zeros(inc.shape[1], dtype=np.int64)
+    rev = inc[::-1]
+    return np.where(rev.any(axis=0), len(inc) - rev.argmax(axis=0), 0)
+
+def _frecuencias_desde_conteos(cnt: np.ndarray, n_sorteos: int, racha: np.ndarray,
+                               last_seen: np.ndarray) -> Dict:
+    """Arma el dict de ``analisis_frecuencias`` a partir de los vectores del motor.
+
+    ``cnt`` va indexado por número (posición 0 sin uso); ``racha`` y
+    ``last_seen`` van indexados por columna de la matriz de incidencia.
+    """
+    keys = np.arange(len(cnt))
+    keys = keys[(keys >= 1) & ((keys <= TOTAL_NUMBERS) | (cnt > 0))]
+    vals = cnt[keys]
+    total_bolas = int(vals.sum())
+    hot = keys[np.lexsort((keys, -vals))[:15]]
+    cold = keys[np.lexsort((keys, vals))[:15]]
     # dormidos: no aparecen hace >20 sorteos
-    last_seen_idx = {}
-    for idx, r in enumerate(df.itertuples(index=False), start=1):
-        for n in parse_numbers(r.numeros):
-            last_seen_idx[n] = idx
-    dormidos = []
-    threshold = max(1, len(df) - 20)
+    threshold = max(1, n_sorteos - 20)
+    dormidos = np.flatnonzero(last_seen[:TOTAL_NUMBERS] < threshold) + 1
+    claves, valores = keys.tolist(), vals.tolist()
+    return {'freq_abs': dict(zip(claves, valores)),
+            'freq_rel': {k: (v/total_bolas if total_bolas else 0.0) for k, v in zip(claves, valores)},
+            'hot_15': hot.tolist(),
+            'cold_15': cold.tolist(),
+            'en_racha_ult10': (np.flatnonzero(racha) + 1).tolist(),
+            'dormidos_mas20': dormidos.tolist()}
+
+def analisis_frecuencias(df: Sorteos) -> Dict:
+    dm = as_draw_matrix(df)
+    return _frecuencias_desde_conteos(dm.conteos(), len(dm),
+                                      dm.incidencia[-10:].any(axis=0),
+                                      _ultima_aparicion(dm.incidencia))
+
+@dataclass
+class WindowIndex:
+    """Conteos acumulados (n_sorteos+1 × n_numeros) para consultar cualquier ventana.
+
+    La frecuencia de cada número en los sorteos ``[i, j)`` es
+    ``acumulado[j] - acumulado[i]``; ``ultima[j]`` guarda, por número, el
+    índice (base 1) de su última aparición dentro de los primeros ``j``
+    sorteos, con lo que dormidos y rachas de la ventana salen sin recorrerla.
+    """
+    acumulado: np.ndarray
+    ultima: np.ndarray
+
+    @classmethod
+    def from_draws(cls, df: Sorteos) -> "WindowIndex":
+        inc = as_draw_matrix(df).incidencia
+        n, w = inc.shape
+        acumulado = np.zeros((n + 1, w), dtype=np.int32)
+        np.cumsum(inc, axis=0, out=acumulado[1:])
+        ultima = np.zeros((n + 1, w), dtype=np.int32)
+        pos = np.where(inc, np.arange(1, n + 1, dtype=np.int32)[:, None], 0)
+        np.maximum.accumulate(pos, axis=0, out=ultima[1:])
+        return cls(acumulado, ultima)
+
+    def __len__(self) -> int:
+        return len(self.acumulado) - 1
+
+    def _limites(self, i: Optional[int], j: Optional[int]) -> Tuple[int, int]:
+        i, j, _ = slice(i, j).indices(len(self))
+        return i, max(i, j)
+
+    def conteos(self, i: Optional[int] = None, j: Optional[int] = None) -> np.ndarray:
+        """Apariciones por número en ``[i, j)`` (índice = número, posición 0 sin uso)."""
+        i, j = self._limites(i, j)
+        return np.r_[0, self.acumulado[j] - self.acumulado[i]]
+
+    def frecuencias(self, i: Optional[int] = None, j: Optional[int] = None) -> Dict:
+        """``analisis_frecuencias`` de los sorteos ``[i, j)`` en O(n_numeros)."""
+        i, j = self._limites(i, j)
+        racha = self.acumulado[j] - self.acumulado[max(i, j - 10)] > 0
+        last_seen = np.maximum(self.ultima[j].astype(np.int64) - i, 0)
+        return _frecuencias_desde_conteos(self.conteos(i, j), j - i, racha, last_seen)
+
+    def ultimos(self, n: int) -> Dict:
+        return self.frecuencias(max(0, len(self) - n), len(self))
+
+    def serie(self, win: int, step: int = 1) -> np.ndarray:
+        """Conteos de cada número en todas las ventanas ``[s, s+win)`` (paso ``step``).
+
+        Devuelve una matriz (n_ventanas × n_numeros); la fila ``r`` es la
+        ventana que empieza en el sorteo ``r * step``.
+        """
+        inicios = np.arange(0, max(0, len(self) - win) + 1, step)
+        fines = np.minimum(inicios + win, len(self))
+        return self.acumulado[fines] - self.acumulado[inicios]
+
+def _por_grupo(grupo: np.ndarray, valores: np.ndarray, w: int) -> Dict[str, np.ndarray]:
+    """Media, mediana, máximo e histograma de ``valores`` agrupados por columna."""
+    cnt = np.bincount(grupo, minlength=w)
+    orden = np.lexsort((valores, grupo))
+    ordenados = valores[orden]
+    inicio = np.r_[0, np.cumsum(cnt)[:-1]]
+    con = cnt > 0
+    media = np.full(w, np.nan)
+    mediana = np.full(w, np.nan)
+    maximo = np.full(w, -1, dtype=np.int64)
+    media[con] = np.bincount(grupo, weights=valores, minlength=w)[con] / cnt[con]
+    mediana[con] = (ordenados[inicio[con] + (cnt[con] - 1) // 2] + ordenados[inicio[con] + cnt[con] // 2]) / 2
+    maximo[con] = ordenados[inicio[con] + cnt[con] - 1]
+    alto = int(valores.max()) + 1 if len(valores) else 1
+    hist = np.bincount(grupo * alto + valores, minlength=w * alto).reshape(w, alto)
+    return {'media': media, 'mediana': mediana, 'max': maximo, 'hist': hist}
+
+def _motor_gaps(dm: DrawMatrix) -> Dict[str, np.ndarray]:
+    """Gaps entre apariciones consecutivas de cada número, en sorteos y en días.
+
+    Una sola pasada sobre la incidencia traspuesta: ``np.nonzero`` devuelve
+    las apariciones ordenadas por número y luego por sorteo, de modo que los
+    gaps son las diferencias dentro de cada grupo. Se asume el orden
+    cronológico de ``SQL_BASE``; la media en días usa (última − primera) /
+    (k − 1), igual que la media de las diferencias de fechas ordenadas.
+    Las métricas en días sólo miran los sorteos con fecha (los ``NaT`` se
+    descartan); las de sorteos, todos.
+    """
+    n, w = dm.incidencia.shape
+    col, fila = np.nonzero(dm.incidencia.T)
+    apariciones = np.bincount(col, minlength=w)
+    misma = col[1:] == col[:-1]
+    sorteos = _por_grupo(col[1:][misma], np.diff(fila)[misma], w)
+
+    fechas = dm.fecha_sorteo.astype('datetime64[D]')
+    con_fecha = ~np.isnat(fechas)
+    dias = fechas[con_fecha].astype(np.int64)  # sólo sorteos con fecha, en orden
+    inc_d = dm.incidencia[con_fecha]
+    col_d, fila_d = np.nonzero(inc_d.T)
+    apariciones_d = np.bincount(col_d, minlength=w)
+    misma = col_d[1:] == col_d[:-1]
+    en_dias = _por_grupo(col_d[1:][misma], np.diff(dias[fila_d])[misma], w)
+    con = apariciones_d > 0
+    inicio = np.r_[0, np.cumsum(apariciones_d)[:-1]][con]
+    media_dias = np.full(w, np.nan)
+    varias = apariciones_d[con] >= 2
+    if varias.any():
+        extremos = dias[fila_d]
+        rango = np.maximum.reduceat(extremos, inicio) - np.minimum.reduceat(extremos, inicio)
+        media_dias[np.flatnonzero(con)[varias]] = rango[varias] / (apariciones_d[con][varias] - 1)
+    ultima = _ultima_aparicion(dm.incidencia)
+    actual = np.where(ultima > 0, n - ultima, -1)
+    ultima_d = _ultima_aparicion(inc_d)
+    actual_dias = np.full(w, -1, dtype=np.int64)
+    if len(dias):
+        actual_dias[ultima_d > 0] = dias[-1] - dias[ultima_d[ultima_d > 0] - 1]
+    return {'apariciones': apariciones, 'sorteos': sorteos, 'dias': en_dias,
+            'media_dias': media_dias, 'actual': actual, 'actual_dias': actual_dias}
+
+def analisis_gaps(df: Sorteos) -> Dict:
+    """Gaps por número (media, mediana, máximo y actual) en sorteos y días, con histogramas.
+
+    ``gap_actual`` cuenta los sorteos transcurridos desde la última aparición
+    (0 si salió en el último sorteo); los valores son ``None`` cuando no hay
+    suficientes apariciones.
+    """
+    dm = as_draw_matrix(df)
+    motor = _motor_gaps(dm)
+
+    def _val(x, entero=False):
+        if (isinstance(x, float) and np.isnan(x)) or x < 0:
+            return None
+        return int(x) if entero else float(x)
+
+    por_numero, hist_s, hist_d = {}, {}, {}
     for n in range(1, TOTAL_NUMBERS+1):
-        if last_seen_idx.get(n, 0) < threshold:
-            dormidos.append(n)
-    return {'freq_abs': dict(sorted(freq_abs.items())),
-            'freq_rel': dict(sorted(freq_rel.items())),
-            'hot_15': hot,
-            'cold_15': cold,
-            'en_racha_ult10': sorted(ult10),
-            'dormidos_mas20': sorted(dormidos)}
-
-def analisis_temporal(df: pd.DataFrame) -> Dict:
-    exploded = _explode_numeros(df)
+        c = n - 1
+        s_, d_ = motor['sorteos'], motor['dias']
+        por_numero[n] = {'apariciones': int(motor['apariciones'][c]),
+                         'gap_medio': _val(s_['media'][c]),
+                         'gap_mediano': _val(s_['mediana'][c]),
+                         'gap_max': _val(s_['max'][c], True),
+                         'gap_actual': _val(motor['actual'][c], True),
+                         'gap_medio_dias': _val(motor['media_dias'][c]),
+                         'gap_mediano_dias': _val(d_['mediana'][c]),
+                         'gap_max_dias': _val(d_['max'][c], True),
+                         'gap_actual_dias': _val(motor['actual_dias'][c], True)}
+        hist_s[n] = {int(g): int(k) for g, k in enumerate(s_['hist'][c]) if k}
+        hist_d[n] = {int(g): int(k) for g, k in enumerate(d_['hist'][c]) if k}
+    return {'por_numero': por_numero, 'histograma_sorteos': hist_s, 'histograma_dias': hist_d}
+
+def analisis_temporal(df: Sorteos, windows: Optional[List[int]] = None) -> Dict:
+    dm = as_draw_matrix(df)
+    exploded = _explode_numeros(dm)
     tmp = exploded.copy()
     tmp['fecha_sorteo'] = pd.to_datetime(tmp['fecha_sorteo'])
     tmp['anio'] = tmp['fecha_sorteo'].dt.year
     tmp['mes'] = tmp['fecha_sorteo'].dt.month
     by_mes = tmp.groupby(['anio','mes','numero']).size().reset_index(name='freq')
-    gaps = {}
-    for n in range(1, TOTAL_NUMBERS+1):
-        apar = tmp.loc[tmp['numero']==n, 'fecha_sorteo'].sort_values().tolist()
-        if len(apar) >= 2:
-            difs = [(apar[i]-apar[i-1]).days for i in range(1, len(apar))]
-            gaps[n] = float(np.mean(difs))
-        else:
-            gaps[n] = None
-    ventanas = {}
-    for win in LAST_N_WINDOWS:
-        sub = _ultimos(df, win)
-        ventanas[str(win)] = analisis_frecuencias(sub)
+    motor = _motor_gaps(dm)
+    gaps = {n: (None if np.isnan(motor['media_dias'][n-1]) else float(motor['media_dias'][n-1]))
+            for n in range(1, TOTAL_NUMBERS+1)}
+    index = WindowIndex.from_draws(dm)
+    ventanas = {str(win): index.ultimos(win) for win in (windows or LAST_N_WINDOWS)}
     return {'por_mes': by_mes.to_dict(orient='records'), 'gaps_prom_dias': gaps, 'ventanas': ventanas}
 
-def analisis_patrones(df: pd.DataFrame) -> Dict:
+def analisis_patrones(df: Sorteos) -> Dict:
+    dm = as_draw_matrix(df)
     even, odd = 0, 0
     ranges = {'1-9':0,'10-18':0,'19-27':0,'28-36':0,'37-45':0}
     suma_vals = []
@@ -84,8 +225,8 @@ def analisis_patrones(df: pd.DataFrame) -> Dict:
     distancias = []
     primos_cnt = 0
     total_combinaciones = 0
-    for _, r in df.iterrows():
-        arr = sorted(parse_numbers(r['numeros']))
+    for row in dm.numeros.tolist():
+        arr = [x for x in row if x]
         total_combinaciones += 1
         suma_vals.append(sum(arr))
         for x in arr:
@@ -108,30 +249,112 @@ def analisis_patrones(df: pd.DataFrame) -> Dict:
             'primos_total': int(primos_cnt),
             'total_combinaciones': total_combinaciones}
 
-def analisis_coocurrencias(df: pd.DataFrame) -> Dict:
-    pairs = _coocurrencias(df, k=2)
-    trios = _coocurrencias(df, k=3)
-    top_pairs = pairs.most_common(20)
-    top_trios = trios.most_common(20)
+def _primera_aparicion(dm: DrawMatrix, k: int) -> np.ndarray:
+    """Primer sorteo (índice base 0) en que salió cada k-combinación; ``len(dm)`` si nunca.
+
+    Se indexa con la combinación codificada en base ``n_numeros + 1``; sirve
+    para desempatar igual que ``Counter.most_common`` (orden de inserción).
+    """
+    base = dm.n_numeros + 1
+    pos = np.array(list(combinations(range(dm.numeros.shape[1]), k)), dtype=np.intp)
+    vals = dm.numeros[:, pos].astype(np.int64)                  # (n, C, k)
+    valid = (vals[..., 0] > 0) & np.all(np.diff(vals, axis=-1) > 0, axis=-1)
+    codes = (vals * base ** np.arange(k - 1, -1, -1)).sum(axis=-1)
+    rows = np.broadcast_to(np.arange(len(dm))[:, None], codes.shape)
+    first = np.full(base ** k, len(dm), dtype=np.int64)
+    np.minimum.at(first, codes[valid], rows[valid])
+    return first.reshape((base,) * k)
+
+def _tensor_trios(X: np.ndarray, chunk: int = 1024) -> np.ndarray:
+    """Σ_r x_r ⊗ x_r ⊗ x_r en bloques de sorteos (matmul por lotes)."""
+    w = X.shape[1]
+    out = np.zeros((w, w * w), dtype=np.float64)
+    for i in range(0, len(X), chunk):
+        xc = X[i:i + chunk].astype(np.float64)
+        out += xc.T @ (xc[:, :, None] * xc[:, None, :]).reshape(len(xc), w * w)
+    return np.rint(out).astype(np.int64).reshape(w, w, w)
+
+@dataclass
+class Coocurrencias:
+    """Conteos de pares/tríos indexados directamente por número (índice 0 sin uso).
+
+    ``pares`` es Xᵀ·X sobre la matriz de incidencia (la diagonal es la
+    frecuencia de cada número) y ``trios`` el tensor equivalente de orden 3.
+    """
+    pares: np.ndarray
+    trios: np.ndarray
+    primera_par: np.ndarray
+    primera_trio: np.ndarray
+    vecinos: np.ndarray
+
+    @classmethod
+    def from_draws(cls, df: Sorteos) -> "Coocurrencias":
+        dm = as_draw_matrix(df)
+        X = np.hstack([np.zeros((len(dm), 1), dtype=bool), dm.incidencia])
+        Xi = X.astype(np.int64)
+        return cls.from_counts(Xi.T @ Xi, _tensor_trios(X), _primera_aparicion(dm, 2),
+                               _primera_aparicion(dm, 3))
+
+    @classmethod
+    def from_counts(cls, pares: np.ndarray, trios: np.ndarray, primera_par: np.ndarray,
+                    primera_trio: np.ndarray) -> "Coocurrencias":
+        # Ranking precalculado de compañeros: companeros(n) es un slice.
+        fuera = pares.copy()
+        np.fill_diagonal(fuera, -1)
+        fuera[:, 0] = -1
+        nums = np.broadcast_to(np.arange(len(pares)), pares.shape)
+        vecinos = np.lexsort((nums, -fuera), axis=-1)
+        return cls(pares, trios, primera_par, primera_trio, vecinos)
+
+    @staticmethod
+    def _top_k(idx: Tuple[np.ndarray, ...], cnt: np.ndarray, first: np.ndarray, k: int):
+        sel = np.flatnonzero(cnt > 0)
+        if len(sel) > k:
+            kth = len(sel) - k
+            umbral = cnt[sel][np.argpartition(cnt[sel], kth)[kth]]
+            sel = sel[cnt[sel] >= umbral]
+        # Mismo orden que Counter.most_common: frecuencia, primera aparición, lexicográfico.
+        sel = sel[np.lexsort((sel, first[sel], -cnt[sel]))[:k]]
+        return [(tuple(int(a[i]) for a in idx), int(cnt[i])) for i in sel]
+
+    def top_pares(self, k: int = 20) -> List[Tuple[Tuple[int, int], int]]:
+        i, j = np.triu_indices(len(self.pares), 1)
+        return self._top_k((i, j), self.pares[i, j], self.primera_par[i, j], k)
+
+    def top_trios(self, k: int = 20) -> List[Tuple[Tuple[int, int, int], int]]:
+        i, j, l = todas_combinaciones(len(self.trios), 3).T.astype(np.intp)
+        return self._top_k((i, j, l), self.trios[i, j, l], self.primera_trio[i, j, l], k)
+
+    def companeros(self, n: int, k: int = 5) -> List[Tuple[int, int]]:
+        """Los ``k`` números que más veces salieron junto a ``n``."""
+        top = self.vecinos[n, :k]
+        return [(int(m), int(self.pares[n, m])) for m in top if m != n and self.pares[n, m] > 0]
+
+def analisis_coocurrencias(df: Sorteos) -> Dict:
+    return _resumen_coocurrencias(Coocurrencias.from_draws(df))
+
+def _resumen_coocurrencias(cooc: Coocurrencias) -> Dict:
+    top_pairs = cooc.top_pares(20)
+    top_trios = cooc.top_trios(20)
     return {'pairs_top20': [{'pair': list(k), 'freq': v} for k,v in top_pairs],
             'trios_top20': [{'trio': list(k), 'freq': v} for k,v in top_trios]}
 
-def analisis_boliyapa(df: pd.DataFrame) -> Dict:
-    bol = df['boliyapa'].dropna().astype(int).tolist()
-    cnt = Counter(bol)
-    total = len(bol)
+def analisis_boliyapa(df: Sorteos) -> Dict:
+    dm = as_draw_matrix(df)
+    return _resumen_boliyapa(Counter(dm.boliyapa[dm.boliyapa > 0].astype(int).tolist()))
+
+def _resumen_boliyapa(cnt: Counter) -> Dict:
+    total = sum(cnt.values())
     freq_rel = {k: (v/total if total else 0.0) for k,v in cnt.items()}
     return {'freq_abs': dict(sorted(cnt.items())),
             'freq_rel': dict(sorted(freq_rel.items()))}
 
-def analisis_chicuadrado(df: pd.DataFrame) -> Dict:
-    exploded = []
-    for _, r in df.iterrows():
-        exploded += parse_numbers(r['numeros'])
-    from collections import Counter
-    cnt = Counter(exploded)
-    import numpy as np
-    obs = np.array([cnt.get(i, 0) for i in range(1, TOTAL_NUMBERS+1)], dtype=float)
+def analisis_chicuadrado(df: Sorteos) -> Dict:
+    dm = as_draw_matrix(df)
+    return _chicuadrado_desde_conteos(dm.conteos())
+
+def _chicuadrado_desde_conteos(cnt: np.ndarray) -> Dict:
+    obs = np.asarray(cnt[1:TOTAL_NUMBERS+1], dtype=float)
     n = obs.sum()
     if n == 0:
         return {'chi2': None, 'p_value': None, 'expected': None}
@@ -147,10 +370,11 @@ def analisis_chicuadrado(df: pd.DataFrame) -> Dict:
     std_dev = float(np.std(obs))
     return {'chi2': float(chi2), 'p_value': p_value, 'std_freq': std_dev, 'expected_each': float(n / TOTAL_NUMBERS)}
 
-def analisis_completo(df: pd.DataFrame) -> Dict:
-    return {'frecuencias': analisis_frecuencias(df),
-            'temporal': analisis_temporal(df),
-            'patrones': analisis_patrones(df),
-            'coocurrencias': analisis_coocurrencias(df),
-            'boliyapa': analisis_boliyapa(df),
-            'chi_cuadrado': analisis_chicuadrado(df)}
+def analisis_completo(df: Sorteos) -> Dict:
+    dm = as_draw_matrix(df)
+    return {'frecuencias': analisis_frecuencias(dm),
+            'temporal': analisis_temporal(dm),
+            'patrones': analisis_patrones(dm),
+            'coocurrencias': analisis_coocurrencias(dm),
+            'boliyapa': analisis_boliyapa(dm),
+            'chi_cuadrado': analisis_chicuadrado(dm)}
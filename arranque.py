@@ -0,0 +1,107 @@
+"""Benchmark de arranque del CLI: desglose de ``import main`` y tiempo hasta el menú.
+
+Uso::
+
+    python arranque.py            # imprime el desglose y sale con 1 si excede el presupuesto
+    python arranque.py --json
+
+Las dependencias pesadas (matplotlib, Snowpark, SQLAlchemy, Streamlit) se
+cargan bajo demanda; si ``import main`` llega a importarlas, el chequeo falla.
+"""
+from __future__ import annotations
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+import json
+import subprocess
+import sys
+import time
+
+from config import ARRANQUE_IMPORT_S, ARRANQUE_MENU_S
+
+BASE = Path(__file__).resolve().parent
+PESADOS = ("matplotlib", "snowflake", "sqlalchemy", "streamlit")
+
+
+def _python(*args: str, entrada: str = "", **kw) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], input=entrada, capture_output=True, text=True,
+                          cwd=BASE, **kw)
+
+
+def desglose_import(modulo: str = "main") -> Dict:
+    """``python -X importtime -c 'import <modulo>'`` agrupado por paquete de primer nivel.
+
+    ``paquetes`` es el tiempo acumulado (s) de cada paquete importado
+    directamente; ``total_s`` el de ``modulo`` completo.
+    """
+    res = _python("-X", "importtime", "-c", f"import {modulo}")
+    if res.returncode != 0:
+        raise RuntimeError(res.stderr.strip().splitlines()[-1] if res.stderr.strip() else "import falló")
+    paquetes: Dict[str, float] = defaultdict(float)
+    cargados, total = set(), 0.0
+    for linea in res.stderr.splitlines():
+        if not linea.startswith("import time:") or "|" not in linea:
+            continue
+        _, acumulado, nombre = linea.split("|")
+        if not acumulado.strip().isdigit():  # cabecera
+            continue
+        profundidad = (len(nombre) - len(nombre.lstrip())) // 2
+        nombre = nombre.strip()
+        cargados.add(nombre.split(".")[0])
+        if nombre == modulo:
+            total = int(acumulado) / 1e6
+        elif profundidad == 1:
+            paquetes[nombre.split(".")[0]] += int(acumulado) / 1e6
+    return {"total_s": total,
+            "paquetes": dict(sorted(paquetes.items(), key=lambda kv: -kv[1])),
+            "pesados": sorted(p for p in PESADOS if p in cargados)}
+
+
+def tiempo_menu(repeticiones: int = 3, timeout: float = 60.0) -> Dict:
+    """Mejor tiempo (s) de ``python main.py`` hasta imprimir el menú y salir con ``0``.
+
+    Sin datos en caché el CLI termina antes del menú; eso se informa en ``menu``.
+    """
+    tiempos: List[float] = []
+    menu = False
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        res = _python("main.py", entrada="0\n", timeout=timeout)
+        tiempos.append(time.perf_counter() - t0)
+        menu = "Menú:" in res.stdout
+    return {"mejor_s": min(tiempos), "tiempos_s": tiempos, "menu": menu}
+
+
+def verificar() -> Dict:
+    imp = desglose_import()
+    menu = tiempo_menu()
+    fallos = []
+    if imp["total_s"] > ARRANQUE_IMPORT_S:
+        fallos.append(f"import main {imp['total_s']:.3f}s > {ARRANQUE_IMPORT_S}s")
+    if menu["mejor_s"] > ARRANQUE_MENU_S:
+        fallos.append(f"hasta el menú {menu['mejor_s']:.3f}s > {ARRANQUE_MENU_S}s")
+    if imp["pesados"]:
+        fallos.append("import main carga " + ", ".join(imp["pesados"]))
+    return {"import": imp, "menu": menu,
+            "presupuesto": {"import_s": ARRANQUE_IMPORT_S, "menu_s": ARRANQUE_MENU_S},
+            "fallos": fallos}
+
+
+def main(argv: List[str]) -> int:
+    res = verificar()
+    if "--json" in argv:
+        print(json.dumps(res, ensure_ascii=False, indent=2))
+    else:
+        imp, menu = res["import"], res["menu"]
+        print(f"import main: {imp['total_s']:.3f}s (presupuesto {ARRANQUE_IMPORT_S}s)")
+        for nombre, s in list(imp["paquetes"].items())[:12]:
+            print(f"  {nombre:<24} {s:7.3f}s")
+        estado = "" if menu["menu"] else "  [sin datos: el CLI salió antes del menú]"
+        print(f"hasta el menú: {menu['mejor_s']:.3f}s (presupuesto {ARRANQUE_MENU_S}s){estado}")
+        for f in res["fallos"]:
+            print(f"FALLA: {f}")
+    return 1 if res["fallos"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
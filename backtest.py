@@ -0,0 +1,155 @@
+"""Backtest walk-forward de las estrategias y del score ML sobre el histórico."""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from math import comb
+from typing import Dict, List, Optional, Sequence
+import os
+import time
+import warnings
+import numpy as np
+
+from config import TOTAL_NUMBERS, COMBINATION_SIZE
+from matriz import Sorteos, as_draw_matrix
+from estado import AnalysisState
+from generador import (
+    GeneracionIncompleta,
+    estrategia_frecuencia_pura,
+    estrategia_equilibrio_hot_cold,
+    estrategia_temporal_inteligente,
+    estrategia_patrones_detectados,
+    estrategia_random_ponderado,
+    top_combos_ml_exacto,
+)
+from ml import blend_probabilities, thompson_sampling_batch
+from mascaras import codificar, mascaras_sorteos, popcount
+
+ESTRATEGIAS = ("frecuencia_pura", "equilibrio_hot_cold", "temporal_inteligente",
+               "patrones_detectados", "random_ponderado", "ml_exacto", "thompson", "azar")
+
+
+def tickets_estrategia(nombre: str, estado: AnalysisState, n: int, rng: np.random.Generator, params: Dict,
+                       previos: Optional[Dict] = None) -> List[List[int]]:
+    """Los ``n`` tickets que la estrategia ``nombre`` (de ``ESTRATEGIAS``) juega con ``estado``.
+
+    ``params`` lleva los priors y el peso reciente del score ML (como en
+    ``backtest``). ``previos`` guarda los tickets del sorteo anterior; el top
+    ML exacto los usa como cota inicial (un sorteo más apenas mueve las
+    probabilidades).
+    """
+    previos = previos if previos is not None else {}
+    if nombre == "azar":
+        return (np.argsort(rng.random((n, TOTAL_NUMBERS)), axis=1)[:, :COMBINATION_SIZE] + 1).tolist()
+    if nombre in ("ml_exacto", "thompson"):
+        reciente = estado.posteriors_ewma(prior_strength=params["prior_reciente"])
+        if nombre == "thompson":
+            return thompson_sampling_batch(reciente, n, k=COMBINATION_SIZE, rng=rng).tolist()
+        probs = blend_probabilities(estado.posteriors(prior_strength=params["prior_global"]), reciente,
+                                    w_recent=params["w_recent"])
+        return [c for c, _ in top_combos_ml_exacto(probs, top_n=n, semilla_pool=10,
+                                                    candidatas=previos.get(nombre))]
+    frec = estado.frecuencias()
+    if nombre == "frecuencia_pura":
+        return estrategia_frecuencia_pura(frec['freq_abs'], n, rng)
+    if nombre == "equilibrio_hot_cold":
+        return estrategia_equilibrio_hot_cold(frec['freq_abs'], frec['hot_15'], frec['cold_15'], n, rng)
+    if nombre == "random_ponderado":
+        return estrategia_random_ponderado(frec['freq_abs'], n, rng)
+    if nombre == "temporal_inteligente":
+        last50 = estado.frecuencias(50)
+        return estrategia_temporal_inteligente(last50['freq_abs'], last50['hot_15'], n, rng)
+    cooc = estado.resumen_coocurrencias()
+    return estrategia_patrones_detectados(cooc['pairs_top20'], cooc['trios_top20'], n, rng)
+
+
+def _evaluar_tramo(df: Sorteos, inicio: int, fin: int, estrategias: Sequence[str], n_tickets: int,
+                   semillas: List[np.random.SeedSequence], params: Dict) -> np.ndarray:
+    """Aciertos (fin-inicio × estrategias × n_tickets) de los sorteos ``[inicio, fin)``.
+
+    El estado se construye una vez con los sorteos anteriores a ``inicio`` y
+    luego avanza sorteo a sorteo con ``add_draw`` (sin reajustes).
+    """
+    dm = as_draw_matrix(df)
+    estado = AnalysisState.from_draws(dm[:inicio], halflife_draws=params["halflife_draws"])
+    sorteos = mascaras_sorteos(dm)
+    out = np.full((fin - inicio, len(estrategias), n_tickets), -1, dtype=np.int8)
+    previos: Dict[str, List[List[int]]] = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", GeneracionIncompleta)
+        for t in range(inicio, fin):
+            rngs = [np.random.default_rng(s) for s in semillas[t - inicio].spawn(len(estrategias))]
+            for e, nombre in enumerate(estrategias):
+                previos[nombre] = tickets_estrategia(nombre, estado, n_tickets, rngs[e], params, previos)
+                if previos[nombre]:
+                    tk = codificar(previos[nombre])
+                    out[t - inicio, e, :len(tk)] = popcount(tk & sorteos[t])
+            estado.add_draw(dm.numeros[t], fecha=dm.fecha_sorteo[t], boliyapa=int(dm.boliyapa[t]),
+                            id_sorteo=int(dm.id_sorteo[t]))
+    return out
+
+
+def distribucion_azar(k: int = COMBINATION_SIZE, n: int = TOTAL_NUMBERS) -> List[float]:
+    """Probabilidad hipergeométrica de 0..k aciertos para un ticket al azar."""
+    return [comb(k, a) * comb(n - k, k - a) / comb(n, k) for a in range(k + 1)]
+
+
+def backtest(df: Sorteos, estrategias: Sequence[str] = ESTRATEGIAS, n_tickets: int = 10,
+             inicio: int = 100, seed: Optional[int] = None, workers: Optional[int] = None,
+             halflife_draws: int = 50, prior_global: float = 30.0, prior_reciente: float = 15.0,
+             w_recent: float = 0.30) -> Dict:
+    """Walk-forward: para cada sorteo ``t >= inicio`` cada estrategia juega ``n_tickets``
+    generados sólo con los sorteos ``< t`` y se cuentan sus aciertos contra ``t``.
+
+    Los tramos de sorteos se reparten entre procesos; cada sorteo tiene su
+    semilla hija (``SeedSequence(seed).spawn``), así que el resultado no
+    depende de ``workers``. Devuelve la distribución de aciertos (0..6) por
+    estrategia, la media, la tasa de 3+ aciertos y la referencia teórica del azar.
+    """
+    t0 = time.perf_counter()
+    dm = as_draw_matrix(df)
+    estrategias = [e for e in estrategias if e in ESTRATEGIAS]
+    inicio = min(max(1, inicio), len(dm))
+    params = {"halflife_draws": halflife_draws, "prior_global": prior_global,
+              "prior_reciente": prior_reciente, "w_recent": w_recent}
+    ss = np.random.SeedSequence(seed)
+    semillas = ss.spawn(len(dm) - inicio)
+
+    workers = min(os.cpu_count() or 1, max(1, (len(dm) - inicio) // 50)) if workers is None else max(1, workers)
+    cortes = np.linspace(inicio, len(dm), workers + 1).astype(int)
+    tramos = [(int(a), int(b)) for a, b in zip(cortes[:-1], cortes[1:]) if b > a]
+    partes = None
+    if len(tramos) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=len(tramos)) as ex:
+                futuros = [ex.submit(_evaluar_tramo, dm, a, b, estrategias, n_tickets,
+                                     semillas[a - inicio:b - inicio], params) for a, b in tramos]
+                partes = [f.result() for f in futuros]
+        except (OSError, RuntimeError):  # sin multiproceso disponible: en línea
+            partes = None
+    if partes is None:
+        partes = [_evaluar_tramo(dm, a, b, estrategias, n_tickets, semillas[a - inicio:b - inicio], params)
+                  for a, b in tramos]
+    aciertos = np.concatenate(partes) if partes else np.zeros((0, len(estrategias), n_tickets), dtype=np.int8)
+
+    resumen = {}
+    for e, nombre in enumerate(estrategias):
+        a = aciertos[:, e, :]
+        a = a[a >= 0]
+        dist = np.bincount(a, minlength=COMBINATION_SIZE + 1)
+        resumen[nombre] = {'tickets': int(a.size),
+                           'distribucion': dist.tolist(),
+                           'media_aciertos': float(a.mean()) if a.size else None,
+                           'tasa_3_o_mas': float((a >= 3).mean()) if a.size else None,
+                           'max_aciertos': int(a.max()) if a.size else None}
+    azar = distribucion_azar()
+    return {'sorteos_evaluados': len(dm) - inicio,
+            'desde_sorteo': inicio,
+            'tickets_por_sorteo': n_tickets,
+            'seed': ss.entropy,
+            'parametros': params,
+            'estrategias': resumen,
+            'azar_teorico': {'distribucion': azar,
+                             'media_aciertos': COMBINATION_SIZE * COMBINATION_SIZE / TOTAL_NUMBERS,
+                             'tasa_3_o_mas': float(sum(azar[3:]))},
+            'aciertos': aciertos,
+            'workers': len(tramos),
+            'tiempo_s': time.perf_counter() - t0}
@@ -10,6 +10,29 @@ DB_CONFIG = {
     "password": "",
 }
 
+# URL SQLAlchemy opcional; si se indica reemplaza a DB_CONFIG (p. ej. ``sqlite:///tinka.db``).
+DB_URL = ""
+
+# Pool de conexiones compartido por todo el proceso y lectura por lotes.
+DB_POOL = {
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_recycle": 1800,
+}
+DB_CHUNKSIZE = 5000
+
+# Presupuesto del almacén en memoria usado cuando ``data/`` no es escribible
+# (lo que no cabe se vuelca a un directorio temporal con su propio tope).
+VIRTUAL_STORE_MAX_BYTES = 32 * 1024 * 1024
+VIRTUAL_STORE_MAX_SPILL_BYTES = 256 * 1024 * 1024
+
+# Cada cuántos segundos la app Streamlit revalida los datos en segundo plano.
+REFRESCO_S = 1800
+
+# Presupuesto de arranque del CLI que verifica ``arranque.py`` (segundos).
+ARRANQUE_IMPORT_S = 1.0     # ``import main``
+ARRANQUE_MENU_S = 2.5       # desde lanzar ``python main.py`` hasta ver el menú
+
 # Tabla con los resultados
 TABLE_NAME = "resultados"
 
@@ -33,14 +56,20 @@ SNOWFLAKE_CONFIG = {
 # Nombre de la tabla principal en Snowflake.
 SNOWFLAKE_TABLE = "RESULTADOS"
 
+# Modo pushdown: frecuencias, ventanas, pares/tríos y boliyapa se calculan en
+# el warehouse y sólo viajan las tablas de agregados (ver ``agregados.py``).
+SNOWFLAKE_PUSHDOWN = False
+
 # === Carpetas ===
 BASE_DIR = Path(__file__).resolve().parent
 DATA_DIR = BASE_DIR / "data"
 LOGS_DIR = BASE_DIR / "logs"
 
 # Archivos de datos
-CACHE_FILE = DATA_DIR / "cache_sorteos.json"
-COMBOS_FILE = DATA_DIR / "combinaciones_generadas.json"
+CACHE_FILE = DATA_DIR / "cache_sorteos.json"  # formato anterior; se migra solo
+CACHE_BIN_FILE = DATA_DIR / "cache_sorteos.npz"
+COMBOS_FILE = DATA_DIR / "combinaciones_generadas.json"  # formato anterior; se importa solo
+COMBOS_DB = DATA_DIR / "combinaciones_generadas.sqlite"
 
 # Parámetros generales
 TOTAL_NUMBERS = 45
@@ -2,47 +2,69 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Dict, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
 from urllib.parse import quote_plus
+import json
+import os
+import tempfile
+import zipfile
 
+import numpy as np
 import pandas as pd
 
 from config import (
     DB_CONFIG,
+    DB_URL,
+    DB_POOL,
+    DB_CHUNKSIZE,
     TABLE_NAME,
     CACHE_FILE,
+    CACHE_BIN_FILE,
     SNOWFLAKE_CONFIG,
     SNOWFLAKE_TABLE,
 )
-from utils import load_json, save_json
+from matriz import DrawMatrix, numeros_desde_texto
+from utils import _streamlit, ensure_dirs, load_json, save_json
 
-try:  # Importación opcional: sólo se necesita en despliegues Snowflake.
+# Snowpark, SQLAlchemy y Streamlit se importan bajo demanda: arrancar desde la
+# caché local (o comparar una combinación) no debe pagar su carga.
+if TYPE_CHECKING:  # pragma: no cover
     from snowflake.snowpark import Session  # type: ignore
-except Exception:  # pragma: no cover - la librería no siempre está instalada.
-    Session = None
 
-try:  # Streamlit aporta mecanismos de caché y secretos.
-    import streamlit as st
-except Exception:  # pragma: no cover
-    st = None
 
-try:
-    from sqlalchemy import create_engine
-except Exception:  # pragma: no cover - en Snowflake no siempre está disponible.
-    create_engine = None
+def _snowpark_session_cls():
+    try:  # Importación opcional: sólo se necesita en despliegues Snowflake.
+        from snowflake.snowpark import Session  # type: ignore
+    except Exception:  # pragma: no cover - la librería no siempre está instalada.
+        return None
+    return Session
 
 
-SQL_BASE = f"""SELECT id_sorteo, fecha_sorteo, numeros, boliyapa, jackpot,
-       COALESCE(created_at, CURRENT_TIMESTAMP()) AS created_at
-FROM {TABLE_NAME}
-WHERE numeros IS NOT NULL AND numeros <> ''
+def _sqlalchemy():
+    try:
+        import sqlalchemy
+    except Exception:  # pragma: no cover - en Snowflake no siempre está disponible.
+        return None
+    return sqlalchemy
+
+
+def _sql_sorteos(tabla: str, filtro: str = "") -> str:
+    """SELECT de los sorteos válidos de ``tabla``; ``filtro`` se añade al WHERE."""
+    return f"""SELECT id_sorteo, fecha_sorteo, numeros, boliyapa, jackpot,
+       COALESCE(created_at, CURRENT_TIMESTAMP) AS created_at
+FROM {tabla}
+WHERE numeros IS NOT NULL AND numeros <> ''{filtro}
 ORDER BY fecha_sorteo ASC, id_sorteo ASC
 """
 
 
+SQL_BASE = _sql_sorteos(TABLE_NAME)
+
+
 def _snowflake_configs() -> Optional[Dict[str, str]]:
     """Obtiene la configuración para Snowflake desde Streamlit o config local."""
 
+    st = _streamlit()
     if st is not None:
         secrets = getattr(st, "secrets", None)
         if secrets is not None and "snowflake" in secrets:
@@ -79,6 +101,7 @@ def get_snowflake_session() -> Session:
 
     global _SNOWFLAKE_SESSION
 
+    st = _streamlit()
     if st is not None and "snowflake_session" in st.session_state:
         sess = st.session_state["snowflake_session"]
         if sess and getattr(sess, "_conn", None):
@@ -87,6 +110,7 @@ def get_snowflake_session() -> Session:
     if _SNOWFLAKE_SESSION is not None and getattr(_SNOWFLAKE_SESSION, "_conn", None):
         return _SNOWFLAKE_SESSION
 
+    Session = _snowpark_session_cls()
     if Session is None:
         raise RuntimeError(
             "snowflake.snowpark no está disponible. Instala 'snowflake-snowpark-python' "
@@ -109,47 +133,136 @@ def get_snowflake_session() -> Session:
     return session
 
 
-def fetch_from_snowflake() -> pd.DataFrame:
-    session = get_snowflake_session()
-    cfg = _snowflake_configs() or {}
-    table_ident = _resolve_table(cfg)
+def _snowflake_table() -> str:
+    table_ident = _resolve_table(_snowflake_configs() or {})
     if not table_ident:
         raise RuntimeError(
             "Debe especificarse una tabla de Snowflake (config['table'] o SNOWFLAKE_TABLE)."
         )
+    return table_ident
 
-    sql = f"""SELECT id_sorteo, fecha_sorteo, numeros, boliyapa, jackpot,
-           COALESCE(created_at, CURRENT_TIMESTAMP()) AS created_at
-    FROM {table_ident}
-    WHERE numeros IS NOT NULL AND numeros <> ''
-    ORDER BY fecha_sorteo ASC, id_sorteo ASC"""
+
+def fetch_from_snowflake(sql: Optional[str] = None) -> pd.DataFrame:
+    session = get_snowflake_session()
+    if sql is None:
+        sql = _sql_sorteos(_snowflake_table())
 
     df = session.sql(sql).to_pandas()
     return df
 
 
-def get_engine():
-    if create_engine is None:
+_ENGINE = None
+_ENGINE_URL: Optional[str] = None
+
+
+def get_engine(url: Optional[str] = None):
+    """Engine SQLAlchemy del proceso: se crea una vez y se reutiliza su pool.
+
+    ``url`` (o ``DB_URL``) reemplaza la conexión MySQL armada con
+    ``DB_CONFIG``; pedir una URL distinta cierra el pool anterior.
+    """
+
+    global _ENGINE, _ENGINE_URL
+    url = url or DB_URL
+    if _ENGINE is not None and (not url or url == _ENGINE_URL):
+        return _ENGINE
+    dispose_engine()
+    sqlalchemy = _sqlalchemy()
+    if sqlalchemy is None:
         raise RuntimeError(
             "SQLAlchemy no está disponible. Instala 'sqlalchemy' para usar MySQL o "
             "configura Snowflake."
         )
-    user = DB_CONFIG.get("user", "")
-    pwd = quote_plus(DB_CONFIG.get("password", ""))
-    host = DB_CONFIG.get("host", "localhost")
-    port = DB_CONFIG.get("port", 3306)
-    db = DB_CONFIG.get("database", "")
-    url = f"mysql+mysqlconnector://{user}:{pwd}@{host}:{port}/{db}"
-    return create_engine(url, pool_pre_ping=True, pool_recycle=1800)
-
-
-def fetch_from_mysql() -> pd.DataFrame:
+    _ENGINE_URL = url or None
+    if not url:
+        user = DB_CONFIG.get("user", "")
+        pwd = quote_plus(DB_CONFIG.get("password", ""))
+        host = DB_CONFIG.get("host", "localhost")
+        port = DB_CONFIG.get("port", 3306)
+        db = DB_CONFIG.get("database", "")
+        url = f"mysql+mysqlconnector://{user}:{pwd}@{host}:{port}/{db}"
+    _ENGINE = sqlalchemy.create_engine(url, pool_pre_ping=True, **_opciones_pool(sqlalchemy, url))
+    return _ENGINE
+
+
+def _opciones_pool(sqlalchemy, url: str) -> Dict:
+    """``DB_POOL`` sin ``pool_size``/``max_overflow`` si el dialecto no usa QueuePool
+    (p. ej. ``sqlite://`` en memoria, que usa SingletonThreadPool y los rechaza)."""
+    u = sqlalchemy.engine.make_url(url)
+    pool_cls = u.get_dialect().get_pool_class(u)
+    if issubclass(pool_cls, sqlalchemy.pool.QueuePool):
+        return dict(DB_POOL)
+    return {k: v for k, v in DB_POOL.items() if k not in ("pool_size", "max_overflow")}
+
+
+def dispose_engine() -> None:
+    """Cierra las conexiones del pool (p. ej. al terminar el proceso o tras un fork)."""
+
+    global _ENGINE
+    if _ENGINE is not None:
+        _ENGINE.dispose()
+        _ENGINE = None
+
+
+def _columna(nombre: str, valores: Sequence) -> np.ndarray:
+    """Tupla de valores de una columna del cursor → arreglo tipado."""
+    if nombre in _FECHAS:
+        try:
+            return np.array(valores, dtype="datetime64[s]").astype(_FECHAS[nombre])
+        except (TypeError, ValueError):
+            return pd.to_datetime(pd.Series(valores), errors="coerce").to_numpy().astype(_FECHAS[nombre])
+    if nombre in ("id_sorteo", "boliyapa", "jackpot"):
+        arr = np.array([np.nan if v is None else v for v in valores], dtype=np.float64)
+        return arr.astype(np.int64) if nombre != "jackpot" and not np.isnan(arr).any() else arr
+    if nombre == "numeros":
+        return np.array(["" if v is None else str(v) for v in valores], dtype=str)
+    # Resto (p. ej. los agregados de la marca de agua): valores tal cual, NULL
+    # incluido; pandas infiere el tipo al armar el DataFrame.
+    arr = np.empty(len(valores), dtype=object)
+    arr[:] = list(valores)
+    return arr
+
+
+def _apilar_numeros(partes: List[np.ndarray]) -> np.ndarray:
+    """Concatena matrices de números de distinto ancho (relleno con 0 a la izquierda)."""
+    ancho = max([p.shape[1] for p in partes] + [0])
+    out = np.zeros((sum(len(p) for p in partes), ancho), dtype=np.uint8)
+    i = 0
+    for p in partes:
+        out[i:i + len(p), ancho - p.shape[1]:] = p
+        i += len(p)
+    return out
+
+
+def fetch_from_mysql(sql: str = SQL_BASE, chunksize: int = DB_CHUNKSIZE) -> pd.DataFrame:
+    """Lee ``sql`` en lotes de ``chunksize`` filas con el engine compartido.
+
+    Cada lote pasa de tuplas del cursor a arreglos tipados y ``numeros`` se
+    parsea ahí mismo a uint8; la matriz queda en ``df.attrs['numeros_u8']``
+    para que la caché no vuelva a parsear el texto.
+    """
     eng = get_engine()
-    try:
-        df = pd.read_sql_query(SQL_BASE, eng)
-        return df
-    finally:
-        eng.dispose()
+    columnas: List[str] = []
+    lotes: List[Dict[str, np.ndarray]] = []
+    with eng.connect() as conn:
+        res = conn.execution_options(stream_results=True).execute(_sqlalchemy().text(sql))
+        columnas = [str(c).lower() for c in res.keys()]
+        while True:
+            filas = res.fetchmany(chunksize)
+            if not filas:
+                break
+            lote = {c: _columna(c, v) for c, v in zip(columnas, zip(*filas))}
+            if "numeros" in lote:
+                lote["numeros_u8"] = numeros_desde_texto(lote["numeros"])
+            lotes.append(lote)
+
+    datos = {c: (np.concatenate([l[c] for l in lotes]) if lotes else np.array([])) for c in columnas}
+    if "fecha_sorteo" in datos and lotes:
+        datos["fecha_sorteo"] = datos["fecha_sorteo"].astype(object)  # datetime.date, como la caché
+    df = pd.DataFrame(datos, columns=columnas).infer_objects()
+    if lotes and "numeros" in columnas:
+        df.attrs["numeros_u8"] = _apilar_numeros([l["numeros_u8"] for l in lotes])
+    return df
 
 
 def fetch_from_db() -> pd.DataFrame:
@@ -168,9 +281,65 @@ def fetch_from_db() -> pd.DataFrame:
         df = fetch_from_mysql()
     return df
 
-def load_cached():
+# --- Caché binaria -----------------------------------------------------------
+# ``.npz`` sin comprimir: una columna tipada por arreglo, los números ya
+# parseados (uint8, mismo layout que ``DrawMatrix``) y una cabecera JSON con
+# versión y esquema. Cargarla es copiar memoria: no hay JSON ni ``to_datetime``.
+CACHE_VERSION = 1
+_FECHAS = {"fecha_sorteo": "datetime64[D]", "created_at": "datetime64[s]"}
+
+
+def _a_columnas(df: pd.DataFrame) -> Tuple[Dict[str, np.ndarray], List[Dict[str, str]]]:
+    arrays, esquema = {}, []
+    for col in df.columns:
+        s = df[col]
+        if col in _FECHAS or pd.api.types.is_datetime64_any_dtype(s):
+            tipo = _FECHAS.get(col, "datetime64[s]")
+            arr = pd.to_datetime(s, errors="coerce").to_numpy().astype(tipo)
+        elif pd.api.types.is_integer_dtype(s):
+            tipo, arr = "int64", s.to_numpy(dtype=np.int64)
+        elif pd.api.types.is_numeric_dtype(s):
+            tipo, arr = "float64", s.to_numpy(dtype=np.float64)
+        else:
+            tipo, arr = "str", s.fillna("").astype(str).to_numpy(dtype=str)
+        arrays[f"col_{col}"] = arr
+        esquema.append({"nombre": str(col), "tipo": tipo})
+    return arrays, esquema
+
+
+def _leer_binario(path: Optional[Path] = None) -> Optional[Dict]:
+    """Cabecera y arreglos de la caché binaria; ``None`` si falta o es de otra versión."""
+    p = Path(path or CACHE_BIN_FILE)
+    if not p.exists():
+        return None
+    try:
+        with np.load(p, allow_pickle=False) as z:
+            meta = json.loads(str(z["meta"]))
+            if meta.get("version") != CACHE_VERSION:
+                return None
+            return {"meta": meta, **{k: z[k] for k in z.files if k != "meta"}}
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):  # corrupta: se ignora
+        return None
+
+
+def _frame_binario(data: Dict) -> pd.DataFrame:
+    cols = {}
+    for c in data["meta"]["columnas"]:
+        arr = data[f"col_{c['nombre']}"]
+        if c["nombre"] == "fecha_sorteo":
+            arr = arr.astype(object)  # datetime.date, igual que el formato anterior
+        elif c["tipo"].startswith("datetime64"):
+            arr = pd.to_datetime(arr)
+        cols[c["nombre"]] = arr
+    df = pd.DataFrame(cols)
+    df.attrs["numeros_u8"] = data["numeros_u8"]
+    return df
+
+
+def _cargar_json() -> Optional[pd.DataFrame]:
     data = load_json(CACHE_FILE, default=None)
-    if not data: return None
+    if not data:
+        return None
     try:
         df = pd.DataFrame(data)
         if "fecha_sorteo" in df.columns:
@@ -179,27 +348,188 @@ def load_cached():
     except Exception:
         return None
 
-def save_cache(df: pd.DataFrame) -> None:
-    df = df.copy()
-    for col in ("fecha_sorteo", "created_at"):
-        if col in df.columns:
-            df[col] = df[col].astype(str)
-    save_json(CACHE_FILE, df.to_dict(orient="records"))
+
+def load_cached():
+    data = _leer_binario()
+    if data is not None:
+        return _frame_binario(data)
+    df = _cargar_json()
+    if df is not None and Path(CACHE_FILE).exists():
+        try:  # migración automática desde cache_sorteos.json
+            _guardar_binario(df)
+        except OSError:
+            pass
+    return df
+
+
+def load_cached_matrix() -> Optional[DrawMatrix]:
+    """``DrawMatrix`` directo de la caché binaria, sin parsear ``numeros``."""
+    data = _leer_binario()
+    if data is None:
+        return None
+    cols = {c["nombre"] for c in data["meta"]["columnas"]}
+    return DrawMatrix.from_arrays(
+        data["numeros_u8"],
+        id_sorteo=data["col_id_sorteo"] if "id_sorteo" in cols else None,
+        fecha_sorteo=data["col_fecha_sorteo"] if "fecha_sorteo" in cols else None,
+        boliyapa=data["col_boliyapa"] if "boliyapa" in cols else None,
+    )
+
+
+def _numeros_u8(df: pd.DataFrame) -> np.ndarray:
+    """Números parseados del DataFrame (los de ``attrs`` si vienen de la BD o la caché)."""
+    pre = df.attrs.get("numeros_u8")
+    if pre is not None and len(pre) == len(df):
+        return pre
+    if "numeros" not in df.columns:
+        return np.zeros((len(df), 6), np.uint8)
+    return numeros_desde_texto(df["numeros"].tolist())
+
+
+def _guardar_binario(df: pd.DataFrame, path: Optional[Path] = None, marca: Optional[Dict] = None) -> None:
+    path = Path(path or CACHE_BIN_FILE)
+    arrays, esquema = _a_columnas(df)
+    numeros = _numeros_u8(df)
+    meta = {"version": CACHE_VERSION, "filas": len(df), "columnas": esquema, "marca": marca}
+    ensure_dirs(path)
+    # Temporal único: el refresco en segundo plano y el botón o la CLI pueden
+    # escribir a la vez sin publicar un archivo a medias.
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".npz")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), numeros_u8=numeros, **arrays)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def save_cache(df: pd.DataFrame, marca: Optional[Dict] = None) -> None:
+    """Guarda la caché; ``marca`` es la marca de agua de ``sync_cache`` (se pierde en el JSON)."""
+    try:
+        _guardar_binario(df, marca=marca)
+    except OSError:
+        # Despliegues de sólo lectura: el formato JSON cae al almacén en memoria.
+        df = df.copy()
+        for col in ("fecha_sorteo", "created_at"):
+            if col in df.columns:
+                df[col] = df[col].astype(str)
+        save_json(CACHE_FILE, df.to_dict(orient="records"))
+
+# --- Sincronización incremental ----------------------------------------------
+# La marca de agua (máximo ``id_sorteo`` y ``created_at``, filas y firma de la
+# tabla hasta ese id) viaja en la cabecera de la caché binaria. Cada
+# sincronización lanza una consulta de agregados: si no hay ids nuevos no se
+# trae nada; si los hay se traen sólo esas filas; si cambió el conteo o la
+# firma de lo ya cacheado (ediciones, borrados o altas con id antiguo) se
+# recarga la tabla completa.
+_FIRMA_FILA = {
+    "mysql": "CRC32(CONCAT_WS('|', id_sorteo, fecha_sorteo, numeros, boliyapa, jackpot))",
+    # Acotado a 32 bits para que la suma quepa en un int64 del lado cliente.
+    "snowflake": "MOD(HASH(id_sorteo, fecha_sorteo, numeros, boliyapa, jackpot), 4294967296)",
+}
+
+
+def _dialecto() -> str:
+    return "snowflake" if _snowflake_configs() else "mysql"
+
+
+def _consultar(sql_por_tabla, dialecto: str) -> pd.DataFrame:
+    """Ejecuta ``sql_por_tabla(tabla)`` en la fuente; columnas en minúscula."""
+    if dialecto == "snowflake":
+        df = fetch_from_snowflake(sql_por_tabla(_snowflake_table()))
+    else:
+        df = fetch_from_mysql(sql_por_tabla(TABLE_NAME))
+    df.columns = [str(c).lower() for c in df.columns]
+    return df
+
+
+def _sql_marca(tabla: str, dialecto: str, hasta_id: int) -> str:
+    firma = _FIRMA_FILA[dialecto]
+    return f"""SELECT COUNT(*) AS filas_total,
+       COALESCE(SUM({firma}), 0) AS firma_total,
+       SUM(CASE WHEN id_sorteo <= {hasta_id} THEN 1 ELSE 0 END) AS filas_previas,
+       COALESCE(SUM(CASE WHEN id_sorteo <= {hasta_id} THEN {firma} ELSE 0 END), 0) AS firma_previa,
+       MAX(id_sorteo) AS max_id,
+       MAX(created_at) AS max_created_at
+FROM {tabla}
+WHERE numeros IS NOT NULL AND numeros <> ''
+"""
+
+
+def _entero(x) -> int:
+    return 0 if x is None or pd.isna(x) else int(x)
+
+
+def _normalizar(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = [str(c).lower() for c in df.columns]
+    if "fecha_sorteo" in df.columns:
+        df["fecha_sorteo"] = pd.to_datetime(df["fecha_sorteo"]).dt.date
+    if "created_at" in df.columns:
+        df["created_at"] = pd.to_datetime(df["created_at"], errors="coerce")
+    return df
+
+
+def sync_cache(completa: bool = False) -> Dict:
+    """Pone la caché al día con la menor transferencia posible.
+
+    Devuelve ``{'modo': 'sin_cambios' | 'incremental' | 'completa', 'nuevos',
+    'consultas', 'datos'}``. Sin caché binaria o sin marca (por ejemplo, tras
+    migrar desde el JSON) la primera sincronización es completa.
+    """
+    dialecto = _dialecto()
+    data = None if completa else _leer_binario()
+    marca = (data or {}).get("meta", {}).get("marca")
+    hasta = int(marca["id_sorteo"]) if marca else -1
+    r = _consultar(lambda t: _sql_marca(t, dialecto, hasta), dialecto).iloc[0]
+    consultas = 1
+    max_id = None if r["max_id"] is None or pd.isna(r["max_id"]) else int(r["max_id"])
+    nueva = None if max_id is None else {
+        "id_sorteo": max_id,
+        "created_at": None if pd.isna(r["max_created_at"]) else str(r["max_created_at"]),
+        "filas": _entero(r["filas_total"]),
+        "firma": str(_entero(r["firma_total"])),
+    }
+
+    if marca and nueva and _entero(r["filas_previas"]) == marca["filas"] \
+            and str(_entero(r["firma_previa"])) == marca["firma"]:
+        previo = _frame_binario(data)
+        if max_id == hasta:
+            return {"modo": "sin_cambios", "nuevos": 0, "consultas": consultas, "datos": previo}
+        nuevos = _normalizar(_consultar(
+            lambda t: _sql_sorteos(t, f" AND id_sorteo > {hasta} AND id_sorteo <= {max_id}"), dialecto))
+        consultas += 1
+        if len(previo) + len(nuevos) == nueva["filas"]:
+            numeros = _apilar_numeros([_numeros_u8(previo), _numeros_u8(nuevos)])
+            # ``concat`` compara los ``attrs`` con ``==``: con arreglos dentro falla.
+            previo.attrs, nuevos.attrs = {}, {}
+            df = pd.concat([previo, nuevos], ignore_index=True) if len(previo) else nuevos
+            df.attrs["numeros_u8"] = numeros
+            save_cache(df, marca=nueva)
+            return {"modo": "incremental", "nuevos": len(nuevos), "consultas": consultas, "datos": df}
+
+    filtro = "" if max_id is None else f" AND id_sorteo <= {max_id}"
+    df = _normalizar(_consultar(lambda t: _sql_sorteos(t, filtro), dialecto))
+    consultas += 1
+    save_cache(df, marca=nueva)
+    return {"modo": "completa", "nuevos": len(df), "consultas": consultas, "datos": df}
+
 
 def get_data(use_cache: bool = True):
     if use_cache:
         cached = load_cached()
         if cached is not None and len(cached) > 0:
             return cached.copy()
-    df = fetch_from_db()
-    if "fecha_sorteo" in df.columns:
-        df["fecha_sorteo"] = pd.to_datetime(df["fecha_sorteo"]).dt.date
-    save_cache(df)
-    return df
+    return sync_cache()["datos"]
 
-def refresh_cache():
-    df = fetch_from_db()
-    if "fecha_sorteo" in df.columns:
-        df["fecha_sorteo"] = pd.to_datetime(df["fecha_sorteo"]).dt.date
-    save_cache(df)
-    return df
+def get_draws(use_cache: bool = True) -> DrawMatrix:
+    """Histórico como ``DrawMatrix``; desde la caché binaria no hay parseo de texto."""
+    if use_cache:
+        dm = load_cached_matrix()
+        if dm is not None and len(dm) > 0:
+            return dm
+    return DrawMatrix.from_frame(get_data(use_cache=use_cache))
+
+def refresh_cache(incremental: bool = True):
+    """Trae los cambios de la BD (incremental por marca de agua; ``False`` recarga todo)."""
+    return sync_cache(completa=not incremental)["datos"]
@@ -0,0 +1,174 @@
+"""Tabla precalculada de todas las combinaciones C(45, 6) con sus rasgos, en memoria mapeada."""
+from __future__ import annotations
+from dataclasses import dataclass
+from math import comb
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from config import DATA_DIR, TOTAL_NUMBERS, COMBINATION_SIZE, SUM_RANGE
+from utils import is_prime
+
+TABLE_DIR = DATA_DIR / "combinaciones"
+TABLE_VERSION = 1
+_COLUMNAS = ("combos", "suma", "pares", "rangos", "consecutivos", "primos")
+_CHUNK = 1 << 20
+
+
+_MEMO_COMBINACIONES: Dict[Tuple[int, int], np.ndarray] = {}
+
+
+def todas_combinaciones(n: int, k: int, _memo: Optional[Dict] = None) -> np.ndarray:
+    """Todas las k-combinaciones de ``range(n)`` en orden lexicográfico (vectorizado).
+
+    Sin ``_memo`` el resultado se cachea por ``(n, k)`` y se devuelve de sólo lectura.
+    """
+    if _memo is None:
+        out = _MEMO_COMBINACIONES.get((n, k))
+        if out is None:
+            out = todas_combinaciones(n, k, {})
+            out.flags.writeable = False
+            _MEMO_COMBINACIONES[(n, k)] = out
+        return out
+    memo = _memo
+    if (n, k) in memo:
+        return memo[(n, k)]
+    if k == 0:
+        out = np.zeros((1, 0), dtype=np.uint8)
+    else:
+        bloques = []
+        for a in range(n - k + 1):
+            resto = todas_combinaciones(n - a - 1, k - 1, memo) + (a + 1)
+            bloques.append(np.hstack([np.full((len(resto), 1), a, dtype=np.uint8), resto]))
+        out = np.vstack(bloques) if bloques else np.zeros((0, k), dtype=np.uint8)
+    memo[(n, k)] = out
+    return out
+
+
+def rasgos(combos: np.ndarray) -> Dict[str, np.ndarray]:
+    """Rasgos por fila de una matriz (N × 6) de combinaciones ordenadas."""
+    c = np.asarray(combos, dtype=np.int16)
+    primos = np.array([is_prime(x) for x in range(TOTAL_NUMBERS + 1)], dtype=bool)
+    buckets = np.clip((c - 1) // 9, 0, 4)
+    rangos = np.stack([(buckets == b).sum(axis=1) for b in range(5)], axis=1)
+    return {"suma": c.sum(axis=1).astype(np.uint16),
+            "pares": (c % 2 == 0).sum(axis=1).astype(np.uint8),
+            "rangos": rangos.astype(np.uint8),
+            "consecutivos": (np.diff(c, axis=1) == 1).sum(axis=1).astype(np.uint8),
+            "primos": primos[c].sum(axis=1).astype(np.uint8)}
+
+
+def _meta_valida(path: Path, n: int = TOTAL_NUMBERS, k: int = COMBINATION_SIZE) -> bool:
+    meta_file = Path(path) / "meta.json"
+    meta = json.loads(meta_file.read_text(encoding="utf-8")) if meta_file.exists() else {}
+    return meta.get("version") == TABLE_VERSION and meta.get("n") == n and meta.get("k") == k
+
+
+def build_table(path: Path = TABLE_DIR, n: int = TOTAL_NUMBERS, k: int = COMBINATION_SIZE) -> Path:
+    """Genera los ``.npy`` de la tabla en ``path`` (una sola vez; ~120 MB para 45/6).
+
+    Se escribe en un directorio temporal junto a ``path`` y se publica con
+    ``os.replace``: un lector ve la tabla completa o ninguna. Si otro proceso
+    la publicó mientras tanto se conserva la suya y se descarta la propia.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix=f".{path.name}-", dir=path.parent))
+    try:
+        _escribir_tabla(tmp, n, k)
+        try:
+            os.replace(tmp, path)
+        except OSError:  # ``path`` existe y no está vacío
+            if _meta_valida(path, n, k):
+                return path
+            # Tabla vieja u otra versión: se aparta (los mmaps abiertos siguen válidos).
+            viejo = Path(tempfile.mkdtemp(prefix=f".{path.name}-viejo-", dir=path.parent))
+            os.replace(path, viejo)
+            try:
+                os.replace(tmp, path)
+            except OSError:  # otro proceso publicó entre medio
+                if not _meta_valida(path, n, k):
+                    raise
+            shutil.rmtree(viejo, ignore_errors=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return path
+
+
+def _escribir_tabla(path: Path, n: int, k: int) -> None:
+    total = comb(n, k)
+    out = {
+        "combos": np.lib.format.open_memmap(path / "combos.npy", mode="w+", dtype=np.uint8, shape=(total, k)),
+        "suma": np.lib.format.open_memmap(path / "suma.npy", mode="w+", dtype=np.uint16, shape=(total,)),
+        "pares": np.lib.format.open_memmap(path / "pares.npy", mode="w+", dtype=np.uint8, shape=(total,)),
+        "rangos": np.lib.format.open_memmap(path / "rangos.npy", mode="w+", dtype=np.uint8, shape=(total, 5)),
+        "consecutivos": np.lib.format.open_memmap(path / "consecutivos.npy", mode="w+", dtype=np.uint8, shape=(total,)),
+        "primos": np.lib.format.open_memmap(path / "primos.npy", mode="w+", dtype=np.uint8, shape=(total,)),
+    }
+    # Bloques por primer número: cada uno es (a, a+1+combos del resto).
+    memo: Dict = {}
+    fila = 0
+    for a in range(n - k + 1):
+        resto = todas_combinaciones(n - a - 1, k - 1, memo) + (a + 2)
+        for i in range(0, len(resto), _CHUNK):
+            parte = resto[i:i + _CHUNK]
+            bloque = np.hstack([np.full((len(parte), 1), a + 1, dtype=np.uint8), parte])
+            fin = fila + len(bloque)
+            out["combos"][fila:fin] = bloque
+            for col, val in rasgos(bloque).items():
+                out[col][fila:fin] = val
+            fila = fin
+    for arr in out.values():
+        arr.flush()
+    del out
+    (path / "meta.json").write_text(json.dumps({"version": TABLE_VERSION, "n": n, "k": k, "total": total}),
+                                    encoding="utf-8")
+
+
+@dataclass
+class CombinationTable:
+    """Las C(n, k) combinaciones (orden lexicográfico) y sus rasgos como memmaps de sólo lectura.
+
+    Abrirla no carga nada en RAM: las páginas se leen bajo demanda, de modo
+    que filtrar o puntuar todo el espacio son operaciones vectoriales.
+    """
+    combos: np.ndarray
+    suma: np.ndarray
+    pares: np.ndarray
+    rangos: np.ndarray
+    consecutivos: np.ndarray
+    primos: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.combos)
+
+    @classmethod
+    def open(cls, path: Path = TABLE_DIR, build: bool = True) -> "CombinationTable":
+        """Abre la tabla en ``path``; la construye antes si falta o es de otra versión."""
+        path = Path(path)
+        if not _meta_valida(path):
+            if not build:
+                raise FileNotFoundError(f"No hay tabla de combinaciones válida en {path}")
+            build_table(path)
+        return cls(**{col: np.load(path / f"{col}.npy", mmap_mode="r") for col in _COLUMNAS})
+
+    def mascara_heuristica(self, sum_range: Tuple[int, int] = SUM_RANGE, max_desbalance: int = 2) -> np.ndarray:
+        """Equivalente vectorial de ``generador._meets_heuristics`` sobre toda la tabla."""
+        impares = COMBINATION_SIZE - self.pares.astype(np.int16)
+        return ((self.suma >= sum_range[0]) & (self.suma <= sum_range[1])
+                & (np.abs(self.pares - impares) <= max_desbalance))
+
+    def indice(self, combo) -> int:
+        """Posición (rango lexicográfico) de una combinación en la tabla."""
+        c = sorted(int(x) for x in combo)
+        n, k = TOTAL_NUMBERS, len(c)
+        pos, prev = 0, 0
+        for i, x in enumerate(c):
+            for v in range(prev + 1, x):
+                pos += comb(n - v, k - i - 1)
+            prev = x
+        return pos
@@ -0,0 +1,349 @@
+"""Estado incremental de análisis: absorbe sorteos nuevos sin recalcular el histórico."""
+from __future__ import annotations
+from collections import Counter, deque
+from itertools import combinations
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import json
+import numpy as np
+
+from config import DATA_DIR, TOTAL_NUMBERS, LAST_N_WINDOWS
+from matriz import Sorteos, as_draw_matrix
+from utils import is_prime, ensure_dirs
+from analizador import (
+    Coocurrencias,
+    _chicuadrado_desde_conteos,
+    _frecuencias_desde_conteos,
+    _resumen_boliyapa,
+)
+import ml
+
+STATE_FILE = DATA_DIR / "estado_analisis.npz"
+STATE_VERSION = 3
+_RANGOS = ('1-9', '10-18', '19-27', '28-36', '37-45')
+_NAT = np.iinfo(np.int64).min
+
+
+class AnalysisState:
+    """Acumuladores de ``analisis_completo`` actualizables sorteo a sorteo.
+
+    ``add_draw`` cuesta O(1) (un bloque 6×6 de pares, 6×6×6 de tríos y 45
+    pesos EWMA); ``analisis_completo()`` exporta en cualquier momento el mismo
+    dict que ``analizador.analisis_completo`` sobre el histórico absorbido.
+    """
+
+    def __init__(self, halflife_draws: int = 50, n_numeros: int = TOTAL_NUMBERS):
+        self.halflife_draws = int(halflife_draws)
+        self.gamma = 0.5 ** (1.0 / max(1, self.halflife_draws))
+        self.n_sorteos = 0
+        self.ultimo_id: Optional[int] = None
+        # ``DrawMatrix.huella()`` de lo absorbido (``None`` si se desconoce, p. ej.
+        # tras ``add_draw`` sueltos): detecta sorteos viejos editados.
+        self.huella: Optional[str] = None
+        w = n_numeros + 1
+        # Frecuencias y recencia (índice = número).
+        self.conteos = np.zeros(w, dtype=np.int64)
+        self.last_seen = np.zeros(w, dtype=np.int64)
+        # Pares / tríos con su primera aparición (para desempates estables).
+        self.pares = np.zeros((w, w), dtype=np.int64)
+        self.trios = np.zeros((w, w, w), dtype=np.int64)
+        self.primera_par = np.zeros((w, w), dtype=np.int64)
+        self.primera_trio = np.zeros((w, w, w), dtype=np.int64)
+        # Gaps en días: primera/última fecha y apariciones con fecha de cada número.
+        self.con_fecha = np.zeros(w, dtype=np.int64)
+        self.primer_dia = np.full(w, _NAT, dtype=np.int64)
+        self.ultimo_dia = np.full(w, _NAT, dtype=np.int64)
+        self.por_mes: Counter = Counter()
+        # Patrones.
+        self.pares_cnt = 0
+        self.impares_cnt = 0
+        self.rangos = np.zeros(len(_RANGOS), dtype=np.int64)
+        self.suma_total = 0
+        self.suma_min: Optional[int] = None
+        self.suma_max: Optional[int] = None
+        self.consecutivos = 0
+        self.dist_total = 0
+        self.dist_cnt = 0
+        self.primos = 0
+        self.boliyapa: Counter = Counter()
+        # EWMA (peso 1 para el sorteo más reciente).
+        self.ewma = np.zeros(w, dtype=np.float64)
+        self.ewma_total = 0.0
+        # Últimos sorteos para ventanas y racha.
+        self.recientes: deque = deque(maxlen=max(LAST_N_WINDOWS + [10]))
+        # Derivados que no se serializan: frecuencias del sorteo actual y el
+        # último top-20 de pares/tríos (``(n_sorteos, pares, tríos)``).
+        self._frec: Dict[Optional[int], Dict] = {}
+        self._top_cooc: Optional[Tuple[int, List, List]] = None
+
+    # --- Construcción -------------------------------------------------------
+    @classmethod
+    def from_draws(cls, df: Sorteos, halflife_draws: int = 50) -> "AnalysisState":
+        dm = as_draw_matrix(df)
+        state = cls(halflife_draws=halflife_draws, n_numeros=dm.n_numeros)
+        state.extend(dm)
+        state.huella = dm.huella()
+        return state
+
+    def _ampliar(self, n_numeros: int) -> None:
+        w, nw = len(self.conteos), n_numeros + 1
+        if nw <= w:
+            return
+        pad1 = [(0, nw - w)]
+
+        def pad(a, fill=0):
+            return np.pad(a, pad1 * a.ndim, constant_values=fill)
+
+        self.conteos, self.last_seen = pad(self.conteos), pad(self.last_seen)
+        self.pares, self.trios = pad(self.pares), pad(self.trios)
+        self.primera_par, self.primera_trio = pad(self.primera_par), pad(self.primera_trio)
+        self.primer_dia, self.ultimo_dia = pad(self.primer_dia, _NAT), pad(self.ultimo_dia, _NAT)
+        self.con_fecha = pad(self.con_fecha)
+        self.ewma = pad(self.ewma)
+
+    def add_draw(self, numeros, fecha=None, boliyapa: int = 0, id_sorteo: Optional[int] = None) -> None:
+        """Absorbe un sorteo; ``numeros`` son sus bolas (cualquier orden)."""
+        a = np.sort(np.asarray([x for x in numeros if x], dtype=np.intp))
+        if a.size and a[-1] >= len(self.conteos):
+            self._ampliar(int(a[-1]))
+        idx = self.n_sorteos
+        self.n_sorteos += 1
+        self.huella = None
+        self._frec = {}
+        self.ultimo_id = int(id_sorteo) if id_sorteo is not None else self.n_sorteos
+
+        self.conteos[a] += 1
+        self.last_seen[a] = self.n_sorteos
+        block2 = np.ix_(a, a)
+        nuevos = self.pares[block2] == 0
+        self.primera_par[block2] = np.where(nuevos, idx, self.primera_par[block2])
+        self.pares[block2] += 1
+        block3 = np.ix_(a, a, a)
+        nuevos = self.trios[block3] == 0
+        self.primera_trio[block3] = np.where(nuevos, idx, self.primera_trio[block3])
+        self.trios[block3] += 1
+
+        if fecha is not None and not np.isnat(np.datetime64(fecha, 'D')):
+            fecha = np.datetime64(fecha, 'D')
+            dia = int(fecha.astype(np.int64))
+            self.con_fecha[a] += 1
+            self.primer_dia[a] = np.where(self.primer_dia[a] == _NAT, dia, np.minimum(self.primer_dia[a], dia))
+            self.ultimo_dia[a] = np.maximum(self.ultimo_dia[a], dia)
+            y, m = fecha.astype(object).year, fecha.astype(object).month
+            for x in a.tolist():
+                self.por_mes[(y, m, x)] += 1
+
+        arr = a.tolist()
+        suma = sum(arr)
+        self.suma_total += suma
+        self.suma_min = suma if self.suma_min is None else min(self.suma_min, suma)
+        self.suma_max = suma if self.suma_max is None else max(self.suma_max, suma)
+        ev = sum(1 for x in arr if x % 2 == 0)
+        self.pares_cnt += ev
+        self.impares_cnt += len(arr) - ev
+        for x in arr:
+            if 1 <= x <= 45:
+                self.rangos[(x - 1) // 9] += 1
+            if is_prime(x):
+                self.primos += 1
+        self.consecutivos += sum(1 for p, q in zip(arr, arr[1:]) if q == p + 1)
+        if len(arr) > 1:
+            self.dist_total += arr[-1] - arr[0]
+            self.dist_cnt += len(arr) - 1
+        if boliyapa and boliyapa > 0:
+            self.boliyapa[int(boliyapa)] += 1
+
+        self.ewma *= self.gamma
+        self.ewma[a] += 1.0
+        self.ewma_total = self.ewma_total * self.gamma + 1.0
+        self.recientes.append(tuple(arr))
+
+    def extend(self, df: Sorteos) -> None:
+        dm = as_draw_matrix(df)
+        for num, fecha, bol, ids in zip(dm.numeros, dm.fecha_sorteo, dm.boliyapa.tolist(),
+                                        dm.id_sorteo.tolist()):
+            self.add_draw(num, fecha=fecha, boliyapa=bol, id_sorteo=ids)
+
+    def sync(self, df: Sorteos) -> int:
+        """Absorbe los sorteos de ``df`` posteriores a los ya conocidos.
+
+        Si ``df`` no extiende el histórico absorbido (filas editadas o
+        borradas: la huella de sus primeras ``n_sorteos`` filas no coincide)
+        se reconstruye desde cero. Devuelve los sorteos absorbidos.
+        """
+        dm = as_draw_matrix(df)
+        n = self.n_sorteos
+        extiende = len(dm) >= n and (n == 0 or (self.huella is not None and dm[:n].huella() == self.huella))
+        if not extiende:
+            self.__dict__.update(AnalysisState(self.halflife_draws, dm.n_numeros).__dict__)
+            n = 0
+        self.extend(dm[n:])
+        self.huella = dm.huella()
+        return len(dm) - n
+
+    def cubre(self, df: Sorteos) -> bool:
+        """True si el estado ya absorbió exactamente el histórico ``df``."""
+        dm = as_draw_matrix(df)
+        if len(dm) != self.n_sorteos:
+            return False
+        return len(dm) == 0 or dm.huella() == self.huella
+
+    # --- Exportación --------------------------------------------------------
+    def frecuencias(self, win: Optional[int] = None) -> Dict:
+        """``analisis_frecuencias`` del histórico absorbido (o de sus últimos ``win`` sorteos).
+
+        Se calcula una vez por sorteo absorbido; el dict devuelto es compartido.
+        """
+        if win not in self._frec:
+            if win is None:
+                self._frec[win] = _frecuencias_desde_conteos(self.conteos, self.n_sorteos, self._racha(),
+                                                             self.last_seen[1:])
+            else:
+                sub = list(self.recientes)[-win:] if win else []
+                cnt = np.bincount([x for row in sub for x in row], minlength=len(self.conteos))
+                offset = self.n_sorteos - len(sub)
+                self._frec[win] = _frecuencias_desde_conteos(cnt, len(sub), self._racha(),
+                                                             np.maximum(self.last_seen[1:] - offset, 0))
+        return self._frec[win]
+
+    def _racha(self) -> np.ndarray:
+        racha = np.zeros(len(self.conteos) - 1, dtype=bool)
+        for row in list(self.recientes)[-10:]:
+            racha[np.asarray(row, dtype=np.intp) - 1] = True
+        return racha
+
+    def _temporal(self) -> Dict:
+        por_mes = [{'anio': y, 'mes': m, 'numero': x, 'freq': c}
+                   for (y, m, x), c in sorted(self.por_mes.items())]
+        gaps = {}
+        for n in range(1, TOTAL_NUMBERS + 1):
+            if self.con_fecha[n] >= 2:
+                gaps[n] = float((self.ultimo_dia[n] - self.primer_dia[n]) / (self.con_fecha[n] - 1))
+            else:
+                gaps[n] = None
+        ventanas = {str(win): self.frecuencias(win) for win in LAST_N_WINDOWS}
+        return {'por_mes': por_mes, 'gaps_prom_dias': gaps, 'ventanas': ventanas}
+
+    def _patrones(self) -> Dict:
+        n = self.n_sorteos
+        return {'pares': self.pares_cnt, 'impares': self.impares_cnt,
+                'rangos': dict(zip(_RANGOS, self.rangos.tolist())),
+                'suma_min': self.suma_min, 'suma_max': self.suma_max,
+                'suma_prom': float(self.suma_total / n) if n else None,
+                'consecutivos_total': int(self.consecutivos),
+                'dist_prom': float(self.dist_total / self.dist_cnt) if self.dist_cnt else None,
+                'primos_total': int(self.primos),
+                'total_combinaciones': n}
+
+    def coocurrencias(self) -> Coocurrencias:
+        n = self.n_sorteos
+        return Coocurrencias.from_counts(self.pares, self.trios,
+                                         np.where(self.pares > 0, self.primera_par, n),
+                                         np.where(self.trios > 0, self.primera_trio, n))
+
+    def resumen_coocurrencias(self) -> Dict:
+        """``_resumen_coocurrencias(self.coocurrencias())`` sin recorrer los tensores en cada sorteo.
+
+        Un sorteo sólo cambia el conteo de sus propios pares/tríos (los demás
+        conservan conteo y primera aparición), así que el nuevo top-20 sale de
+        reordenar el anterior junto con los de los sorteos absorbidos desde
+        entonces; sin esa base (o si ya salieron de ``recientes``) se recalcula.
+        """
+        n, k = self.n_sorteos, 20
+        nuevos = n - self._top_cooc[0] if self._top_cooc is not None else None
+        if nuevos is None or nuevos > len(self.recientes):
+            cooc = self.coocurrencias()
+            pares, trios = cooc.top_pares(k), cooc.top_trios(k)
+        else:
+            filas = list(self.recientes)[len(self.recientes) - nuevos:]
+            pares = self._top_desde({c for c, _ in self._top_cooc[1]}
+                                    | {c for f in filas for c in combinations(f, 2)},
+                                    self.pares, self.primera_par, k)
+            trios = self._top_desde({c for c, _ in self._top_cooc[2]}
+                                    | {c for f in filas for c in combinations(f, 3)},
+                                    self.trios, self.primera_trio, k)
+        self._top_cooc = (n, pares, trios)
+        return {'pairs_top20': [{'pair': list(c), 'freq': v} for c, v in pares],
+                'trios_top20': [{'trio': list(c), 'freq': v} for c, v in trios]}
+
+    @staticmethod
+    def _top_desde(candidatos, cnt: np.ndarray, primera: np.ndarray, k: int) -> List:
+        # Mismo orden que ``Coocurrencias._top_k``: frecuencia, primera aparición, lexicográfico.
+        top = sorted(candidatos, key=lambda c: (-cnt[c], primera[c], c))[:k]
+        return [(tuple(int(x) for x in c), int(cnt[c])) for c in top]
+
+    def analisis_completo(self) -> Dict:
+        return {'frecuencias': self.frecuencias(),
+                'temporal': self._temporal(),
+                'patrones': self._patrones(),
+                'coocurrencias': self.resumen_coocurrencias(),
+                'boliyapa': _resumen_boliyapa(self.boliyapa),
+                'chi_cuadrado': _chicuadrado_desde_conteos(self.conteos)}
+
+    def posteriors(self, prior_strength: float = 30.0, p0: float = 6.0/45.0):
+        """Equivalente a ``ml.beta_binomial_posteriors`` sobre el histórico absorbido."""
+        s = {i: int(c) for i, c in enumerate(self.conteos.tolist()) if c}
+        return ml._posteriors(s, float(self.n_sorteos), prior_strength, p0)
+
+    def posteriors_ewma(self, prior_strength: float = 15.0, p0: float = 6.0/45.0):
+        """Equivalente a ``ml.beta_binomial_posteriors_ewma`` con ``halflife_draws`` del estado."""
+        ew = {i: float(self.ewma[i]) for i in range(1, 46)}
+        return ml._posteriors(ew, self.ewma_total, prior_strength, p0)
+
+    # --- Serialización ------------------------------------------------------
+    _ARRAYS = ('conteos', 'last_seen', 'pares', 'trios', 'primera_par', 'primera_trio',
+               'primer_dia', 'ultimo_dia', 'con_fecha', 'rangos', 'ewma')
+    _SCALARS = ('halflife_draws', 'n_sorteos', 'ultimo_id', 'huella', 'pares_cnt', 'impares_cnt',
+                'suma_total', 'suma_min', 'suma_max', 'consecutivos', 'dist_total',
+                'dist_cnt', 'primos', 'ewma_total')
+
+    def save(self, path: Path) -> None:
+        ensure_dirs(path)
+        meta = {k: getattr(self, k) for k in self._SCALARS}
+        meta['version'] = STATE_VERSION
+        recientes = np.zeros((len(self.recientes), max([0] + [len(r) for r in self.recientes])), dtype=np.uint8)
+        for i, row in enumerate(self.recientes):
+            recientes[i, recientes.shape[1] - len(row):] = row
+        tmp = str(path) + ".tmp.npz"
+        np.savez_compressed(
+            tmp,
+            meta=np.array(json.dumps(meta)),
+            por_mes=np.array([k + (c,) for k, c in sorted(self.por_mes.items())], dtype=np.int64).reshape(-1, 4),
+            boliyapa=np.array(sorted(self.boliyapa.items()), dtype=np.int64).reshape(-1, 2),
+            recientes=recientes,
+            **{k: getattr(self, k) for k in self._ARRAYS},
+        )
+        Path(tmp).replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["AnalysisState"]:
+        """Carga un estado guardado; ``None`` si no existe o su versión no coincide."""
+        p = Path(path)
+        if not p.exists():
+            return None
+        with np.load(p, allow_pickle=False) as z:
+            meta = json.loads(str(z['meta']))
+            if meta.pop('version', None) != STATE_VERSION:
+                return None
+            state = cls(halflife_draws=meta['halflife_draws'])
+            for k in cls._SCALARS:
+                setattr(state, k, meta[k])
+            state.gamma = 0.5 ** (1.0 / max(1, state.halflife_draws))
+            for k in cls._ARRAYS:
+                setattr(state, k, z[k].copy())
+            state.por_mes = Counter({(y, m, x): c for y, m, x, c in z['por_mes'].tolist()})
+            state.boliyapa = Counter(dict(z['boliyapa'].tolist()))
+            for row in z['recientes'].tolist():
+                state.recientes.append(tuple(x for x in row if x))
+        return state
+
+
+def load_state(df: Sorteos, path: Path = STATE_FILE) -> AnalysisState:
+    """Estado persistido en ``path`` sincronizado con ``df`` (se guarda si cambió)."""
+    state = AnalysisState.load(path) or AnalysisState()
+    if state.sync(df) or not Path(path).exists():
+        try:
+            state.save(path)
+        except OSError:
+            pass  # despliegues de sólo lectura: el estado vive en memoria
+    return state
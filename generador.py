@@ -1,10 +1,16 @@
 """Generación y evaluación de combinaciones a partir de las estadísticas."""
 from __future__ import annotations
-from typing import List, Dict, Tuple
-import random
+from typing import List, Dict, Optional, Tuple
+from math import comb
+import warnings
 import numpy as np
 
 from config import TOTAL_NUMBERS, COMBINATION_SIZE, SUM_RANGE
+from espacio import todas_combinaciones
+
+
+class GeneracionIncompleta(UserWarning):
+    """Una estrategia no pudo producir todas las combinaciones pedidas."""
 
 def _validate_combo(combo: List[int]) -> bool:
     if len(combo) != COMBINATION_SIZE: return False
@@ -22,24 +28,93 @@ def _meets_heuristics(combo: List[int]) -> bool:
         return False
     return True
 
-def _weighted_choice(population: List[int], weights: List[float], k: int) -> List[int]:
-    arr = np.array(population)
-    w = np.array(weights, dtype=float)
+def muestrear_ponderado(population: List[int], weights: List[float], k: int, n: int = 1,
+                        rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """``n`` muestras de ``k`` elementos distintos de ``population`` ponderadas por ``weights``.
+
+    Claves Gumbel-top-k (Efraimidis–Spirakis): ``log(w) + Gumbel`` y los ``k``
+    mayores por fila. Equivale a extraer uno a uno proporcional al peso
+    restante, igual que ``_weighted_choice`` al descartar repetidos. Los pesos
+    nulos sólo se eligen (al azar) si faltan positivos. Filas ordenadas.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    pop = np.asarray(population)
+    w = np.asarray(weights, dtype=float)
     if w.sum() <= 0:
-        w = np.ones_like(w) / len(w)
-    else:
-        w = w / w.sum()
-    picks = set()
-    for _ in range(2000):
-        x = np.random.choice(arr, p=w)
-        picks.add(int(x))
-        if len(picks) == k:
-            break
-    if len(picks) < k:
-        rest = [p for p in population if p not in picks]
-        random.shuffle(rest)
-        picks.update(rest[:(k-len(picks))])
-    return sorted(picks)
+        w = np.ones_like(w)
+    logw = np.where(w > 0, np.log(np.where(w > 0, w, 1.0)), -1e12)
+    claves = logw + rng.gumbel(size=(n, len(w)))
+    idx = np.argpartition(-claves, k - 1, axis=1)[:, :k]
+    return np.sort(pop[idx], axis=1)
+
+def _weighted_choice(population: List[int], weights: List[float], k: int,
+                     rng: Optional[np.random.Generator] = None) -> List[int]:
+    return muestrear_ponderado(population, weights, k, 1, rng)[0].tolist()
+
+def _mascara_heuristica(combos: np.ndarray) -> np.ndarray:
+    """``_meets_heuristics`` por fila sobre una matriz (N × 6)."""
+    c = np.asarray(combos, dtype=np.int64)
+    s = c.sum(axis=1)
+    ev = (c % 2 == 0).sum(axis=1)
+    return (s >= SUM_RANGE[0]) & (s <= SUM_RANGE[1]) & (np.abs(2 * ev - COMBINATION_SIZE) <= 2)
+
+def _avisar_incompleta(estrategia: str, obtenidas: int, pedidas: int, stacklevel: int = 3,
+                       intentos: Optional[int] = None) -> None:
+    """Avisa si faltan combinaciones: el espacio enumerado es chico, o (con ``intentos``)
+    el muestreo por rechazo agotó su presupuesto antes de reunirlas."""
+    if obtenidas < pedidas:
+        if intentos is None:
+            msg = f"sólo {obtenidas} de {pedidas} combinaciones distintas cumplen las restricciones."
+        else:
+            msg = (f"se agotaron los {intentos} intentos con {obtenidas} de {pedidas} combinaciones "
+                   "distintas (la construcción ya casi no produce combinaciones nuevas).")
+        warnings.warn(f"{estrategia}: {msg}", GeneracionIncompleta, stacklevel=stacklevel)
+
+def unicos_nuevos(muestra: np.ndarray, vistos: set) -> np.ndarray:
+    """Filas de ``muestra`` no vistas antes (ni repetidas dentro del lote), en orden; actualiza ``vistos``."""
+    codigos = _codificar(muestra)
+    _, first = np.unique(codigos, return_index=True)
+    first = np.sort(first)
+    nuevos = [i for i in first.tolist() if int(codigos[i]) not in vistos]
+    vistos.update(int(codigos[i]) for i in nuevos)
+    return muestra[nuevos]
+
+_LOTE_MAX = 1 << 16  # filas por lote: acota la memoria de los muestreadores (lote × 46)
+
+def _muestrear_por_lotes(muestreador, n_combos: int, max_tries: int) -> List[List[int]]:
+    """Hasta ``n_combos`` combinaciones únicas que cumplen las heurísticas, por lotes.
+
+    ``muestreador(lote)`` devuelve una matriz (lote × 6) de candidatas. El
+    tamaño de cada lote se ajusta a la tasa de aceptación observada
+    (heurísticas y duplicados), así que pedir cientos de miles cuesta unos
+    pocos lotes y no ``n_combos`` intentos.
+    """
+    partes, vistos, tries, total, tasa = [], set(), 0, 0, 0.5
+    while total < n_combos and tries < max_tries:
+        lote = int(min(max_tries - tries, _LOTE_MAX, max(64, 1.2 * (n_combos - total) / max(tasa, 0.01))))
+        muestra = muestreador(lote)
+        nuevos = unicos_nuevos(muestra[_mascara_heuristica(muestra)], vistos)[:n_combos - total]
+        partes.append(nuevos)
+        total += len(nuevos)
+        tasa = max(len(nuevos) / lote, 0.5 * tasa)
+        tries += lote
+    return np.vstack(partes).tolist() if partes else []
+
+def _muestrear_validos(keys: List[int], weights: List[float], n_combos: int, max_tries: int,
+                       rng: Optional[np.random.Generator] = None) -> List[List[int]]:
+    rng = rng if rng is not None else np.random.default_rng()
+    return _muestrear_por_lotes(lambda lote: muestrear_ponderado(keys, weights, COMBINATION_SIZE, lote, rng),
+                                n_combos, max_tries)
+
+def _muestrear_de_validos(validos: np.ndarray, n_combos: int, rng: Optional[np.random.Generator],
+                          estrategia: str) -> List[List[int]]:
+    """Muestra uniforme sin reemplazo del conjunto de combinaciones válidas."""
+    rng = rng if rng is not None else np.random.default_rng()
+    m = min(n_combos, len(validos))
+    _avisar_incompleta(estrategia, m, n_combos, stacklevel=5)
+    if m == 0:
+        return []
+    return validos[rng.choice(len(validos), size=m, replace=False)].tolist()
 
 def _rango_bucket(n: int) -> int:
     if   1 <= n <= 9:   return 0
@@ -53,77 +128,104 @@ def _consecutivos(combo: List[int]) -> int:
     arr = sorted(combo)
     return sum(1 for a, b in zip(arr, arr[1:]) if b == a + 1)
 
+def _subconjuntos_al_azar(grupos: List[Tuple[np.ndarray, int]], lote: int, rng: np.random.Generator) -> np.ndarray:
+    """``lote`` filas ordenadas que toman ``k`` elementos distintos al azar de cada ``(pool, k)``."""
+    partes = [pool[np.argpartition(rng.random((lote, len(pool))), k - 1, axis=1)[:, :k]] for pool, k in grupos]
+    return np.sort(np.hstack(partes), axis=1)
+
+def _muestrear_uniforme(grupos: List[Tuple[np.ndarray, int]], n_combos: int, rng: Optional[np.random.Generator],
+                        estrategia: str) -> List[List[int]]:
+    """Uniforme sin reemplazo entre las combinaciones válidas que se arman con ``grupos``.
+
+    Si lo pedido es chico frente al espacio basta el rechazo por lotes; si
+    no, o si el rechazo no alcanza, se enumera el espacio completo (exacto).
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    total = int(np.prod([comb(len(pool), k) for pool, k in grupos]))
+    if n_combos * 20 <= total:
+        def muestreador(lote: int) -> np.ndarray:
+            m = _subconjuntos_al_azar(grupos, lote, rng)
+            return m[(np.diff(m, axis=1) > 0).all(axis=1)]
+        combos = _muestrear_por_lotes(muestreador, n_combos, max(8000, 20 * n_combos))
+        if len(combos) == n_combos:
+            return combos
+    partes = [pool[todas_combinaciones(len(pool), k)] for pool, k in grupos]
+    combos = partes[0]
+    for p in partes[1:]:  # producto cartesiano de los grupos
+        combos = np.hstack([np.repeat(combos, len(p), axis=0), np.tile(p, (len(combos), 1))])
+    combos = np.sort(combos, axis=1)
+    combos = combos[(np.diff(combos, axis=1) > 0).all(axis=1) & _mascara_heuristica(combos)]
+    _, first = np.unique(_codificar(combos), return_index=True)  # repetidos si los grupos se solapan
+    return _muestrear_de_validos(combos[np.sort(first)], n_combos, rng, estrategia)
+
 # Estrategias clásicas
-def estrategia_frecuencia_pura(freq_abs: Dict[int,int], n_combos: int = 10) -> List[List[int]]:
+def estrategia_frecuencia_pura(freq_abs: Dict[int,int], n_combos: int = 10,
+                               rng: Optional[np.random.Generator] = None) -> List[List[int]]:
     top = sorted(freq_abs.items(), key=lambda x: (-x[1], x[0]))
-    top_pool = [k for k,_ in top[:min(25, len(top))]]
-    combos, tries = [], 0
-    while len(combos) < n_combos and tries < 8000:
-        c = sorted(random.sample(top_pool, COMBINATION_SIZE))
-        if _validate_combo(c) and _meets_heuristics(c) and c not in combos:
-            combos.append(c)
-        tries += 1
-    return combos
+    top_pool = np.array([k for k,_ in top[:min(25, len(top))] if 1 <= k <= TOTAL_NUMBERS], dtype=np.int64)
+    if len(top_pool) < COMBINATION_SIZE:
+        _avisar_incompleta("frecuencia_pura", 0, n_combos)
+        return []
+    return _muestrear_uniforme([(top_pool, COMBINATION_SIZE)], n_combos, rng, "frecuencia_pura")
 
-def estrategia_equilibrio_hot_cold(freq_abs: Dict[int,int], hot_15: List[int], cold_15: List[int], n_combos: int = 10) -> List[List[int]]:
-    combos, tries = [], 0
-    pool_cold = cold_15[:]
-    pool_hot  = hot_15[:]
+def estrategia_equilibrio_hot_cold(freq_abs: Dict[int,int], hot_15: List[int], cold_15: List[int], n_combos: int = 10,
+                                   rng: Optional[np.random.Generator] = None) -> List[List[int]]:
+    pool_cold = np.unique(cold_15).astype(np.int64)
+    pool_hot  = np.unique(hot_15).astype(np.int64)
+    pool_cold = pool_cold[(pool_cold >= 1) & (pool_cold <= TOTAL_NUMBERS)]
+    pool_hot  = pool_hot[(pool_hot >= 1) & (pool_hot <= TOTAL_NUMBERS)]
     if len(pool_hot) < 3 or len(pool_cold) < 3:
-        return estrategia_frecuencia_pura(freq_abs, n_combos)
-    while len(combos) < n_combos and tries < 8000:
-        c = sorted(random.sample(pool_hot, 3) + random.sample(pool_cold, 3))
-        if _validate_combo(c) and _meets_heuristics(c) and c not in combos:
-            combos.append(c)
-        tries += 1
-    return combos
+        return estrategia_frecuencia_pura(freq_abs, n_combos, rng)
+    return _muestrear_uniforme([(pool_hot, 3), (pool_cold, 3)], n_combos, rng, "equilibrio_hot_cold")
 
-def estrategia_temporal_inteligente(freq_last: Dict[int,int], hot_cycle: List[int], n_combos: int = 10) -> List[List[int]]:
+def estrategia_temporal_inteligente(freq_last: Dict[int,int], hot_cycle: List[int], n_combos: int = 10,
+                                    rng: Optional[np.random.Generator] = None) -> List[List[int]]:
     keys = list(range(1, TOTAL_NUMBERS+1))
     weights = [freq_last.get(k, 0) + (1.5 if k in hot_cycle else 0.0) + 0.01 for k in keys]
-    combos, tries = [], 0
-    while len(combos) < n_combos and tries < 10000:
-        c = _weighted_choice(keys, weights, COMBINATION_SIZE)
-        c = sorted(c)
-        if _validate_combo(c) and _meets_heuristics(c) and c not in combos:
-            combos.append(c)
-        tries += 1
+    tope = max(10000, 20 * n_combos)
+    combos = _muestrear_validos(keys, weights, n_combos, tope, rng)
+    _avisar_incompleta("temporal_inteligente", len(combos), n_combos, intentos=tope)
     return combos
 
-def estrategia_patrones_detectados(pairs_top: List[Dict], trios_top: List[Dict], n_combos: int = 10) -> List[List[int]]:
-    combos, tries = [], 0
-    pairs = [tuple(p['pair']) for p in pairs_top]
-    trios = [tuple(t['trio']) for t in trios_top]
-    while len(combos) < n_combos and tries < 12000:
-        base = set()
-        if trios and random.random() < 0.6:
-            base.update(random.choice(trios))
-        guard = 0
-        while len(base) < 4 and pairs and guard < 10:
-            cand = random.choice(pairs)
-            if not (set(cand) & base):
-                base.update(cand)
-            guard += 1
-        rest = [x for x in range(1, TOTAL_NUMBERS+1) if x not in base]
-        random.shuffle(rest)
-        while len(base) < 6 and rest:
-            base.add(rest.pop())
-        c = sorted(list(base))[:6]
-        if _validate_combo(c) and _meets_heuristics(c) and c not in combos:
-            combos.append(c)
-        tries += 1
+def _lote_patrones(pairs: np.ndarray, trios: np.ndarray, lote: int, rng: np.random.Generator) -> np.ndarray:
+    """``lote`` intentos vectorizados de la construcción trío + pares + relleno aleatorio."""
+    inc = np.zeros((lote, TOTAL_NUMBERS + 1), dtype=bool)
+    filas = np.arange(lote)
+    if len(trios):
+        con_trio = rng.random(lote) < 0.6
+        t = trios[rng.integers(len(trios), size=lote)]
+        inc[filas[con_trio, None], t[con_trio]] = True
+    if len(pairs):
+        for _ in range(10):  # mismo tope ``guard`` que la versión escalar
+            cand = pairs[rng.integers(len(pairs), size=lote)]
+            libre = (inc.sum(axis=1) < 4) & ~inc[filas[:, None], cand].any(axis=1)
+            inc[filas[libre, None], cand[libre]] = True
+    # Relleno: primero lo ya elegido, luego números al azar sin repetir.
+    claves = rng.random((lote, TOTAL_NUMBERS + 1))
+    claves[inc] = -1.0
+    claves[:, 0] = np.inf
+    return np.sort(np.argpartition(claves, COMBINATION_SIZE - 1, axis=1)[:, :COMBINATION_SIZE], axis=1)
+
+def estrategia_patrones_detectados(pairs_top: List[Dict], trios_top: List[Dict], n_combos: int = 10,
+                                   rng: Optional[np.random.Generator] = None) -> List[List[int]]:
+    rng = rng if rng is not None else np.random.default_rng()
+    pairs = np.array([p['pair'] for p in pairs_top], dtype=np.int64).reshape(-1, 2)
+    trios = np.array([t['trio'] for t in trios_top], dtype=np.int64).reshape(-1, 3)
+    pairs = pairs[((pairs >= 1) & (pairs <= TOTAL_NUMBERS)).all(axis=1) & (pairs[:, 0] != pairs[:, 1])]
+    trios = trios[((trios >= 1) & (trios <= TOTAL_NUMBERS)).all(axis=1)
+                  & (np.diff(np.sort(trios, axis=1), axis=1) > 0).all(axis=1)]
+    tope = max(12000, 20 * n_combos)
+    combos = _muestrear_por_lotes(lambda lote: _lote_patrones(pairs, trios, lote, rng), n_combos, tope)
+    _avisar_incompleta("patrones_detectados", len(combos), n_combos, intentos=tope)
     return combos
 
-def estrategia_random_ponderado(freq_abs: Dict[int,int], n_combos: int = 10) -> List[List[int]]:
+def estrategia_random_ponderado(freq_abs: Dict[int,int], n_combos: int = 10,
+                                rng: Optional[np.random.Generator] = None) -> List[List[int]]:
     keys = list(range(1, TOTAL_NUMBERS+1))
     raw = [freq_abs.get(k, 0) + 0.01 for k in keys]
-    combos, tries = [], 0
-    while len(combos) < n_combos and tries < 8000:
-        c = _weighted_choice(keys, raw, COMBINATION_SIZE)
-        c = sorted(c)
-        if _validate_combo(c) and _meets_heuristics(c) and c not in combos:
-            combos.append(c)
-        tries += 1
+    tope = max(8000, 20 * n_combos)
+    combos = _muestrear_validos(keys, raw, n_combos, tope, rng)
+    _avisar_incompleta("random_ponderado", len(combos), n_combos, intentos=tope)
     return combos
 
 # Scoring ML
@@ -152,14 +254,200 @@ def score_combo_ml(combo: List[int], probs: Dict[int, float]) -> float:
         penalty_bucket += (3 - cobertura) * 2.0
     return float(ll - penalty_sum - penalty_parity - penalty_consec - penalty_bucket)
 
-def rankear_combos_ml(combos: List[List[int]], probs: Dict[int, float]):
-    scored = []
-    seen = set()
-    for c in combos:
-        t = tuple(sorted(c))
-        if t in seen: 
-            continue
-        seen.add(t)
-        scored.append((list(t), score_combo_ml(list(t), probs)))
-    scored.sort(key=lambda x: x[1], reverse=True)
-    return scored
+# Bucket de cada número empaquetado en 3 bits (1 << 3*bucket); 0 fuera de 1..45.
+_BUCKET_BITS = np.zeros(256, dtype=np.int32)
+_BUCKET_BITS[1:46] = 1 << (3 * ((np.arange(1, 46) - 1) // 9))
+
+def _log_probs(probs) -> np.ndarray:
+    """Tabla de log-probabilidades indexable por número (0..255) para ``score_combos_ml``.
+
+    ``probs`` puede ser el dict ``{numero: p}`` o un vector de 45 valores
+    (posición ``i`` ↔ número ``i + 1``); los números ausentes valen ``eps``.
+    """
+    eps = 1e-9
+    p = np.full(256, eps, dtype=np.float64)
+    if isinstance(probs, dict):
+        for k, v in probs.items():
+            p[int(k)] = v
+    else:
+        v = np.asarray(probs, dtype=np.float64)
+        p[1:len(v) + 1] = v
+    return np.log(np.maximum(p, eps))
+
+def _componentes_ml(combos, probs) -> Dict[str, np.ndarray]:
+    c = np.sort(np.asarray(combos).reshape(-1, COMBINATION_SIZE), axis=1).astype(np.int16)
+    lp = probs if isinstance(probs, np.ndarray) and probs.shape == (256,) else _log_probs(probs)
+    ll = lp[c].sum(axis=1) * 10.0
+    penalty_sum = np.abs(135 - c.sum(axis=1, dtype=np.int64)) * 1.0
+    ev = (c % 2 == 0).sum(axis=1)
+    penalty_parity = np.abs(ev - (COMBINATION_SIZE - ev)) * 2.0
+    consec = (np.diff(c, axis=1) == 1).sum(axis=1)
+    penalty_consec = np.maximum(0, consec - 1) * 3.0
+    packed = _BUCKET_BITS[c].sum(axis=1)
+    buckets = np.stack([(packed >> (3 * b)) & 7 for b in range(5)], axis=1)
+    cobertura = (buckets > 0).sum(axis=1)
+    mx = buckets.max(axis=1)
+    penalty_bucket = np.where(mx > 3, (mx - 3) * 2.0, 0.0) + np.where(cobertura < 3, (3 - cobertura) * 2.0, 0.0)
+    return {'log_verosimilitud': ll, 'pen_suma': penalty_sum, 'pen_paridad': penalty_parity,
+            'pen_consecutivos': penalty_consec, 'pen_rangos': penalty_bucket}
+
+def score_combos_ml(combos, probs) -> np.ndarray:
+    """``score_combo_ml`` vectorizado sobre una matriz (N × 6); mismo resultado fila a fila."""
+    p = _componentes_ml(combos, probs)
+    return p['log_verosimilitud'] - p['pen_suma'] - p['pen_paridad'] - p['pen_consecutivos'] - p['pen_rangos']
+
+def explicar_score_ml(combo: List[int], probs) -> Dict[str, float]:
+    """Desglose del score ML: 10·Σlog p menos cada penalización."""
+    p = _componentes_ml([combo], probs)
+    out = {k: float(v[0]) for k, v in p.items()}
+    out['score'] = float(score_combos_ml([combo], probs)[0])
+    return out
+
+def _codificar(combos: np.ndarray) -> np.ndarray:
+    """Código entero único por combinación ordenada (6 dígitos en base 64)."""
+    c = np.asarray(combos, dtype=np.int64)
+    return (c << (6 * np.arange(c.shape[1] - 1, -1, -1))).sum(axis=1)
+
+def _top_indices(scores: np.ndarray, top_n: Optional[int]) -> np.ndarray:
+    """Índices de los ``top_n`` mayores (argpartition), orden estable por score desc."""
+    idx = np.arange(len(scores))
+    if top_n is not None and top_n < len(scores):
+        if top_n <= 0:
+            return idx[:0]
+        kth = scores[np.argpartition(-scores, top_n - 1)[top_n - 1]]
+        mayores = np.flatnonzero(scores > kth)
+        # argpartition elige empates al azar: en el corte gana el índice menor.
+        idx = np.concatenate([mayores, np.flatnonzero(scores == kth)[:top_n - len(mayores)]])
+    return idx[np.lexsort((idx, -scores[idx]))]
+
+def rankear_combos_ml(combos: List[List[int]], probs: Dict[int, float], top_n: Optional[int] = None):
+    if len(combos) == 0:
+        return []
+    arr = np.sort(np.asarray(combos, dtype=np.int64).reshape(-1, COMBINATION_SIZE), axis=1)
+    _, first = np.unique(_codificar(arr), return_index=True)
+    arr = arr[np.sort(first)]
+    scores = score_combos_ml(arr, probs)
+    top = _top_indices(scores, top_n)
+    return [(arr[i].tolist(), float(scores[i])) for i in top]
+
+def mejores_combos_ml(combos, probs, top_n: int = 10, chunk: int = 1 << 20):
+    """Top-N por score ML sobre una matriz (N × 6) grande, p. ej. ``CombinationTable.combos``.
+
+    Se puntúa por bloques (la tabla memmap no se carga entera) y se conserva
+    el top-N de cada bloque con argpartition. Devuelve ``[(combo, score)]``.
+    """
+    lp = _log_probs(probs)
+    best_c, best_s = [], []
+    for i in range(0, len(combos), chunk):
+        bloque = np.asarray(combos[i:i + chunk])
+        sc = score_combos_ml(bloque, lp)
+        top = _top_indices(sc, top_n)
+        best_c.append(bloque[top])
+        best_s.append(sc[top])
+    if not best_c:
+        return []
+    c, sc = np.concatenate(best_c), np.concatenate(best_s)
+    top = _top_indices(sc, top_n)
+    return [(c[i].astype(int).tolist(), float(sc[i])) for i in top]
+
+def top_combos_ml_exacto(probs, top_n: int = 10, semilla_pool: int = 20, lote: int = 64, candidatas=None):
+    """Las ``top_n`` mejores combinaciones bajo ``score_combo_ml`` (búsqueda exacta).
+
+    Ramificación y poda vectorizada: cada prefijo ordenado se acota con su
+    log-verosimilitud más la de los mejores números restantes y con cotas
+    inferiores de cada penalización (suma alcanzable, paridad, consecutivos
+    ya formados, buckets saturados o sin cobertura posible). La cota inicial
+    sale de puntuar todas las combinaciones de los ``semilla_pool`` números
+    más probables; luego los prefijos de dos números se expanden por lotes en
+    orden lexicográfico y cada lote endurece el umbral. Los empates (hasta
+    1e-9) se resuelven en orden lexicográfico. ``candidatas`` (p. ej. el
+    top-N de un cálculo previo con probabilidades parecidas) se suman a ese
+    pool: no cambian el resultado, sólo endurecen la cota inicial. Devuelve
+    ``[(combo, score)]`` igual que ``rankear_combos_ml``.
+    """
+    N, K = TOTAL_NUMBERS, COMBINATION_SIZE
+    tol = 1e-9
+    lp = _log_probs(probs)
+    lp10 = lp[:N + 1] * 10.0
+    nums = np.arange(1, N + 1)
+
+    # best[r, m]: mayor suma de r valores de lp10 entre los números > m.
+    m_ = np.arange(N + 1)
+    mayores = -np.sort(-np.where(m_[None, :] > m_[:, None], lp10[None, :], -np.inf), axis=1)[:, :K]
+    best = np.vstack([np.zeros(N + 1), np.cumsum(mayores, axis=1).T])
+    r_ = np.arange(K + 1)[:, None]
+    minsum = r_ * m_[None, :] + r_ * (r_ + 1) // 2
+    maxsum = np.array([sum(range(N - r + 1, N + 1)) for r in range(K + 1)])
+    fin_bucket = np.array([min(9 * b + 9, N) for b in range(5)])
+
+    def expandir(st: Dict[str, np.ndarray], j: int) -> Dict[str, np.ndarray]:
+        """Añade el j-ésimo número a cada prefijo y calcula su cota superior."""
+        fila, col = np.nonzero(nums[None, :] > st['last'][:, None])
+        x = col + 1
+        b = st['buckets'][fila].copy()
+        b[np.arange(len(x)), (x - 1) // 9] += 1
+        nuevo = {'combos': np.hstack([st['combos'][fila], x[:, None].astype(np.int16)]),
+                 'll': st['ll'][fila] + lp10[x],
+                 'suma': st['suma'][fila] + x,
+                 'ev': st['ev'][fila] + (x % 2 == 0),
+                 'consec': st['consec'][fila] + ((x == st['last'][fila] + 1) & (j > 1)),
+                 'buckets': b,
+                 'last': x}
+        r = K - j
+        lo = nuevo['suma'] + minsum[r][x]
+        hi = nuevo['suma'] + maxsum[r]
+        lb_sum = np.maximum(0, np.maximum(lo - 135, 135 - hi)) * 1.0
+        ev, mitad = nuevo['ev'], K // 2
+        lb_par = np.where(ev > mitad, ev - mitad, np.where(ev + r < mitad, mitad - (ev + r), 0)) * 4.0
+        lb_con = np.maximum(0, nuevo['consec'] - 1) * 3.0
+        cubiertos = b > 0
+        libres = (~cubiertos & (fin_bucket[None, :] > x[:, None])).sum(axis=1)
+        cob_max = cubiertos.sum(axis=1) + np.minimum(r, libres)
+        mx = b.max(axis=1)
+        lb_buc = np.where(mx > 3, (mx - 3) * 2.0, 0.0) + np.where(cob_max < 3, (3 - cob_max) * 2.0, 0.0)
+        nuevo['cota'] = nuevo['ll'] + best[r][x] - lb_sum - lb_par - lb_con - lb_buc
+        return nuevo
+
+    def filtrar(st: Dict[str, np.ndarray], keep: np.ndarray) -> Dict[str, np.ndarray]:
+        return {k: v[keep] for k, v in st.items()}
+
+    # Cota inicial: el top-N del pool es una cota inferior del top-N real.
+    seeds = np.sort(np.argsort(-lp10[1:], kind='stable')[:max(K, semilla_pool)] + 1)
+    pool = seeds[todas_combinaciones(len(seeds), K)]
+    if candidatas is not None and len(candidatas):
+        pool = np.vstack([pool, np.sort(np.asarray(candidatas, dtype=np.int64).reshape(-1, K), axis=1)])
+        pool = pool[np.unique(_codificar(pool), return_index=True)[1]]  # el piso exige filas distintas
+    pool_scores = score_combos_ml(pool, lp)
+    piso = -np.inf
+    if top_n <= len(pool_scores):
+        piso = np.partition(pool_scores, len(pool_scores) - top_n)[len(pool_scores) - top_n] - tol
+
+    st = {'combos': np.zeros((1, 0), dtype=np.int16), 'll': np.zeros(1), 'suma': np.zeros(1, dtype=np.int64),
+          'ev': np.zeros(1, dtype=np.int64), 'consec': np.zeros(1, dtype=np.int64),
+          'buckets': np.zeros((1, 5), dtype=np.int64), 'last': np.zeros(1, dtype=np.int64)}
+    for j in (1, 2):
+        st = expandir(st, j)
+        st = filtrar(st, st['cota'] >= piso)
+
+    top_c = np.zeros((0, K), dtype=np.int16)
+    top_s = np.zeros(0)
+    # Lotes crecientes: los primeros fijan pronto un umbral estricto. Con
+    # ``candidatas`` el piso ya es ajustado y se va directo a lotes completos.
+    i, paso = 0, lote if candidatas is not None and len(candidatas) else 1
+    while i < len(st['last']):
+        sub = filtrar(st, slice(i, i + paso))
+        i, paso = i + paso, min(lote, paso * 2)
+        for j in range(3, K + 1):
+            sub = expandir(sub, j)
+            if len(top_s) >= top_n:
+                # Lo ya encontrado es lexicográficamente anterior: los empates pierden.
+                keep = sub['cota'] > top_s[-1] + tol
+            else:
+                keep = sub['cota'] >= piso
+            sub = filtrar(sub, keep)
+        if len(sub['last']):
+            c = np.vstack([top_c, sub['combos']])
+            sc = np.concatenate([top_s, score_combos_ml(sub['combos'], lp)])
+            top = _top_indices(sc, top_n)
+            top_c, top_s = c[top], sc[top]
+    return [(c.astype(int).tolist(), float(s_)) for c, s_ in zip(top_c, top_s)]
@@ -1,11 +1,23 @@
-"""Interfaz de consola (menú) para el sistema Tinka con opción ML."""
+"""Interfaz de consola (menú) para el sistema Tinka con opción ML.
+
+Sin argumentos abre el menú interactivo; con un subcomando corre en modo
+batch y escribe JSON Lines o CSV en stdout (``python main.py --help``).
+"""
 from __future__ import annotations
+from itertools import islice
 from pathlib import Path
-import pandas as pd
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+import argparse
+import csv
+import json
+import os
+import sys
+import warnings
+import numpy as np
 
-from config import DATA_DIR, COMBOS_FILE
-from db_connector import get_data, refresh_cache
-from analizador import analisis_completo, analisis_frecuencias, analisis_temporal
+from config import DATA_DIR, COMBOS_DB, COMBINATION_SIZE, TOTAL_NUMBERS
+from db_connector import get_draws, sync_cache
+from analizador import analisis_completo, analisis_frecuencias, analisis_gaps, Coocurrencias, WindowIndex
 from generador import (
     estrategia_frecuencia_pura,
     estrategia_equilibrio_hot_cold,
@@ -13,16 +25,35 @@ from generador import (
     estrategia_patrones_detectados,
     estrategia_random_ponderado,
     rankear_combos_ml,
+    mejores_combos_ml,
+    top_combos_ml_exacto,
+    explicar_score_ml,
+    score_combos_ml,
+    _componentes_ml,
+    _log_probs,
+    GeneracionIncompleta,
 )
-from utils import parse_numbers, save_json, load_json
-from visualizador import render_ascii_hist, html_report
+from utils import parse_numbers
+from matriz import DrawMatrix, Sorteos, as_draw_matrix
+from estado import AnalysisState, STATE_FILE, load_state
+from visualizador import render_ascii_hist
 from ml import (
     beta_binomial_posteriors,
     beta_binomial_posteriors_ewma,
     blend_probabilities,
     save_probabilities,
-    thompson_sampling_pool,
 )
+from mascaras import distribucion_aciertos, historial_ticket
+from registro import agregar, compactar, consultar, resumen
+
+# Estado incremental del histórico cargado; se sincroniza en cada refresh.
+_ESTADO: Optional[AnalysisState] = None
+
+def _analisis(df: Sorteos):
+    """``analisis_completo`` servido por el estado incremental cuando cubre ``df``."""
+    if _ESTADO is not None and _ESTADO.cubre(df):
+        return _ESTADO.analisis_completo()
+    return analisis_completo(df)
 
 def pause():
     input("\nPresiona ENTER para continuar...")
@@ -38,8 +69,9 @@ def _int_input_default(prompt: str, default: int) -> int:
     except Exception:
         return default
 
-def show_dashboard(df: pd.DataFrame):
-    stats = analisis_completo(df)
+def show_dashboard(df: Sorteos):
+    from visualizador import html_report  # matplotlib sólo al exportar
+    stats = _analisis(df)
     print("\n=== DASHBOARD RÁPIDO ===\n")
     frec = stats['frecuencias']
     print("Top 15 calientes:", frec['hot_15'])
@@ -53,7 +85,7 @@ def show_dashboard(df: pd.DataFrame):
     out_html.write_text(html_report(stats), encoding="utf-8")
     print(f"\nReporte HTML exportado en: {out_html}")
 
-def analisis_por_numero(df: pd.DataFrame):
+def analisis_por_numero(df: Sorteos):
     try:
         n = int(input("Número (1-45): ").strip())
     except Exception:
@@ -65,18 +97,24 @@ def analisis_por_numero(df: pd.DataFrame):
     fr = frec['freq_rel'].get(n, 0.0)
     ult10 = n in frec['en_racha_ult10']
     dorm = n in frec['dormidos_mas20']
-    print(f"\nNúmero {n}: freq_abs={fa}, freq_rel={fr:.4f}, en_racha_ult10={ult10}, dormido>20={dorm}\n")
+    print(f"\nNúmero {n}: freq_abs={fa}, freq_rel={fr:.4f}, en_racha_ult10={ult10}, dormido>20={dorm}")
+    g = analisis_gaps(df)['por_numero'][n]
+    print(f"Gaps (sorteos): medio={g['gap_medio']}, mediano={g['gap_mediano']}, "
+          f"máx={g['gap_max']}, actual={g['gap_actual']}")
+    print(f"Gaps (días)   : medio={g['gap_medio_dias']}, mediano={g['gap_mediano_dias']}, "
+          f"máx={g['gap_max_dias']}, actual={g['gap_actual_dias']}")
+    compa = Coocurrencias.from_draws(df).companeros(n, k=5)
+    print("Sale más junto a:", ", ".join(f"{m:02d} ({c})" for m, c in compa) or "-", "\n")
 
 def _imprimir_combos(combos):
     for i, c in enumerate(combos, 1):
         print(f"{i:02d})", " ".join(f"{x:02d}" for x in c))
 
-def generar_combinaciones(df: pd.DataFrame):
-    stats = analisis_completo(df)
+def generar_combinaciones(df: Sorteos):
+    stats = _analisis(df)
     frec = stats['frecuencias']
     cooc = stats['coocurrencias']
-    temp = analisis_temporal(df)
-    last50 = temp['ventanas']['50']
+    last50 = WindowIndex.from_draws(df).ultimos(50)
 
     print("\nEstrategias:")
     print(" 1) Frecuencia pura")
@@ -88,42 +126,45 @@ def generar_combinaciones(df: pd.DataFrame):
 
     n = _int_input_default("¿Cuántas combinaciones quieres generar? [10 por defecto]: ", 10)
 
-    combos = []
-    if op == "1":
-        combos = estrategia_frecuencia_pura(frec['freq_abs'], n_combos=n)
-        etiqueta = "frecuencia_pura"
-    elif op == "2":
-        combos = estrategia_equilibrio_hot_cold(frec['freq_abs'], frec['hot_15'], frec['cold_15'], n_combos=n)
-        etiqueta = "equilibrio_hot_cold"
-    elif op == "3":
-        combos = estrategia_temporal_inteligente(last50['freq_abs'], last50['hot_15'], n_combos=n)
-        etiqueta = "temporal_inteligente_50"
-    elif op == "4":
-        combos = estrategia_patrones_detectados(cooc['pairs_top20'], cooc['trios_top20'], n_combos=n)
-        etiqueta = "patrones_detectados"
-    elif op == "5":
-        combos = estrategia_random_ponderado(frec['freq_abs'], n_combos=n)
-        etiqueta = "random_ponderado"
-    else:
+    combos, etiqueta = [], None
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", GeneracionIncompleta)
+        if op == "1":
+            combos = estrategia_frecuencia_pura(frec['freq_abs'], n_combos=n)
+            etiqueta = "frecuencia_pura"
+        elif op == "2":
+            combos = estrategia_equilibrio_hot_cold(frec['freq_abs'], frec['hot_15'], frec['cold_15'], n_combos=n)
+            etiqueta = "equilibrio_hot_cold"
+        elif op == "3":
+            combos = estrategia_temporal_inteligente(last50['freq_abs'], last50['hot_15'], n_combos=n)
+            etiqueta = "temporal_inteligente_50"
+        elif op == "4":
+            combos = estrategia_patrones_detectados(cooc['pairs_top20'], cooc['trios_top20'], n_combos=n)
+            etiqueta = "patrones_detectados"
+        elif op == "5":
+            combos = estrategia_random_ponderado(frec['freq_abs'], n_combos=n)
+            etiqueta = "random_ponderado"
+    if etiqueta is None:
         print("Opción no válida"); return
 
     if not combos:
         print("\nNo se pudieron generar combinaciones."); return
+    if len(combos) < n:
+        print(f"\nSólo {len(combos)} de {n} combinaciones distintas cumplen las restricciones.")
 
     print("\n=== Combinaciones sugeridas ===\n")
     _imprimir_combos(combos)
 
-    record = load_json(COMBOS_FILE, default=[])
-    record.append({"estrategia": etiqueta, "n": n, "combos": combos})
-    save_json(COMBOS_FILE, record)
-    print(f"\nGuardado en {COMBOS_FILE}")
+    agregar({"estrategia": etiqueta, "n": n, "combos": combos})
+    print(f"\nGuardado en {COMBOS_DB}")
 
-def comparar_mi_combinacion(df: pd.DataFrame):
+
+def comparar_mi_combinacion(df: Sorteos):
     s = input("Ingresa tus 6 números separados por espacio: ").strip()
     arr = sorted(parse_numbers(s))
     if len(arr) != 6 or min(arr) < 1 or max(arr) > 45 or len(set(arr)) != 6:
         print("Entrada inválida"); return
-    stats = analisis_completo(df)
+    stats = _analisis(df)
     frec = stats['frecuencias']
     hot = set(frec['hot_15'])
     cold = set(frec['cold_15'])
@@ -140,16 +181,24 @@ def comparar_mi_combinacion(df: pd.DataFrame):
     print("En HOT         :", in_hot)
     print("En COLD        :", in_cold)
     print("Puntuación (sum freq_abs):", score)
+    hist = historial_ticket(arr, df, minimo=3)
+    dist = hist['distribucion']
+    print(f"\nEn {sum(dist)} sorteos históricos habría acertado: "
+          + "  ".join(f"{k}: {dist[k]}" for k in range(3, len(dist))))
+    for row in hist['sorteos'][:10]:
+        print(f"  {row['fecha']}  id={row['id_sorteo']}  "
+              f"{' '.join(f'{x:02d}' for x in row['numeros'])}  aciertos={row['aciertos']}")
 
-def ver_mejores_historicas(df: pd.DataFrame):
-    frec = analisis_frecuencias(df)['freq_abs']
+def ver_mejores_historicas(df: Sorteos):
+    dm = as_draw_matrix(df)
+    frec = analisis_frecuencias(dm)['freq_abs']
     rows = []
-    for _, r in df.iterrows():
-        arr = sorted(parse_numbers(r['numeros']))
+    for id_sorteo, fecha, row in zip(dm.id_sorteo.tolist(), dm.fecha_sorteo.tolist(), dm.numeros.tolist()):
+        arr = [x for x in row if x]
         s = sum(arr)
         score = sum(frec.get(x,0) for x in arr)
         penal = abs(135 - s)
-        rows.append({"id_sorteo": int(r['id_sorteo']), "fecha": str(r['fecha_sorteo']),
+        rows.append({"id_sorteo": int(id_sorteo), "fecha": str(fecha),
                      "combo": " ".join(f"{x:02d}" for x in arr),
                      "suma": s, "score": score - penal})
     top = sorted(rows, key=lambda x: x['score'], reverse=True)[:10]
@@ -157,60 +206,112 @@ def ver_mejores_historicas(df: pd.DataFrame):
     for i, row in enumerate(top, 1):
         print(f"{i:02d}) {row['fecha']}  id={row['id_sorteo']}  {row['combo']}  score={row['score']:.2f}")
 
-def exportar_analisis(df: pd.DataFrame):
-    html = html_report(analisis_completo(df))
+def exportar_analisis(df: Sorteos):
+    from visualizador import html_report  # matplotlib sólo al exportar
+    html = html_report(_analisis(df))
     out = DATA_DIR / "reporte.html"
     out.write_text(html, encoding="utf-8")
     print(f"Reporte exportado en {out}")
 
+def _sincronizar() -> Tuple[DrawMatrix, Dict]:
+    """``sync_cache`` + estado incremental; devuelve el histórico y el resumen.
+
+    El estado en memoria se sincroniza en el lugar; el guardado en disco sólo
+    se lee la primera vez (como ``load_state``, pero contando lo absorbido).
+    """
+    global _ESTADO
+    sync = sync_cache()
+    df = sync["datos"]
+    dm = DrawMatrix.from_frame(df)
+    if _ESTADO is None:
+        _ESTADO = AnalysisState.load(STATE_FILE) or AnalysisState()
+    incorporados = _ESTADO.sync(dm)
+    if incorporados or not STATE_FILE.exists():
+        try:
+            _ESTADO.save(STATE_FILE)
+        except OSError:
+            pass  # despliegues de sólo lectura: el estado vive en memoria
+    return dm, {"modo": sync["modo"], "consultas": sync["consultas"], "nuevos": sync["nuevos"],
+                "incorporados": incorporados, "registros": len(df)}
+
 def actualizar_cache():
-    df = refresh_cache()
-    print(f"Cache actualizado. Registros: {len(df)}")
+    dm, r = _sincronizar()
+    print(f"Sincronización {r['modo']} ({r['consultas']} consultas, {r['nuevos']} filas traídas).")
+    print(f"Sorteos nuevos incorporados: {r['incorporados']}")
+    print(f"Cache actualizado. Registros: {r['registros']}")
+    return dm
 
-# -- Opción 8: Recomendación automática (ML)
-def recomendacion_ml_menu(df: pd.DataFrame):
-    print("\nCalculando probabilidades bayesianas (global + reciente)...")
+def _probabilidades(df: Sorteos):
+    """Posteriores global y reciente y su mezcla (mismos parámetros que la opción 8)."""
     posts_global = beta_binomial_posteriors(df, prior_strength=30.0, p0=(6.0/45.0))
     posts_recent = beta_binomial_posteriors_ewma(df, halflife_draws=50, prior_strength=15.0, p0=(6.0/45.0))
-    probs_blend = blend_probabilities(posts_global, posts_recent, w_recent=0.30)
+    return posts_global, posts_recent, blend_probabilities(posts_global, posts_recent, w_recent=0.30)
+
+# -- Opción 8: Recomendación automática (ML)
+def recomendacion_ml_menu(df: Sorteos):
+    from orquestador import generar_pool  # pools de procesos: sólo si se usa
+    print("\nCalculando probabilidades bayesianas (global + reciente)...")
+    posts_global, posts_recent, probs_blend = _probabilidades(df)
     save_probabilities(posts_global, posts_recent, probs_blend)
 
     n = _int_input_default("¿Cuántas recomendaciones quieres? [1 por defecto]: ", 1)
+    modo = input("Modo: 1) Exacto (determinista)  2) Muestreo por estrategias  [1]: ").strip() or "1"
 
-    stats = analisis_completo(df)
-    frec = stats['frecuencias']
-    cooc = stats['coocurrencias']
-    temp = analisis_temporal(df)
-    last50 = temp['ventanas']['50']
-
-    pool = []
-    N = max(10, n * 12)
-    pool += estrategia_equilibrio_hot_cold(frec['freq_abs'], frec['hot_15'], frec['cold_15'], n_combos=N)
-    pool += estrategia_temporal_inteligente(last50['freq_abs'], last50['hot_15'], n_combos=N)
-    pool += estrategia_random_ponderado(frec['freq_abs'], n_combos=N // 2)
-    pool += estrategia_patrones_detectados(cooc['pairs_top20'], cooc['trios_top20'], n_combos=max(5, n*6))
+    if modo == "1":
+        topn = top_combos_ml_exacto(probs_blend, top_n=n)
+        etiqueta = "auto_ml_exacto"
+        extra = {}
+    else:
+        stats = _analisis(df)
+        frec = stats['frecuencias']
+        cooc = stats['coocurrencias']
+        last50 = WindowIndex.from_draws(df).ultimos(50)
 
-    # Thompson Sampling extra (con posts recientes para mayor reactividad)
-    from ml import thompson_sampling_pool
-    pool += thompson_sampling_pool(posts_recent, n_combos=max(10, n*10), k=6)
+        semilla = input("Semilla para reproducir el resultado (vacío = aleatoria): ").strip()
+        res = generar_pool(frec, last50, cooc, posts_recent, objetivo=max(10000, n * 1000),
+                           seed=int(semilla) if semilla.isdigit() else None, presupuesto_s=10.0)
+        pool = res['pool']
+        print(f"Pool: {len(pool)} candidatas en {res['tiempo_s']:.2f}s ({res['workers']} procesos). Semilla: {res['seed']}")
+        if res['omitidas']:
+            print(f"Fuera de presupuesto: {', '.join(res['omitidas'])}")
 
-    if not pool:
-        print("No se pudieron generar candidatas. Actualiza la base y reintenta."); return
+        if not pool:
+            print("No se pudieron generar candidatas. Actualiza la base y reintenta."); return
 
-    ranked = rankear_combos_ml(pool, probs_blend)
-    topn = ranked[:n]
+        topn = rankear_combos_ml(pool, probs_blend, top_n=n)
+        etiqueta = "auto_ml"
+        extra = {"seed": str(res['seed'])}
 
     print("\n=== Recomendación automática (ML) ===\n")
     for i, (combo, score) in enumerate(topn, 1):
         print(f"{i:02d})", " ".join(f"{x:02d}" for x in combo), f"   score={score:.2f}")
+        e = explicar_score_ml(combo, probs_blend)
+        print(f"     10·Σlog p={e['log_verosimilitud']:.2f}  pen. suma={e['pen_suma']:.0f}  "
+              f"paridad={e['pen_paridad']:.0f}  consecutivos={e['pen_consecutivos']:.0f}  rangos={e['pen_rangos']:.0f}")
 
-    record = load_json(COMBOS_FILE, default=[])
-    record.append({"estrategia": "auto_ml", "n": n,
-                   "ranked": [{"combo": c, "score": float(s)} for (c, s) in topn]})
-    save_json(COMBOS_FILE, record)
-    print(f"\nGuardado en {COMBOS_FILE}")
+    agregar({"estrategia": etiqueta, "n": n, **extra,
+             "ranked": [{"combo": c, "score": float(s)} for (c, s) in topn]})
+    print(f"\nGuardado en {COMBOS_DB}")
+
+# -- Opción 9: Backtest walk-forward
+def backtest_menu(df: Sorteos):
+    from backtest import backtest
+    n_tickets = _int_input_default("Tickets por estrategia y sorteo [10 por defecto]: ", 10)
+    inicio = _int_input_default("Sorteos de calentamiento antes de evaluar [100 por defecto]: ", 100)
+    semilla = input("Semilla (vacío = aleatoria): ").strip()
+    print("\nEvaluando sorteo a sorteo...")
+    res = backtest(df, n_tickets=n_tickets, inicio=inicio, seed=int(semilla) if semilla.isdigit() else None)
+    print(f"\n=== Backtest: {res['sorteos_evaluados']} sorteos, {res['tiempo_s']:.1f}s "
+          f"({res['workers']} procesos, semilla {res['seed']}) ===\n")
+    print(f"{'estrategia':<22} {'media':>6} {'3+':>8}   aciertos 0..6")
+    for nombre, r in res['estrategias'].items():
+        if r['tickets']:
+            print(f"{nombre:<22} {r['media_aciertos']:>6.3f} {r['tasa_3_o_mas']:>8.4f}   {r['distribucion']}")
+    az = res['azar_teorico']
+    print(f"{'(azar teórico)':<22} {az['media_aciertos']:>6.3f} {az['tasa_3_o_mas']:>8.4f}")
 
 def main():
+    global _ESTADO
     print("""====================================================
    SISTEMA DE ANÁLISIS Y PREDICCIÓN — TINKA
    (Educativo/Estadístico) — by tu asesor
@@ -218,10 +319,12 @@ def main():
 AVISO: La lotería es aleatoria. Este sistema NO garantiza aciertos.
 Usa la información con responsabilidad.
 """ )
-    df = get_data(use_cache=True)
-    if len(df)==0:
+    # La caché binaria trae los números ya parseados: arrancar no depende del histórico.
+    dm = get_draws(use_cache=True)
+    if len(dm)==0:
         print("No hay datos en la base. Ejecuta tu scraper primero.")
         return
+    _ESTADO = load_state(dm)
     while True:
         print("""Menú:
  1) Ver dashboard completo de estadísticas
@@ -232,19 +335,285 @@ Usa la información con responsabilidad.
  6) Exportar análisis a HTML
  7) Actualizar datos desde BD (refresh cache)
  8) Recomendación automática (ML)
+ 9) Backtest de estrategias (walk-forward)
  0) Salir
 """ )
         op = input("Elige opción: ").strip()
-        if op == "1": show_dashboard(df); pause()
-        elif op == "2": analisis_por_numero(df); pause()
-        elif op == "3": generar_combinaciones(df); pause()
-        elif op == "4": comparar_mi_combinacion(df); pause()
-        elif op == "5": ver_mejores_historicas(df); pause()
-        elif op == "6": exportar_analisis(df); pause()
-        elif op == "7": df = refresh_cache(); print("Datos recargados."); pause()
-        elif op == "8": recomendacion_ml_menu(df); pause()
+        if op == "1": show_dashboard(dm); pause()
+        elif op == "2": analisis_por_numero(dm); pause()
+        elif op == "3": generar_combinaciones(dm); pause()
+        elif op == "4": comparar_mi_combinacion(dm); pause()
+        elif op == "5": ver_mejores_historicas(dm); pause()
+        elif op == "6": exportar_analisis(dm); pause()
+        elif op == "7": dm = actualizar_cache(); print("Datos recargados."); pause()
+        elif op == "8": recomendacion_ml_menu(dm); pause()
+        elif op == "9": backtest_menu(dm); pause()
         elif op == "0": print("¡Hasta luego!"); break
         else: print("Opción inválida")
 
+# -- Modo batch: ``python main.py <subcomando>`` (sin menú, salida por stdout)
+_BLOQUE = 50_000  # filas por bloque al leer, puntuar y escribir
+_PARAMS_ML = {"prior_global": 30.0, "prior_reciente": 15.0, "w_recent": 0.30}
+
+def _a_json(x):
+    if isinstance(x, np.generic):
+        return x.item()
+    if isinstance(x, np.ndarray):
+        return x.tolist()
+    return str(x)
+
+def _emitir(filas: Iterable[Dict], formato: str = "jsonl", out: Optional[TextIO] = None) -> int:
+    """Escribe ``filas`` a medida que llegan, como JSON Lines o CSV (listas como ``"1 2 3"``)."""
+    out = out or sys.stdout
+    escritor, n = None, 0
+    for fila in filas:
+        if formato == "csv":
+            fila = {k: " ".join(map(str, v)) if isinstance(v, list) else v for k, v in fila.items()}
+            if escritor is None:
+                escritor = csv.DictWriter(out, fieldnames=list(fila), lineterminator="\n")
+                escritor.writeheader()
+            escritor.writerow(fila)
+        else:
+            out.write(json.dumps(fila, ensure_ascii=False, default=_a_json) + "\n")
+        n += 1
+    out.flush()
+    return n
+
+def _avisar(msg: str) -> None:
+    print(msg, file=sys.stderr)
+
+def _cargar() -> DrawMatrix:
+    global _ESTADO
+    dm = get_draws(use_cache=True)
+    if len(dm):
+        _ESTADO = load_state(dm)
+    return dm
+
+def _leer_tickets(fuente: TextIO) -> Iterator[Tuple[int, Optional[List[int]], str]]:
+    """``(línea, combo o None, texto)`` por cada línea con números de ``fuente``.
+
+    Acepta ``1 5 9 22 30 41``, ``1,5,9,22,30,41`` (o una fila CSV cuyo primer
+    campo sea la combinación, como la que escribe ``generate --format csv``)
+    y JSON Lines con ``combo``/``numeros``. Las líneas sin números (vacías,
+    cabeceras) se saltan; ``combo`` es ``None`` si no es una combinación válida.
+    """
+    for i, linea in enumerate(fuente, 1):
+        texto = linea.strip()
+        if texto.startswith(("{", "[")):
+            try:
+                obj = json.loads(texto)
+            except ValueError:
+                obj = None
+            if isinstance(obj, dict):
+                obj = obj.get("combo", obj.get("numeros"))
+            if isinstance(obj, list):
+                nums = [int(x) for x in obj if isinstance(x, int) or str(x).isdigit()]
+            else:
+                nums = parse_numbers(str(obj or ""))
+        else:
+            primero = parse_numbers(texto.split(",")[0])
+            nums = primero if len(primero) >= COMBINATION_SIZE else parse_numbers(texto)
+        if not nums:
+            continue
+        nums = sorted(nums)
+        valido = len(nums) == COMBINATION_SIZE and len(set(nums)) == COMBINATION_SIZE \
+            and nums[0] >= 1 and nums[-1] <= TOTAL_NUMBERS
+        yield i, (nums if valido else None), texto
+
+def _filas_puntuadas(combos: np.ndarray, probs, dm: Optional[DrawMatrix], detalle: bool = False) -> List[Dict]:
+    """Score ML (y aciertos históricos 3..6 si se da ``dm``) de un bloque (N × 6)."""
+    comp = _componentes_ml(combos, probs) if detalle else None
+    scores = score_combos_ml(combos, probs)
+    hist = distribucion_aciertos(combos, dm)['por_ticket'] if dm is not None else None
+    filas = []
+    for j, c in enumerate(combos.tolist()):
+        fila = {"combo": c, "score": round(float(scores[j]), 4)}
+        if comp is not None:
+            fila.update({k: round(float(v[j]), 4) for k, v in comp.items()})
+        if hist is not None:
+            fila.update({f"aciertos_{k}": int(hist[j, k]) for k in range(3, COMBINATION_SIZE + 1)})
+        filas.append(fila)
+    return filas
+
+def cmd_analyze(args, dm: DrawMatrix) -> Iterator[Dict]:
+    stats = _analisis(dm)
+    if args.completo:
+        yield stats
+        return
+    frec = stats['frecuencias']
+    gaps = analisis_gaps(dm)['por_numero']
+    pg, pr, pb = _probabilidades(dm)
+    hot, cold = set(frec['hot_15']), set(frec['cold_15'])
+    for n in range(1, TOTAL_NUMBERS + 1):
+        g = gaps[n]
+        yield {"numero": n, "freq_abs": frec['freq_abs'].get(n, 0),
+               "freq_rel": round(frec['freq_rel'].get(n, 0.0), 6),
+               "hot": n in hot, "cold": n in cold,
+               "en_racha_ult10": n in frec['en_racha_ult10'], "dormido_mas20": n in frec['dormidos_mas20'],
+               "gap_actual": g['gap_actual'], "gap_medio": g['gap_medio'], "gap_max": g['gap_max'],
+               "p_global": round(pg[n]["p"], 6), "p_reciente": round(pr[n]["p"], 6), "p_blend": round(pb[n], 6)}
+
+def cmd_generate(args, dm: DrawMatrix) -> Iterator[Dict]:
+    from backtest import tickets_estrategia
+    rng = np.random.default_rng(args.seed)
+    with warnings.catch_warnings(record=True) as avisos:
+        warnings.simplefilter("always", GeneracionIncompleta)
+        combos = tickets_estrategia(args.strategy, _ESTADO, args.n, rng, _PARAMS_ML)
+    for w in avisos:
+        _avisar(f"aviso: {w.message}")
+    if args.registrar and combos:
+        agregar({"estrategia": args.strategy, "n": args.n, "seed": args.seed, "combos": combos})
+    probs = _log_probs(_probabilidades(dm)[2]) if args.score else None
+    for i in range(0, len(combos), _BLOQUE):
+        bloque = np.sort(np.asarray(combos[i:i + _BLOQUE], dtype=np.int64).reshape(-1, COMBINATION_SIZE), axis=1)
+        if probs is None:
+            yield from ({"combo": c} for c in bloque.tolist())
+        else:
+            yield from _filas_puntuadas(bloque, probs, dm if args.historial else None)
+
+def cmd_recommend(args, dm: DrawMatrix) -> Iterator[Dict]:
+    posts_global, posts_recent, probs_blend = _probabilidades(dm)
+    if args.modo == "exacto":
+        topn = top_combos_ml_exacto(probs_blend, top_n=args.n)
+        etiqueta, extra = "auto_ml_exacto", {}
+    elif args.modo == "heuristico":
+        # Top-N exacto sólo entre las combinaciones que pasan las heurísticas
+        # (suma y paridad): filtro vectorial sobre la tabla de todo el espacio.
+        from espacio import CombinationTable
+        tabla = CombinationTable.open()
+        topn = mejores_combos_ml(tabla.combos[tabla.mascara_heuristica()], probs_blend, top_n=args.n)
+        etiqueta, extra = "auto_ml_heuristico", {}
+    else:
+        from orquestador import generar_pool
+        stats = _analisis(dm)
+        res = generar_pool(stats['frecuencias'], WindowIndex.from_draws(dm).ultimos(50), stats['coocurrencias'],
+                           posts_recent, objetivo=max(10000, args.n * 1000), seed=args.seed, presupuesto_s=10.0)
+        if res['omitidas']:
+            _avisar(f"aviso: fuera de presupuesto: {', '.join(res['omitidas'])}")
+        topn = rankear_combos_ml(res['pool'], probs_blend, top_n=args.n)
+        etiqueta, extra = "auto_ml", {"seed": str(res['seed'])}
+    if args.registrar and topn:
+        agregar({"estrategia": etiqueta, "n": args.n, **extra,
+                 "ranked": [{"combo": c, "score": float(s)} for (c, s) in topn]})
+    for i, (combo, score) in enumerate(topn, 1):
+        yield {"rank": i, **_filas_puntuadas(np.asarray([combo]), probs_blend, None, detalle=True)[0]}
+
+def cmd_score(args, dm: DrawMatrix) -> Iterator[Dict]:
+    probs = _log_probs(_probabilidades(dm)[2])
+    vacia = {"score": None, **({f"aciertos_{k}": None for k in range(3, COMBINATION_SIZE + 1)}
+                               if args.historial else {})}
+    fuente = open(args.file, encoding="utf-8") if args.file and args.file != "-" else sys.stdin
+    try:
+        tickets = _leer_tickets(fuente)
+        while True:
+            bloque = list(islice(tickets, _BLOQUE))
+            if not bloque:
+                break
+            validos = [c for _, c, _ in bloque if c is not None]
+            puntuadas = iter(_filas_puntuadas(np.asarray(validos, dtype=np.int64).reshape(-1, COMBINATION_SIZE),
+                                              probs, dm if args.historial else None))
+            for linea, combo, texto in bloque:
+                if combo is None:
+                    yield {"linea": linea, "valido": False, "combo": parse_numbers(texto), **vacia}
+                else:
+                    yield {"linea": linea, "valido": True, **next(puntuadas)}
+    finally:
+        if fuente is not sys.stdin:
+            fuente.close()
+
+def cmd_refresh(args, dm: Optional[DrawMatrix]) -> Iterator[Dict]:
+    yield _sincronizar()[1]
+
+def cmd_history(args, dm: Optional[DrawMatrix]) -> Iterator[Dict]:
+    if args.resumen:
+        for estrategia, r in sorted(resumen().items()):
+            yield {"estrategia": estrategia, **r}
+        return
+    for r in consultar(args.strategy, args.desde, args.hasta, args.limite):
+        combos = r.get("combos") or [x["combo"] for x in r.get("ranked", [])]
+        yield from ({"fecha": r.get("fecha"), "estrategia": r.get("estrategia"), "combo": c} for c in combos)
+
+def cmd_compact(args, dm: Optional[DrawMatrix]) -> Iterator[Dict]:
+    yield compactar(args.antes_de)
+
+def cmd_report(args, dm: DrawMatrix) -> Iterator[Dict]:
+    from visualizador import html_report
+    html = html_report(_analisis(dm))
+    if args.out == "-":
+        sys.stdout.write(html)
+        return
+    out = Path(args.out)
+    out.write_text(html, encoding="utf-8")
+    yield {"reporte": str(out), "bytes": len(html.encode("utf-8"))}
+
+def _parser() -> argparse.ArgumentParser:
+    from backtest import ESTRATEGIAS
+    p = argparse.ArgumentParser(prog="main.py", description="Tinka en modo batch (sin argumentos: menú interactivo).")
+    comun = argparse.ArgumentParser(add_help=False)
+    comun.add_argument("--format", choices=("jsonl", "csv"), default="jsonl", help="formato de salida en stdout")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    a = sub.add_parser("analyze", parents=[comun], help="una fila por número: frecuencias, gaps y probabilidades")
+    a.add_argument("--completo", action="store_true", help="el dict de analisis_completo en una sola línea JSON")
+
+    g = sub.add_parser("generate", parents=[comun], help="combinaciones de una estrategia")
+    g.add_argument("--strategy", choices=ESTRATEGIAS, default="random_ponderado")
+    g.add_argument("--n", type=int, default=10)
+    g.add_argument("--seed", type=int, default=None)
+    g.add_argument("--score", action="store_true", help="añade el score ML")
+    g.add_argument("--historial", action="store_true", help="con --score: aciertos 3..6 contra el histórico")
+    g.add_argument("--registrar", action="store_true", help=f"guarda la corrida en {COMBOS_DB.name}")
+
+    r = sub.add_parser("recommend", parents=[comun], help="recomendación ML (como la opción 8)")
+    r.add_argument("--n", type=int, default=1)
+    r.add_argument("--modo", choices=("exacto", "heuristico", "pool"), default="exacto")
+    r.add_argument("--seed", type=int, default=None)
+    r.add_argument("--registrar", action="store_true", help=f"guarda la corrida en {COMBOS_DB.name}")
+
+    s = sub.add_parser("score", parents=[comun], help="puntúa tickets (uno por línea) de --file o stdin")
+    s.add_argument("--file", default="-", help="archivo de tickets ('-' = stdin)")
+    s.add_argument("--sin-historial", dest="historial", action="store_false",
+                   help="omite los aciertos 3..6 contra el histórico")
+
+    sub.add_parser("refresh", parents=[comun], help="sincroniza la caché con la BD")
+    h = sub.add_parser("history", parents=[comun], help=f"combinaciones guardadas en {COMBOS_DB.name} (una por fila)")
+    h.add_argument("--strategy", default=None, help="sólo esta estrategia (p. ej. auto_ml)")
+    h.add_argument("--desde", default=None, help="fecha ISO inclusive")
+    h.add_argument("--hasta", default=None, help="fecha ISO exclusiva")
+    h.add_argument("--limite", type=int, default=None, help="sólo los N registros más recientes")
+    h.add_argument("--resumen", action="store_true", help="registros y última fecha por estrategia")
+    c = sub.add_parser("compact", parents=[comun], help=f"compacta {COMBOS_DB.name} (VACUUM)")
+    c.add_argument("--antes-de", dest="antes_de", default=None, help="borra antes los registros previos a esta fecha ISO")
+    rep = sub.add_parser("report", parents=[comun], help="exporta el reporte HTML")
+    rep.add_argument("--out", default=str(DATA_DIR / "reporte.html"), help="ruta del HTML ('-' = stdout)")
+    return p
+
+_COMANDOS = {"analyze": cmd_analyze, "generate": cmd_generate, "recommend": cmd_recommend,
+             "score": cmd_score, "refresh": cmd_refresh, "history": cmd_history,
+             "compact": cmd_compact, "report": cmd_report}
+
+def cli(argv: Optional[List[str]] = None) -> int:
+    """Punto de entrada: menú sin argumentos; si no, el subcomando (código de salida)."""
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        main()
+        return 0
+    args = _parser().parse_args(argv)
+    if getattr(args, "n", 1) <= 0:
+        _avisar("--n debe ser positivo")
+        return 2
+    dm = None if args.cmd in ("refresh", "history", "compact") else _cargar()
+    if dm is not None and len(dm) == 0:
+        _avisar("No hay datos en la base. Ejecuta `python main.py refresh` o tu scraper primero.")
+        return 1
+    try:
+        _emitir(_COMANDOS[args.cmd](args, dm), args.format)
+    except BrokenPipeError:  # p. ej. ``| head``: el lector cerró la salida
+        sys.stdout = open(os.devnull, "w")
+    except Exception as exc:  # BD caída, archivo ilegible...: error legible y código 1
+        _avisar(f"error: {type(exc).__name__}: {exc}")
+        return 1
+    return 0
+
 if __name__ == "__main__":
-    main()
+    sys.exit(cli())
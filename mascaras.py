@@ -0,0 +1,85 @@
+"""Combinaciones como máscaras de bits uint64 y aciertos por AND + popcount."""
+from __future__ import annotations
+from typing import Dict, List
+import numpy as np
+
+from config import COMBINATION_SIZE
+from matriz import Sorteos, as_draw_matrix
+
+# Bit ``n - 1`` ↔ número ``n``: caben los números 1..64 (la Tinka usa 45).
+_BITS = 64
+_UNO = np.uint64(1)
+
+
+def codificar(combos) -> np.ndarray:
+    """Máscara uint64 por fila de ``combos`` (lista de listas o matriz N × k; los 0 se ignoran)."""
+    c = np.asarray(combos, dtype=np.int64)
+    if c.ndim == 1:
+        c = c[None, :]
+    validos = (c >= 1) & (c <= _BITS)
+    bits = np.where(validos, _UNO << np.clip(c - 1, 0, _BITS - 1).astype(np.uint64), np.uint64(0))
+    return np.bitwise_or.reduce(bits, axis=1) if bits.shape[1] else np.zeros(len(c), dtype=np.uint64)
+
+
+def decodificar(mascaras) -> List[List[int]]:
+    """Inverso de ``codificar``: los números de cada máscara, ordenados."""
+    m = np.atleast_1d(np.asarray(mascaras, dtype=np.uint64))
+    bits = ((m[:, None] >> np.arange(_BITS, dtype=np.uint64)) & _UNO).astype(bool)
+    return [(np.flatnonzero(fila) + 1).tolist() for fila in bits]
+
+
+def mascaras_sorteos(df: Sorteos) -> np.ndarray:
+    """Máscara uint64 de cada sorteo del histórico (desde la matriz de incidencia)."""
+    inc = as_draw_matrix(df).incidencia[:, :_BITS]
+    pesos = _UNO << np.arange(inc.shape[1], dtype=np.uint64)
+    return np.bitwise_or.reduce(np.where(inc, pesos, np.uint64(0)), axis=1) if len(inc) else np.zeros(0, np.uint64)
+
+
+def popcount(x: np.ndarray) -> np.ndarray:
+    """Bits encendidos de cada uint64 (``np.bitwise_count`` si existe; si no, SWAR)."""
+    x = np.asarray(x, dtype=np.uint64)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x).astype(np.uint8)
+    x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return ((x * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(np.uint8)
+
+
+def aciertos(tickets: np.ndarray, sorteos: np.ndarray) -> np.ndarray:
+    """Matriz (n_tickets × n_sorteos) de números en común, a partir de máscaras."""
+    return popcount(np.asarray(tickets, dtype=np.uint64)[:, None] & np.asarray(sorteos, dtype=np.uint64)[None, :])
+
+
+def distribucion_aciertos(tickets, df: Sorteos, chunk: int = 2048) -> Dict:
+    """Cuántas veces habría acertado 0..6 cada ticket contra todo el histórico.
+
+    ``tickets`` son combinaciones (N × 6) o ya máscaras uint64. Se procesa
+    por bloques de ``chunk`` tickets para acotar memoria; el conteo por fila
+    sale de un único ``bincount`` (fila * 7 + aciertos).
+    """
+    t = np.asarray(tickets)
+    t = t.astype(np.uint64) if t.ndim == 1 and t.dtype == np.uint64 else codificar(t)
+    h = mascaras_sorteos(df)
+    k = COMBINATION_SIZE + 1
+    por_ticket = np.zeros((len(t), k), dtype=np.int64)
+    for i in range(0, len(t), chunk):
+        a = np.minimum(aciertos(t[i:i + chunk], h), k - 1).astype(np.int64)
+        filas = np.arange(len(a))[:, None] * k
+        por_ticket[i:i + chunk] = np.bincount((filas + a).ravel(), minlength=len(a) * k).reshape(len(a), k)
+    return {'tickets': len(t),
+            'sorteos': len(h),
+            'por_ticket': por_ticket,
+            'total': por_ticket.sum(axis=0).tolist()}
+
+
+def historial_ticket(ticket: List[int], df: Sorteos, minimo: int = 3) -> Dict:
+    """Aciertos de un ticket en cada sorteo: distribución y los sorteos con ``minimo`` o más."""
+    dm = as_draw_matrix(df)
+    a = aciertos(codificar([ticket]), mascaras_sorteos(dm))[0]
+    idx = np.flatnonzero(a >= minimo)
+    idx = idx[np.lexsort((-idx, -a[idx].astype(np.int64)))]
+    return {'distribucion': np.bincount(a, minlength=COMBINATION_SIZE + 1).tolist(),
+            'sorteos': [{'id_sorteo': int(dm.id_sorteo[i]), 'fecha': str(dm.fecha_sorteo[i]),
+                         'numeros': [int(x) for x in dm.numeros[i] if x], 'aciertos': int(a[i])}
+                        for i in idx.tolist()]}
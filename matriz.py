@@ -0,0 +1,116 @@
+"""Representación compacta (matricial) del histórico de sorteos."""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Union
+import hashlib
+import numpy as np
+import pandas as pd
+from config import TOTAL_NUMBERS, COMBINATION_SIZE
+from utils import parse_numbers
+
+
+def numeros_desde_texto(textos) -> np.ndarray:
+    """Matriz uint8 (n × ancho) con cada texto de ``numeros`` parseado y ordenado.
+
+    Las filas con menos números se rellenan con 0 a la izquierda; ``ancho`` es
+    ``COMBINATION_SIZE`` salvo que algún sorteo traiga más números.
+    """
+
+    filas = [sorted(parse_numbers(str(s))) for s in textos]
+    ancho = max([COMBINATION_SIZE] + [len(f) for f in filas])
+    numeros = np.zeros((len(filas), ancho), dtype=np.uint8)
+    for i, f in enumerate(filas):
+        if f:
+            numeros[i, ancho - len(f):] = f
+    return numeros
+
+
+@dataclass
+class DrawMatrix:
+    """Histórico de sorteos ya parseado, listo para análisis vectorizados.
+
+    ``numeros`` es una matriz uint8 (n_sorteos × 6) con cada fila ordenada de
+    menor a mayor (las filas incompletas se rellenan con 0 a la izquierda).
+    ``incidencia`` es booleana (n_sorteos × n_numeros): la columna ``j``
+    indica si el número ``j + 1`` salió en el sorteo. ``n_numeros`` es
+    ``TOTAL_NUMBERS`` salvo que el histórico contenga números mayores.
+    """
+
+    id_sorteo: np.ndarray
+    fecha_sorteo: np.ndarray
+    numeros: np.ndarray
+    incidencia: np.ndarray
+    boliyapa: np.ndarray
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "DrawMatrix":
+        """Convierte el DataFrame de ``db_connector.get_data`` (un único parseo)."""
+
+        return cls.from_arrays(
+            numeros_desde_texto(df['numeros'].tolist()),
+            id_sorteo=df['id_sorteo'].to_numpy() if 'id_sorteo' in df.columns else None,
+            fecha_sorteo=df['fecha_sorteo'].to_numpy() if 'fecha_sorteo' in df.columns else None,
+            boliyapa=df['boliyapa'].to_numpy() if 'boliyapa' in df.columns else None,
+        )
+
+    @classmethod
+    def from_arrays(cls, numeros, id_sorteo=None, fecha_sorteo=None, boliyapa=None) -> "DrawMatrix":
+        numeros = np.sort(np.atleast_2d(np.asarray(numeros, dtype=np.uint8)), axis=1)
+        n = len(numeros)
+        ids = np.arange(1, n + 1, dtype=np.int64) if id_sorteo is None else np.asarray(id_sorteo, dtype=np.int64)
+        if fecha_sorteo is None:
+            fechas = np.full(n, np.datetime64('NaT'), dtype='datetime64[D]')
+        else:
+            fechas = pd.to_datetime(pd.Series(fecha_sorteo)).to_numpy().astype('datetime64[D]')
+        if boliyapa is None:
+            bol = np.zeros(n, dtype=np.int16)
+        else:
+            bol = pd.to_numeric(pd.Series(boliyapa), errors='coerce').fillna(0).to_numpy().astype(np.int16)
+        ancho = max(TOTAL_NUMBERS, int(numeros.max()) if numeros.size else 0)
+        incidencia = np.zeros((n, ancho + 1), dtype=bool)
+        incidencia[np.arange(n)[:, None], numeros] = True
+        return cls(ids, fechas, numeros, incidencia[:, 1:], bol)
+
+    def __len__(self) -> int:
+        return len(self.numeros)
+
+    def huella(self) -> str:
+        """Versión del dataset: ``filas-id_máximo-hash`` del contenido (ids, fechas, números, boliyapa)."""
+
+        h = hashlib.blake2b(digest_size=8)
+        for arr in (self.id_sorteo, self.fecha_sorteo.astype('datetime64[D]').view(np.int64),
+                    self.numeros, self.boliyapa):
+            h.update(np.ascontiguousarray(arr).tobytes())
+        max_id = int(self.id_sorteo.max()) if len(self) else 0
+        return f"{len(self)}-{max_id}-{h.hexdigest()}"
+
+    def __getitem__(self, idx) -> "DrawMatrix":
+        """Sub-histórico por slice, máscara booleana o arreglo de índices."""
+
+        return DrawMatrix(self.id_sorteo[idx], self.fecha_sorteo[idx], self.numeros[idx],
+                          self.incidencia[idx], self.boliyapa[idx])
+
+    @property
+    def n_numeros(self) -> int:
+        return int(self.incidencia.shape[1])
+
+    def tail(self, n: int) -> "DrawMatrix":
+        return self[max(0, len(self) - n):]
+
+    def conteos(self) -> np.ndarray:
+        """Apariciones por número; el índice ``k`` corresponde al número ``k``."""
+
+        cnt = np.bincount(self.numeros.ravel(), minlength=self.n_numeros + 1)
+        cnt[0] = 0  # relleno de filas incompletas
+        return cnt
+
+
+Sorteos = Union[pd.DataFrame, DrawMatrix]
+
+
+def as_draw_matrix(data: Sorteos) -> DrawMatrix:
+    """Acepta indistintamente el DataFrame de la BD o un ``DrawMatrix``."""
+
+    if isinstance(data, DrawMatrix):
+        return data
+    return DrawMatrix.from_frame(data)
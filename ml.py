@@ -1,65 +1,50 @@
 """ML ligero: Beta-Binomial, EWMA y Thompson Sampling."""
 from __future__ import annotations
-from typing import Dict, List, Tuple
-from collections import defaultdict
+from typing import Dict, Optional, Tuple
 import numpy as np
-import pandas as pd
 from config import DATA_DIR
-from utils import parse_numbers, save_json, load_json
+from utils import save_json, load_json
+from matriz import Sorteos, as_draw_matrix
+from generador import unicos_nuevos
 
 PROBS_FILE = DATA_DIR / "probabilidades.json"
 
-def _counts_from_df(df: pd.DataFrame) -> Dict[int, int]:
-    cnt = defaultdict(int)
-    for _, r in df.iterrows():
-        for n in parse_numbers(r['numeros']):
-            cnt[int(n)] += 1
-    return dict(cnt)
+def _counts_from_df(df: Sorteos) -> Dict[int, int]:
+    cnt = as_draw_matrix(df).conteos()
+    return {int(n): int(c) for n, c in enumerate(cnt) if c}
 
-def _counts_ewma(df: pd.DataFrame, halflife_draws: int = 50) -> Dict[int, float]:
-    if len(df) == 0:
+def _counts_ewma(df: Sorteos, halflife_draws: int = 50) -> Dict[int, float]:
+    dm = as_draw_matrix(df)
+    if len(dm) == 0:
         return {i: 0.0 for i in range(1, 46)}
     gamma = 0.5 ** (1.0 / max(1, halflife_draws))
-    w = 1.0
-    cnt = {i: 0.0 for i in range(1, 46)}
-    total_weight = 0.0
-    for _, r in df.iloc[::-1].iterrows():
-        nums = set(parse_numbers(r['numeros']))
-        for i in range(1, 46):
-            if i in nums:
-                cnt[i] += w
-        total_weight += w
-        w *= gamma
-    cnt['__total_weight__'] = total_weight
+    # Peso 1 para el sorteo más reciente, gamma para el anterior, etc.
+    w = np.cumprod(np.r_[1.0, np.full(len(dm) - 1, gamma)])[::-1]
+    acc = w @ dm.incidencia[:, :45]
+    cnt = {i: float(acc[i-1]) for i in range(1, 46)}
+    cnt['__total_weight__'] = float(w.sum())
     return cnt
 
-def beta_binomial_posteriors(df: pd.DataFrame, prior_strength: float = 30.0, p0: float = 6.0/45.0):
-    s = _counts_from_df(df)
-    D = float(len(df))
+def _posteriors(successes: Dict[int, float], total: float, prior_strength: float, p0: float):
     a0 = prior_strength * p0
     b0 = prior_strength * (1.0 - p0)
     posts = {}
     for i in range(1, 46):
-        successes = float(s.get(i, 0))
-        failures = max(0.0, D - successes)
-        alpha = a0 + successes
+        succ = float(successes.get(i, 0.0))
+        failures = max(0.0, total - succ)
+        alpha = a0 + succ
         beta  = b0 + failures
         posts[i] = {"alpha": alpha, "beta": beta, "p": alpha/(alpha+beta)}
     return posts
 
-def beta_binomial_posteriors_ewma(df: pd.DataFrame, halflife_draws: int = 50, prior_strength: float = 15.0, p0: float = 6.0/45.0):
+def beta_binomial_posteriors(df: Sorteos, prior_strength: float = 30.0, p0: float = 6.0/45.0):
+    dm = as_draw_matrix(df)
+    return _posteriors(_counts_from_df(dm), float(len(dm)), prior_strength, p0)
+
+def beta_binomial_posteriors_ewma(df: Sorteos, halflife_draws: int = 50, prior_strength: float = 15.0, p0: float = 6.0/45.0):
     ew = _counts_ewma(df, halflife_draws=halflife_draws)
     total_w = float(ew.get('__total_weight__', 0.0))
-    a0 = prior_strength * p0
-    b0 = prior_strength * (1.0 - p0)
-    posts = {}
-    for i in range(1, 46):
-        successes = float(ew.get(i, 0.0))
-        failures = max(0.0, total_w - successes)
-        alpha = a0 + successes
-        beta  = b0 + failures
-        posts[i] = {"alpha": alpha, "beta": beta, "p": alpha/(alpha+beta)}
-    return posts
+    return _posteriors(ew, total_w, prior_strength, p0)
 
 def blend_probabilities(global_posts, recent_posts, w_recent: float = 0.30):
     w_recent = max(0.0, min(1.0, w_recent))
@@ -77,24 +62,30 @@ def save_probabilities(probs_global, probs_recent, probs_blend):
 def load_probabilities():
     return load_json(PROBS_FILE, default=None)
 
-def thompson_sampling_combination(posts, k: int = 6):
-    draws = []
-    for i in range(1, 46):
-        a = float(posts[i]['alpha']); b = float(posts[i]['beta'])
-        a = max(a, 1e-3); b = max(b, 1e-3)
-        theta = np.random.beta(a, b)
-        draws.append((i, float(theta)))
-    draws.sort(key=lambda x: x[1], reverse=True)
-    return sorted([i for (i, t) in draws[:k]])
+def _beta_params(posts, n: int = 45) -> Tuple[np.ndarray, np.ndarray]:
+    alpha = np.array([max(float(posts[i]['alpha']), 1e-3) for i in range(1, n + 1)])
+    beta = np.array([max(float(posts[i]['beta']), 1e-3) for i in range(1, n + 1)])
+    return alpha, beta
+
+def thompson_sampling_batch(posts, n: int, k: int = 6, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """``n`` combinaciones Thompson de una vez: matriz Beta (n × 45) y top-k por fila."""
+    rng = rng if rng is not None else np.random.default_rng()
+    alpha, beta = _beta_params(posts)
+    theta = rng.beta(alpha, beta, size=(n, len(alpha)))
+    return np.sort(np.argpartition(-theta, k - 1, axis=1)[:, :k] + 1, axis=1)
+
+def thompson_sampling_combination(posts, k: int = 6, rng: Optional[np.random.Generator] = None):
+    return thompson_sampling_batch(posts, 1, k=k, rng=rng)[0].tolist()
 
-def thompson_sampling_pool(posts, n_combos: int = 10, k: int = 6):
-    combos = []
-    seen = set()
-    tries = 0
-    while len(combos) < n_combos and tries < n_combos * 200:
-        c = tuple(thompson_sampling_combination(posts, k=k))
-        if c not in seen:
-            combos.append(list(c))
-            seen.add(c)
-        tries += 1
-    return combos
+def thompson_sampling_pool(posts, n_combos: int = 10, k: int = 6, rng: Optional[np.random.Generator] = None):
+    """Hasta ``n_combos`` combinaciones Thompson distintas, muestreadas por lotes."""
+    rng = rng if rng is not None else np.random.default_rng()
+    partes, seen, tries, total = [], set(), 0, 0
+    while total < n_combos and tries < n_combos * 200:
+        lote = min(n_combos * 200 - tries, max(256, 2 * (n_combos - total)))
+        muestra = thompson_sampling_batch(posts, lote, k=k, rng=rng)
+        nuevos = unicos_nuevos(muestra, seen)[:n_combos - total]
+        partes.append(nuevos)
+        total += len(nuevos)
+        tries += lote
+    return np.vstack(partes).tolist() if partes else []
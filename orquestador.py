@@ -0,0 +1,120 @@
+"""Pool de candidatas para la recomendación ML: estrategias en paralelo y reproducibles."""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+import os
+import time
+import warnings
+import numpy as np
+
+from generador import (
+    GeneracionIncompleta,
+    estrategia_equilibrio_hot_cold,
+    estrategia_temporal_inteligente,
+    estrategia_random_ponderado,
+    estrategia_patrones_detectados,
+    _codificar,
+)
+from ml import thompson_sampling_pool
+
+# Reparto del pool objetivo entre fuentes: las proporciones de la mezcla original
+# del menú (N, N, N/2, 6n y 10n candidatas con N = 12n, sobre 46n).
+REPARTO = {
+    "equilibrio_hot_cold": 12 / 46,
+    "temporal_inteligente": 12 / 46,
+    "random_ponderado": 6 / 46,
+    "patrones_detectados": 6 / 46,
+    "thompson": 10 / 46,
+}
+# Cada fuente se parte en trozos intercalados: reparten núcleos y, si se agota
+# el presupuesto, lo omitido sale por igual de todas las fuentes.
+TROZOS = 4
+
+
+def _ejecutar(nombre: str, entradas: Dict, n: int, semilla: np.random.SeedSequence) -> List[List[int]]:
+    """Una tarea del pool (se ejecuta en un proceso hijo o en línea)."""
+    rng = np.random.default_rng(semilla)
+    frec, last50, cooc = entradas["frecuencias"], entradas["ultimos_50"], entradas["coocurrencias"]
+    with warnings.catch_warnings():  # un pool parcial basta para rankear
+        warnings.simplefilter("ignore", GeneracionIncompleta)
+        if nombre == "equilibrio_hot_cold":
+            return estrategia_equilibrio_hot_cold(frec['freq_abs'], frec['hot_15'], frec['cold_15'], n, rng)
+        if nombre == "temporal_inteligente":
+            return estrategia_temporal_inteligente(last50['freq_abs'], last50['hot_15'], n, rng)
+        if nombre == "random_ponderado":
+            return estrategia_random_ponderado(frec['freq_abs'], n, rng)
+        if nombre == "patrones_detectados":
+            return estrategia_patrones_detectados(cooc['pairs_top20'], cooc['trios_top20'], n, rng)
+        return thompson_sampling_pool(entradas["posts"], n_combos=n, k=6, rng=rng)
+
+
+def _tareas(objetivo: int) -> List[Tuple[str, int]]:
+    cuotas = {nombre: max(5, int(round(objetivo * frac))) for nombre, frac in REPARTO.items()}
+    tareas = []
+    for i in range(TROZOS):
+        for nombre, n in cuotas.items():
+            base, resto = divmod(n, TROZOS)
+            if base + (i < resto):
+                tareas.append((nombre, base + (i < resto)))
+    return tareas
+
+
+def generar_pool(frecuencias: Dict, ultimos_50: Dict, coocurrencias: Dict, posts: Dict,
+                 objetivo: int = 10000, seed: Optional[int] = None,
+                 presupuesto_s: Optional[float] = None, workers: Optional[int] = None) -> Dict:
+    """Pool de candidatas de todas las estrategias + Thompson, listo para ``rankear_combos_ml``.
+
+    Cada tarea recibe su propia semilla hija (``SeedSequence(seed).spawn``), así
+    que el resultado depende sólo de ``seed``: no del número de procesos, del
+    orden en que terminen ni de la máquina. La mezcla recorre las tareas en
+    orden fijo y descarta repetidos conservando la primera aparición.
+    ``presupuesto_s`` limita el tiempo de pared: las tareas que no terminan a
+    tiempo se omiten y se listan en ``omitidas`` (el pool deja de ser
+    reproducible sólo en ese caso). ``workers=1`` ejecuta todo en línea.
+    """
+    t0 = time.perf_counter()
+    ss = np.random.SeedSequence(seed)
+    tareas = _tareas(objetivo)
+    semillas = ss.spawn(len(tareas))
+    entradas = {"frecuencias": frecuencias, "ultimos_50": ultimos_50,
+                "coocurrencias": coocurrencias, "posts": posts}
+    workers = min(len(tareas), os.cpu_count() or 1) if workers is None else max(1, workers)
+
+    resultados: Dict[int, List[List[int]]] = {}
+    if workers > 1:
+        try:
+            ex = ProcessPoolExecutor(max_workers=workers)
+            try:
+                futuros = {ex.submit(_ejecutar, nombre, entradas, n, s): i
+                           for i, ((nombre, n), s) in enumerate(zip(tareas, semillas))}
+                hechos, _ = wait(futuros, timeout=presupuesto_s)
+                for f in hechos:
+                    resultados[futuros[f]] = f.result()
+            finally:
+                # Sin esperar a las que excedieron el presupuesto.
+                ex.shutdown(wait=False, cancel_futures=True)
+        except (OSError, RuntimeError):  # sin multiproceso disponible: en línea
+            resultados.clear()
+            workers = 1
+    if workers == 1:
+        for i, ((nombre, n), s) in enumerate(zip(tareas, semillas)):
+            if presupuesto_s is not None and time.perf_counter() - t0 > presupuesto_s:
+                break
+            resultados[i] = _ejecutar(nombre, entradas, n, s)
+
+    partes = [np.asarray(resultados[i], dtype=np.int64).reshape(-1, 6) for i in sorted(resultados)]
+    pool = np.vstack(partes) if partes else np.zeros((0, 6), dtype=np.int64)
+    _, first = np.unique(_codificar(pool), return_index=True)
+    pool = pool[np.sort(first)]
+
+    por_estrategia: Dict[str, int] = {}
+    for i in sorted(resultados):
+        por_estrategia[tareas[i][0]] = por_estrategia.get(tareas[i][0], 0) + len(resultados[i])
+    return {
+        "pool": pool.tolist(),
+        "seed": ss.entropy,
+        "por_estrategia": por_estrategia,
+        "omitidas": [tareas[i][0] for i in range(len(tareas)) if i not in resultados],
+        "workers": workers,
+        "tiempo_s": time.perf_counter() - t0,
+    }
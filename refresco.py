@@ -0,0 +1,122 @@
+"""Refresco en segundo plano (stale-while-revalidate) del dataset y sus estadísticas."""
+from __future__ import annotations
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, Optional, Tuple
+import threading
+import time
+import pandas as pd
+
+from matriz import DrawMatrix
+
+Carga = Callable[[], Tuple[pd.DataFrame, DrawMatrix]]
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Una versión completa y consistente de los datos; nunca se modifica tras publicarse."""
+    datos: pd.DataFrame
+    draws: DrawMatrix
+    version: str
+    creado: float
+    extras: Dict = field(default_factory=dict)
+
+    def edad_s(self) -> float:
+        return time.time() - self.creado
+
+
+class Refrescador:
+    """Sirve siempre el último snapshot bueno y lo revalida en un hilo aparte.
+
+    ``cargar`` trae ``(DataFrame, DrawMatrix)`` de la fuente (p. ej. la
+    sincronización incremental); ``inicial``, si se da, se usa para el primer
+    snapshot (típicamente la caché local, sin tocar la BD). ``preparar``
+    recibe el snapshot nuevo y devuelve los ``extras`` precalculados
+    (estadísticas, índices...) que se publican junto con él: el cambio de
+    versión es una única asignación, así que ningún lector ve datos de una
+    versión con estadísticas de otra. Si la fuente falla se conserva el
+    snapshot anterior y el error queda en ``estado()``.
+    """
+
+    def __init__(self, cargar: Carga, intervalo_s: float = 1800.0, inicial: Optional[Carga] = None,
+                 preparar: Optional[Callable[[Snapshot], Dict]] = None):
+        self._cargar = cargar
+        self._inicial = inicial or cargar
+        self._preparar = preparar
+        self.intervalo_s = intervalo_s
+        self._snapshot: Optional[Snapshot] = None
+        self._lock = threading.Lock()          # una revalidación a la vez
+        self._despertar = threading.Event()
+        self._parar = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self._estado = {"estado": "sin_datos", "ultimo_intento": None, "ultimo_ok": None,
+                        "ultimo_error": None, "revalidaciones": 0, "cambios": 0}
+
+    def _publicar(self, datos: pd.DataFrame, draws: DrawMatrix) -> bool:
+        version = draws.huella()
+        if self._snapshot is not None and self._snapshot.version == version:
+            return False
+        snap = Snapshot(datos, draws, version, time.time())
+        if self._preparar is not None:
+            snap = replace(snap, extras=self._preparar(snap))
+        self._snapshot = snap
+        return True
+
+    def actual(self) -> Snapshot:
+        """El snapshot vigente, sin esperar a la fuente (salvo la primera vez)."""
+        snap = self._snapshot
+        if snap is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._publicar(*self._inicial())
+                    self._estado.update(estado="ok", ultimo_ok=time.time())
+            snap = self._snapshot
+        return snap
+
+    def revalidar(self) -> bool:
+        """Consulta la fuente y publica un snapshot nuevo si cambió la versión."""
+        with self._lock:
+            self._estado.update(estado="actualizando", ultimo_intento=time.time())
+            try:
+                cambio = self._publicar(*self._cargar())
+            except Exception as exc:  # la fuente puede fallar: se sigue sirviendo lo anterior
+                self._estado.update(estado="error", ultimo_error=f"{type(exc).__name__}: {exc}")
+                return False
+            self._estado["revalidaciones"] += 1
+            self._estado["cambios"] += int(cambio)
+            self._estado.update(estado="ok", ultimo_ok=time.time(), ultimo_error=None)
+            return cambio
+
+    def estado(self) -> Dict:
+        snap = self._snapshot
+        out = dict(self._estado)
+        ok = out["ultimo_ok"]
+        out.update(version=snap.version if snap else None,
+                   edad_s=snap.edad_s() if snap else None,
+                   revisado_hace_s=time.time() - ok if ok else None,
+                   activo=self._hilo is not None and self._hilo.is_alive())
+        return out
+
+    def solicitar(self) -> None:
+        """Pide una revalidación inmediata al hilo (no bloquea)."""
+        self._despertar.set()
+
+    def iniciar(self) -> "Refrescador":
+        if self._hilo is None or not self._hilo.is_alive():
+            self._parar.clear()
+            self._hilo = threading.Thread(target=self._bucle, name="refrescador", daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self) -> None:
+        self._parar.set()
+        self._despertar.set()
+        if self._hilo is not None:
+            self._hilo.join()
+
+    def _bucle(self) -> None:
+        while not self._parar.is_set():
+            self._despertar.wait(self.intervalo_s)
+            self._despertar.clear()
+            if self._parar.is_set():
+                break
+            self.revalidar()
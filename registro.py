@@ -0,0 +1,189 @@
+"""Registro append-only de las combinaciones generadas (SQLite, índice por estrategia y fecha)."""
+from __future__ import annotations
+from contextlib import contextmanager
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+import json
+import sqlite3
+import threading
+
+from config import COMBOS_DB, COMBOS_FILE
+from utils import ensure_dirs, load_json
+
+Fecha = Union[str, date, datetime]
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS combinaciones (
+    id INTEGER PRIMARY KEY,
+    creado TEXT NOT NULL,
+    estrategia TEXT NOT NULL,
+    registro TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_estrategia_creado ON combinaciones (estrategia, creado);
+CREATE INDEX IF NOT EXISTS idx_creado ON combinaciones (creado);
+CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT);
+"""
+
+# Sin disco escribible (p. ej. Spaces de sólo lectura) se usa una base en
+# memoria compartida por todo el proceso, como el almacén virtual de ``utils``.
+_MEMORIA: Optional[sqlite3.Connection] = None
+_LOCK = threading.Lock()
+
+
+def _memoria() -> sqlite3.Connection:
+    global _MEMORIA
+    with _LOCK:
+        if _MEMORIA is None:
+            _MEMORIA = sqlite3.connect(":memory:", check_same_thread=False)
+            _inicializar(_MEMORIA)
+    return _MEMORIA
+
+
+def _abrir(path: Path) -> sqlite3.Connection:
+    conn = None
+    try:
+        ensure_dirs(path)
+        conn = sqlite3.connect(str(path), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        _inicializar(conn)
+    except (OSError, sqlite3.OperationalError):
+        if conn is not None:
+            conn.close()
+        return _memoria()
+    return conn
+
+
+def _inicializar(conn: sqlite3.Connection) -> None:
+    conn.executescript(_ESQUEMA)
+    if conn.execute("SELECT 1 FROM meta WHERE clave = 'migrado_json'").fetchone() is None:
+        _migrar_json(conn)
+
+
+def _migrar_json(conn: sqlite3.Connection) -> None:
+    """Importa una sola vez la lista de ``combinaciones_generadas.json`` (queda intacta)."""
+    previos = load_json(COMBOS_FILE, default=[]) or []
+    p = Path(COMBOS_FILE)
+    creado = datetime.fromtimestamp(p.stat().st_mtime).isoformat(timespec="seconds") if p.exists() else _ahora()
+    conn.execute("BEGIN IMMEDIATE")  # otra sesión pudo migrar mientras tanto
+    try:
+        if conn.execute("SELECT 1 FROM meta WHERE clave = 'migrado_json'").fetchone() is None:
+            conn.executemany("INSERT INTO combinaciones (creado, estrategia, registro) VALUES (?, ?, ?)",
+                             [(r.get("fecha", creado), str(r.get("estrategia", "")),
+                               json.dumps(r, ensure_ascii=False, default=str))
+                              for r in previos if isinstance(r, dict)])
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('migrado_json', ?)", (str(len(previos)),))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _ahora() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+@contextmanager
+def _conexion(path: Path):
+    conn = _abrir(path)
+    if conn is _MEMORIA:
+        with _LOCK:
+            yield conn
+    else:
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+
+def _iso(fecha: Fecha) -> str:
+    return fecha.isoformat() if isinstance(fecha, (date, datetime)) else str(fecha)
+
+
+def agregar(registro: Dict, path: Path = COMBOS_DB) -> int:
+    """Añade un registro (``estrategia``, ``n``, ``combos``/``ranked``…) y devuelve su id.
+
+    Es un único INSERT en su transacción: no depende del tamaño del
+    historial y varias sesiones pueden escribir a la vez sin pisarse.
+    """
+    registro = {"fecha": _ahora(), **registro}
+    fila = (registro["fecha"], str(registro.get("estrategia", "")),
+            json.dumps(registro, ensure_ascii=False, default=str))
+    sql = "INSERT INTO combinaciones (creado, estrategia, registro) VALUES (?, ?, ?)"
+    try:
+        with _conexion(path) as conn, conn:
+            cur = conn.execute(sql, fila)
+    except sqlite3.OperationalError:  # archivo de sólo lectura o bloqueado: como sin disco
+        conn = _memoria()
+        with _LOCK, conn:
+            cur = conn.execute(sql, fila)
+    return int(cur.lastrowid)
+
+
+def consultar(estrategia: Optional[str] = None, desde: Optional[Fecha] = None,
+              hasta: Optional[Fecha] = None, limite: Optional[int] = None,
+              path: Path = COMBOS_DB) -> List[Dict]:
+    """Registros por estrategia y rango de fechas ``[desde, hasta)``, del más antiguo al más nuevo.
+
+    Con ``limite`` devuelve sólo los ``limite`` más recientes (en el mismo orden).
+    """
+    filtros, params = [], []
+    if estrategia is not None:
+        filtros.append("estrategia = ?")
+        params.append(estrategia)
+    if desde is not None:
+        filtros.append("creado >= ?")
+        params.append(_iso(desde))
+    if hasta is not None:
+        filtros.append("creado < ?")
+        params.append(_iso(hasta))
+    sql = "SELECT creado, registro FROM combinaciones"
+    if filtros:
+        sql += " WHERE " + " AND ".join(filtros)
+    orden = "ASC" if limite is None else "DESC"
+    sql += f" ORDER BY creado {orden}, id {orden}"
+    if limite is not None:
+        sql += f" LIMIT {int(limite)}"
+    with _conexion(path) as conn:
+        # Los importados del JSON viejo pueden no traer ``fecha``: vale la del alta.
+        filas = [{"fecha": c, **json.loads(r)} for c, r in conn.execute(sql, params)]
+    return filas if limite is None else filas[::-1]
+
+
+def tickets(estrategia: Optional[str] = None, desde: Optional[Fecha] = None,
+            hasta: Optional[Fecha] = None, path: Path = COMBOS_DB) -> List[List[int]]:
+    """Las combinaciones de los registros de ``consultar`` (de ``combos`` o de ``ranked``).
+
+    Por ejemplo, todo lo que generó ``auto_ml`` este mes::
+
+        tickets("auto_ml", desde=date.today().replace(day=1))
+    """
+    out = []
+    for r in consultar(estrategia, desde, hasta, path=path):
+        out += r.get("combos") or [x["combo"] for x in r.get("ranked", [])]
+    return out
+
+
+def resumen(path: Path = COMBOS_DB) -> Dict[str, Dict]:
+    """Registros y última fecha por estrategia (sólo lee el índice)."""
+    with _conexion(path) as conn:
+        filas = conn.execute("SELECT estrategia, COUNT(*), MAX(creado) FROM combinaciones GROUP BY estrategia")
+        return {e: {"registros": n, "ultimo": u} for e, n, u in filas}
+
+
+def compactar(antes_de: Optional[Fecha] = None, path: Path = COMBOS_DB) -> Dict:
+    """Borra los registros anteriores a ``antes_de`` (si se indica) y reescribe la base.
+
+    Pensado para correr de vez en cuando (no en cada alta): ``VACUUM`` y el
+    checkpoint del WAL son O(tamaño del registro).
+    """
+    with _conexion(path) as conn:
+        borrados = 0
+        if antes_de is not None:
+            with conn:
+                borrados = conn.execute("DELETE FROM combinaciones WHERE creado < ?", (_iso(antes_de),)).rowcount
+        if conn is not _MEMORIA:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
+        quedan = conn.execute("SELECT COUNT(*) FROM combinaciones").fetchone()[0]
+        return {"borrados": borrados, "registros": quedan}
@@ -2,34 +2,45 @@
 from __future__ import annotations
 
 import json
-from typing import List
+import threading
+import warnings
+from typing import Dict, List, Tuple
 
 import pandas as pd
 import streamlit as st
 
 from analizador import (
-    analisis_completo,
-    analisis_frecuencias,
-    analisis_temporal,
+    Coocurrencias,
+    WindowIndex,
+    analisis_gaps,
 )
-from config import COMBOS_FILE
-from db_connector import get_data, refresh_cache
+from agregados import analisis_pushdown
+from config import LAST_N_WINDOWS, REFRESCO_S, SNOWFLAKE_PUSHDOWN
+from db_connector import _snowflake_configs, get_data, get_draws, sync_cache
+from matriz import DrawMatrix
+from estado import AnalysisState, STATE_FILE, load_state
 from generador import (
     estrategia_equilibrio_hot_cold,
     estrategia_frecuencia_pura,
     estrategia_patrones_detectados,
     estrategia_random_ponderado,
     estrategia_temporal_inteligente,
+    GeneracionIncompleta,
+    explicar_score_ml,
     rankear_combos_ml,
+    top_combos_ml_exacto,
 )
 from ml import (
     beta_binomial_posteriors,
     beta_binomial_posteriors_ewma,
     blend_probabilities,
     save_probabilities,
-    thompson_sampling_pool,
 )
-from utils import load_json, parse_numbers, save_json
+from mascaras import historial_ticket
+from orquestador import generar_pool
+from refresco import Refrescador, Snapshot
+from registro import agregar
+from utils import parse_numbers, virtual_store_stats
 from visualizador import html_report, render_ascii_hist
 
 st.set_page_config(
@@ -44,16 +55,119 @@ st.caption(
 )
 
 
-@st.cache_data(ttl=1800)
-def load_dataset() -> pd.DataFrame:
-    """Obtiene los datos desde la fuente configurada."""
-
-    df = get_data(use_cache=True)
+def _con_fechas(df: pd.DataFrame) -> pd.DataFrame:
     if "fecha_sorteo" in df.columns:
         df["fecha_sorteo"] = pd.to_datetime(df["fecha_sorteo"])
     return df
 
 
+def _cargar_local():
+    return _con_fechas(get_data(use_cache=True)), get_draws(use_cache=True)
+
+
+def _cargar_fuente():
+    df = sync_cache()["datos"]
+    return _con_fechas(df.copy()), DrawMatrix.from_frame(df)
+
+
+@st.cache_resource
+def load_refrescador() -> Refrescador:
+    """Snapshot compartido del dataset, revalidado en segundo plano cada ``REFRESCO_S``.
+
+    El primer snapshot sale de la caché local; luego un hilo sincroniza con la
+    BD y publica la versión nueva (con sus estadísticas ya calculadas) de una
+    sola vez. Ninguna sesión espera a la fuente al expirar un TTL.
+    """
+
+    state = load_analysis_state()
+
+    def preparar(snap) -> Dict:
+        with _STATE_LOCK:
+            if not state.cubre(snap.draws):
+                state.sync(snap.draws)
+            return {"stats": state.analisis_completo()}
+
+    return Refrescador(_cargar_fuente, intervalo_s=REFRESCO_S, inicial=_cargar_local,
+                       preparar=preparar).iniciar()
+
+
+@st.cache_resource
+def load_analysis_state() -> AnalysisState:
+    """Estado incremental compartido; sólo absorbe los sorteos nuevos."""
+
+    return load_state(get_draws(use_cache=True))
+
+
+# Cachés compartidas por todas las sesiones y indexadas por la huella del
+# dataset: un clic sólo recalcula si cambió la versión de los datos. El
+# snapshot va como ``_snap`` (Streamlit no lo hashea) y es siempre el de esa
+# misma versión, así que una entrada nunca mezcla datos de dos versiones. Los
+# objetos devueltos son compartidos: se tratan como sólo lectura.
+@st.cache_resource(max_entries=2)
+def load_window_index(version: str, _snap: Snapshot) -> WindowIndex:
+    """Conteos acumulados: cualquier ventana cuesta una resta."""
+
+    return WindowIndex.from_draws(_snap.draws)
+
+
+@st.cache_data(max_entries=2)
+def load_gaps(version: str, _snap: Snapshot) -> Dict:
+    return analisis_gaps(_snap.draws)
+
+
+@st.cache_data(max_entries=2)
+def load_pushdown(version: str) -> Dict:
+    """Agregados calculados en Snowflake (modo ``SNOWFLAKE_PUSHDOWN``); ``version`` es sólo la clave."""
+
+    return analisis_pushdown()
+
+
+_STATE_LOCK = threading.Lock()
+
+
+@st.cache_resource(max_entries=2)
+def load_stats(version: str, _snap: Snapshot) -> Dict:
+    """``analisis_completo`` servido por el estado incremental (o ya precalculado en el snapshot)."""
+
+    if "stats" in _snap.extras:
+        return _snap.extras["stats"]
+    draws = _snap.draws
+    state = load_analysis_state()
+    with _STATE_LOCK:
+        if not state.cubre(draws):
+            state.sync(draws)
+        return state.analisis_completo()
+
+
+@st.cache_resource(max_entries=2)
+def load_posteriors(version: str, _snap: Snapshot) -> Tuple[Dict, Dict, Dict]:
+    """Posteriors global y reciente y su mezcla (también se guardan en disco una vez)."""
+
+    dm = _snap.draws
+    posts_global = beta_binomial_posteriors(dm, prior_strength=30.0, p0=(6.0 / 45.0))
+    posts_recent = beta_binomial_posteriors_ewma(dm, halflife_draws=50, prior_strength=15.0, p0=(6.0 / 45.0))
+    probs_blend = blend_probabilities(posts_global, posts_recent, w_recent=0.30)
+    save_probabilities(posts_global, posts_recent, probs_blend)
+    return posts_global, posts_recent, probs_blend
+
+
+@st.cache_resource(max_entries=2)
+def load_coocurrencias(version: str, _snap: Snapshot) -> Coocurrencias:
+    return Coocurrencias.from_draws(_snap.draws)
+
+
+def current_stats(snap: Snapshot) -> Dict:
+    """``analisis_completo`` del snapshot, calculado una vez por versión.
+
+    Con ``SNOWFLAKE_PUSHDOWN`` activo y Snowflake configurado, los agregados
+    vienen del warehouse y no se recorre el histórico en el cliente.
+    """
+
+    if SNOWFLAKE_PUSHDOWN and _snowflake_configs():
+        return load_pushdown(snap.version)
+    return load_stats(snap.version, snap)
+
+
 def format_combo(combo: List[int]) -> str:
     return " ".join(f"{x:02d}" for x in combo)
 
@@ -83,21 +197,42 @@ option = st.sidebar.radio("Menú principal", MENU_OPTIONS, index=0)
 st.sidebar.divider()
 if st.sidebar.button("Refrescar datos ahora", use_container_width=True):
     with st.spinner("Actualizando cache desde la base de datos..."):
-        df_refresh = refresh_cache()
-    load_dataset.clear()
-    st.session_state["_last_refresh"] = len(df_refresh)
-    st.sidebar.success(f"Cache actualizado ({len(df_refresh)} registros).")
-
+        refrescador = load_refrescador()
+        cambio = refrescador.revalidar()
+    load_window_index.clear()
+    load_gaps.clear()
+    load_pushdown.clear()
+    load_stats.clear()
+    load_posteriors.clear()
+    load_coocurrencias.clear()
+    with _STATE_LOCK:
+        try:
+            load_analysis_state().save(STATE_FILE)
+        except OSError:
+            pass
+    n_registros = len(refrescador.actual().datos)
+    st.session_state["_last_refresh"] = n_registros
+    if refrescador.estado()["estado"] == "error":
+        st.sidebar.error(f"No se pudo actualizar: {refrescador.estado()['ultimo_error']}")
+    else:
+        st.sidebar.success(
+            f"Cache actualizado ({n_registros} registros; {'versión nueva' if cambio else 'sin cambios'})."
+        )
 
-def ensure_dataset() -> pd.DataFrame:
-    df_loaded = load_dataset()
-    if len(df_loaded) == 0:
-        st.error("No hay datos disponibles. Verifica la conexión a Snowflake y la tabla configurada.")
-    return df_loaded
+_estado = load_refrescador().estado()
+if _estado["edad_s"] is not None:
+    st.sidebar.caption(
+        f"Versión de datos de hace {_estado['edad_s'] / 60:.0f} min"
+        f" (revisada hace {(_estado['revisado_hace_s'] or 0) / 60:.0f} min) · estado: {_estado['estado']}"
+        + (" · refresco en segundo plano activo" if _estado["activo"] else "")
+    )
+if _estado["ultimo_error"]:
+    st.sidebar.warning(f"Último refresco falló: {_estado['ultimo_error']}")
 
 
-def render_dashboard(df: pd.DataFrame) -> None:
-    stats = analisis_completo(df)
+def render_dashboard(snap: Snapshot) -> None:
+    df = snap.datos
+    stats = current_stats(snap)
     frec = stats["frecuencias"]
     chi2 = stats["chi_cuadrado"]
     show_data_overview(df)
@@ -126,11 +261,16 @@ def render_dashboard(df: pd.DataFrame) -> None:
     col_c.metric("Chi²", f"{chi2.get('chi2', float('nan')):.2f}" if chi2.get("chi2") else "-")
 
     st.subheader("Detalle temporal (últimas ventanas)")
-    temp = stats["temporal"]
-    tabs = st.tabs([f"Últimos {win}" for win in temp["ventanas"].keys()])
-    for tab, win in zip(tabs, temp["ventanas"].keys()):
+    ventanas = st.multiselect(
+        "Ventanas (sorteos)",
+        sorted(set(LAST_N_WINDOWS) | {10, 20, 30, 300, 500}),
+        default=LAST_N_WINDOWS,
+    )
+    index = load_window_index(snap.version, snap)
+    tabs = st.tabs([f"Últimos {win}" for win in ventanas]) if ventanas else []
+    for tab, win in zip(tabs, ventanas):
         with tab:
-            sub = temp["ventanas"][win]
+            sub = index.ultimos(int(win))
             hot = pd.DataFrame({"Número": sub["hot_15"]})
             cold = pd.DataFrame({"Número": sub["cold_15"]})
             c1, c2 = st.columns(2)
@@ -144,8 +284,8 @@ def render_dashboard(df: pd.DataFrame) -> None:
     c2.write(pd.DataFrame(cooc["trios_top20"]))
 
 
-def render_number_analysis(df: pd.DataFrame) -> None:
-    frec = analisis_frecuencias(df)
+def render_number_analysis(snap: Snapshot) -> None:
+    frec = current_stats(snap)["frecuencias"]
     n = st.number_input("Selecciona número", min_value=1, max_value=45, value=1, step=1)
     fa = frec["freq_abs"].get(int(n), 0)
     fr = frec["freq_rel"].get(int(n), 0.0)
@@ -164,9 +304,40 @@ def render_number_analysis(df: pd.DataFrame) -> None:
         f"El número {int(n):02d} aparece en los HOT: **{in_hot}** · en los COLD: **{in_cold}**"
     )
 
+    gaps = load_gaps(snap.version, snap)
+    g = gaps["por_numero"][int(n)]
+    st.subheader("Gaps entre apariciones")
+    g1, g2, g3, g4 = st.columns(4)
+    g1.metric("Gap medio (sorteos)", f"{g['gap_medio']:.1f}" if g["gap_medio"] is not None else "-")
+    g2.metric("Gap mediano", g["gap_mediano"] if g["gap_mediano"] is not None else "-")
+    g3.metric("Gap máximo", g["gap_max"] if g["gap_max"] is not None else "-")
+    g4.metric("Sorteos sin salir", g["gap_actual"] if g["gap_actual"] is not None else "-")
+    st.caption(
+        f"En días: medio {g['gap_medio_dias'] or '-'} · mediano {g['gap_mediano_dias'] or '-'} · "
+        f"máximo {g['gap_max_dias'] or '-'} · actual {g['gap_actual_dias'] if g['gap_actual_dias'] is not None else '-'}"
+    )
+    hist = gaps["histograma_sorteos"][int(n)]
+    if hist:
+        st.bar_chart(
+            pd.DataFrame({"Gap (sorteos)": list(hist.keys()), "Veces": list(hist.values())}),
+            x="Gap (sorteos)",
+            y="Veces",
+            use_container_width=True,
+        )
+    win = st.slider("Ventana móvil (sorteos)", min_value=5, max_value=200, value=50, step=5)
+    serie = load_window_index(snap.version, snap).serie(win)[:, int(n) - 1]
+    if len(serie) > 1:
+        st.caption(f"Apariciones del {int(n):02d} en cada ventana de {win} sorteos consecutivos")
+        st.line_chart(pd.DataFrame({"Apariciones": serie}), use_container_width=True)
+
+    compa = load_coocurrencias(snap.version, snap).companeros(int(n), k=5)
+    if compa:
+        st.write("Números que más salen junto a él:")
+        st.write(pd.DataFrame(compa, columns=["Número", "Veces juntos"]))
 
-def render_generator(df: pd.DataFrame) -> None:
-    stats = analisis_completo(df)
+
+def render_generator(snap: Snapshot) -> None:
+    stats = current_stats(snap)
     frec = stats["frecuencias"]
     temp = stats["temporal"]
     cooc = stats["coocurrencias"]
@@ -187,35 +358,37 @@ def render_generator(df: pd.DataFrame) -> None:
     combos = []
     etiqueta = ""
     if st.button("Generar combinaciones", type="primary"):
-        if estrategia == "Frecuencia pura":
-            combos = estrategia_frecuencia_pura(frec["freq_abs"], n_combos=cantidad)
-            etiqueta = "frecuencia_pura"
-        elif estrategia == "Equilibrio caliente-frío":
-            combos = estrategia_equilibrio_hot_cold(
-                frec["freq_abs"], frec["hot_15"], frec["cold_15"], n_combos=cantidad
-            )
-            etiqueta = "equilibrio_hot_cold"
-        elif estrategia == "Temporal inteligente (últimos 50)":
-            combos = estrategia_temporal_inteligente(
-                last50["freq_abs"], last50["hot_15"], n_combos=cantidad
-            )
-            etiqueta = "temporal_inteligente_50"
-        elif estrategia == "Patrones detectados":
-            combos = estrategia_patrones_detectados(
-                cooc["pairs_top20"], cooc["trios_top20"], n_combos=cantidad
-            )
-            etiqueta = "patrones_detectados"
-        elif estrategia == "Random ponderado":
-            combos = estrategia_random_ponderado(frec["freq_abs"], n_combos=cantidad)
-            etiqueta = "random_ponderado"
+        with warnings.catch_warnings(record=True) as avisos:
+            warnings.simplefilter("always", GeneracionIncompleta)
+            if estrategia == "Frecuencia pura":
+                combos = estrategia_frecuencia_pura(frec["freq_abs"], n_combos=cantidad)
+                etiqueta = "frecuencia_pura"
+            elif estrategia == "Equilibrio caliente-frío":
+                combos = estrategia_equilibrio_hot_cold(
+                    frec["freq_abs"], frec["hot_15"], frec["cold_15"], n_combos=cantidad
+                )
+                etiqueta = "equilibrio_hot_cold"
+            elif estrategia == "Temporal inteligente (últimos 50)":
+                combos = estrategia_temporal_inteligente(
+                    last50["freq_abs"], last50["hot_15"], n_combos=cantidad
+                )
+                etiqueta = "temporal_inteligente_50"
+            elif estrategia == "Patrones detectados":
+                combos = estrategia_patrones_detectados(
+                    cooc["pairs_top20"], cooc["trios_top20"], n_combos=cantidad
+                )
+                etiqueta = "patrones_detectados"
+            elif estrategia == "Random ponderado":
+                combos = estrategia_random_ponderado(frec["freq_abs"], n_combos=cantidad)
+                etiqueta = "random_ponderado"
+        for aviso in avisos:
+            st.info(str(aviso.message))
 
         if combos:
             st.success(f"Se generaron {len(combos)} combinaciones.")
             df_combos = pd.DataFrame({"#": range(1, len(combos) + 1), "Combinación": [format_combo(c) for c in combos]})
             st.dataframe(df_combos, hide_index=True, use_container_width=True)
-            record = load_json(COMBOS_FILE, default=[])
-            record.append({"estrategia": etiqueta, "n": cantidad, "combos": combos})
-            save_json(COMBOS_FILE, record)
+            agregar({"estrategia": etiqueta, "n": cantidad, "combos": combos})
             st.download_button(
                 "Descargar combinaciones (JSON)",
                 data=json.dumps(combos, ensure_ascii=False, indent=2),
@@ -226,7 +399,7 @@ def render_generator(df: pd.DataFrame) -> None:
             st.warning("No se pudieron generar combinaciones, intenta con otra estrategia o refresca los datos.")
 
 
-def render_compare(df: pd.DataFrame) -> None:
+def render_compare(snap: Snapshot) -> None:
     st.write("Introduce tus números separados por espacios o comas.")
     entrada = st.text_input("Mis números", value="")
     if st.button("Evaluar combinación"):
@@ -234,7 +407,7 @@ def render_compare(df: pd.DataFrame) -> None:
         if len(arr) != 6 or min(arr, default=0) < 1 or max(arr, default=50) > 45 or len(set(arr)) != 6:
             st.error("Debes ingresar exactamente 6 números únicos entre 1 y 45.")
             return
-        stats = analisis_completo(df)
+        stats = current_stats(snap)
         frec = stats["frecuencias"]
         hot = set(frec["hot_15"])
         cold = set(frec["cold_15"])
@@ -253,19 +426,40 @@ def render_compare(df: pd.DataFrame) -> None:
         st.write("En COLD:", in_cold)
         st.info(f"Puntuación heurística (sum freq_abs): {score}")
 
+        hist = historial_ticket(arr, snap.draws, minimo=3)
+        dist = hist["distribucion"]
+        st.subheader(f"Contra los {sum(dist)} sorteos históricos")
+        cols = st.columns(len(dist) - 3)
+        for col, k in zip(cols, range(3, len(dist))):
+            col.metric(f"{k} aciertos", dist[k])
+        if hist["sorteos"]:
+            st.dataframe(
+                pd.DataFrame(
+                    {
+                        "Fecha": [r["fecha"] for r in hist["sorteos"]],
+                        "ID Sorteo": [r["id_sorteo"] for r in hist["sorteos"]],
+                        "Números": [format_combo(r["numeros"]) for r in hist["sorteos"]],
+                        "Aciertos": [r["aciertos"] for r in hist["sorteos"]],
+                    }
+                ),
+                hide_index=True,
+                use_container_width=True,
+            )
 
-def render_best_history(df: pd.DataFrame) -> None:
+
+def render_best_history(snap: Snapshot) -> None:
     rows = []
-    frec = analisis_frecuencias(df)["freq_abs"]
-    for _, r in df.iterrows():
-        arr = sorted(parse_numbers(r["numeros"]))
+    df, dm = snap.datos, snap.draws
+    frec = current_stats(snap)["frecuencias"]["freq_abs"]
+    for fecha, id_sorteo, row in zip(df["fecha_sorteo"], dm.id_sorteo.tolist(), dm.numeros.tolist()):
+        arr = [x for x in row if x]
         s = sum(arr)
         score = sum(frec.get(x, 0) for x in arr)
         penal = abs(135 - s)
         rows.append(
             {
-                "Fecha": r["fecha_sorteo"],
-                "ID Sorteo": int(r["id_sorteo"]),
+                "Fecha": fecha,
+                "ID Sorteo": int(id_sorteo),
                 "Combinación": format_combo(arr),
                 "Suma": s,
                 "Score": score - penal,
@@ -275,8 +469,8 @@ def render_best_history(df: pd.DataFrame) -> None:
     st.write(pd.DataFrame(top))
 
 
-def render_export(df: pd.DataFrame) -> None:
-    stats = analisis_completo(df)
+def render_export(snap: Snapshot) -> None:
+    stats = current_stats(snap)
     html = html_report(stats)
     st.download_button(
         "Descargar reporte HTML",
@@ -292,52 +486,70 @@ def render_export(df: pd.DataFrame) -> None:
     )
 
 
-def render_update(df: pd.DataFrame) -> None:
+def render_update(snap: Snapshot) -> None:
+    df = snap.datos
     st.info(
         "El conjunto de datos se almacena en caché durante 30 minutos. Puedes forzar la recarga utilizando el botón de la barra lateral."
     )
     st.write(f"Registros en cache actual: **{len(df)}**")
     if "_last_refresh" in st.session_state:
         st.write(f"Última recarga manual: {st.session_state['_last_refresh']} filas")
+    almacen = virtual_store_stats()
+    if almacen:
+        with st.expander("Almacén en memoria (disco de sólo lectura)"):
+            st.json(almacen)
 
 
-def render_ml(df: pd.DataFrame) -> None:
+def render_ml(snap: Snapshot) -> None:
     n = st.slider("¿Cuántas recomendaciones ML?", min_value=1, max_value=20, value=3)
+    modo = st.radio(
+        "Modo de búsqueda",
+        ("Exacto (determinista)", "Muestreo (estrategias + Thompson)"),
+        horizontal=True,
+        help="El modo exacto devuelve las mejores combinaciones posibles bajo el score ML.",
+    )
+    exacto = modo.startswith("Exacto")
+    semilla = "" if exacto else st.text_input("Semilla (opcional, para reproducir el resultado)", value="").strip()
     if st.button("Calcular recomendaciones ML", type="primary"):
         with st.spinner("Calculando probabilidades bayesianas..."):
-            posts_global = beta_binomial_posteriors(df, prior_strength=30.0, p0=(6.0 / 45.0))
-            posts_recent = beta_binomial_posteriors_ewma(df, halflife_draws=50, prior_strength=15.0, p0=(6.0 / 45.0))
-            probs_blend = blend_probabilities(posts_global, posts_recent, w_recent=0.30)
-            save_probabilities(posts_global, posts_recent, probs_blend)
-
-            stats = analisis_completo(df)
-            frec = stats["frecuencias"]
-            cooc = stats["coocurrencias"]
-            temp = analisis_temporal(df)
-            last50 = temp["ventanas"].get("50", frec)
-
-            pool = []
-            N = max(10, n * 12)
-            pool += estrategia_equilibrio_hot_cold(
-                frec["freq_abs"], frec["hot_15"], frec["cold_15"], n_combos=N
-            )
-            pool += estrategia_temporal_inteligente(last50["freq_abs"], last50["hot_15"], n_combos=N)
-            pool += estrategia_random_ponderado(frec["freq_abs"], n_combos=max(5, N // 2))
-            pool += estrategia_patrones_detectados(
-                cooc["pairs_top20"], cooc["trios_top20"], n_combos=max(5, n * 6)
-            )
-            pool += thompson_sampling_pool(posts_recent, n_combos=max(10, n * 10), k=6)
-
-            if not pool:
-                st.warning("No se pudieron generar combinaciones candidatas. Refresca los datos e inténtalo nuevamente.")
-                return
-
-            ranked = rankear_combos_ml(pool, probs_blend)[:n]
+            posts_global, posts_recent, probs_blend = load_posteriors(snap.version, snap)
+
+            if exacto:
+                ranked = top_combos_ml_exacto(probs_blend, top_n=n)
+            else:
+                stats = current_stats(snap)
+                frec = stats["frecuencias"]
+                cooc = stats["coocurrencias"]
+                last50 = load_window_index(snap.version, snap).ultimos(50)
+
+                res = generar_pool(
+                    frec, last50, cooc, posts_recent, objetivo=max(10000, n * 1000),
+                    seed=int(semilla) if semilla.isdigit() else None, presupuesto_s=10.0,
+                )
+                pool = res["pool"]
+                st.caption(
+                    f"Pool: {len(pool)} candidatas en {res['tiempo_s']:.2f}s ({res['workers']} procesos). "
+                    f"Semilla: {res['seed']}"
+                )
+                if res["omitidas"]:
+                    st.info(f"Fuera de presupuesto: {', '.join(res['omitidas'])}")
+
+                if not pool:
+                    st.warning("No se pudieron generar combinaciones candidatas. Refresca los datos e inténtalo nuevamente.")
+                    return
+
+                ranked = rankear_combos_ml(pool, probs_blend, top_n=n)
+            explicaciones = [explicar_score_ml(c, probs_blend) for c, _ in ranked]
             df_ranked = pd.DataFrame(
                 {
                     "#": range(1, len(ranked) + 1),
                     "Combinación": [format_combo(c) for c, _ in ranked],
                     "Score": [round(float(s), 2) for _, s in ranked],
+                    "10·Σlog p": [round(e["log_verosimilitud"], 2) for e in explicaciones],
+                    "Pen. suma": [e["pen_suma"] for e in explicaciones],
+                    "Pen. paridad": [e["pen_paridad"] for e in explicaciones],
+                    "Pen. consecutivos": [e["pen_consecutivos"] for e in explicaciones],
+                    "Pen. rangos": [e["pen_rangos"] for e in explicaciones],
                 }
             )
             st.dataframe(df_ranked, use_container_width=True, hide_index=True)
@@ -349,35 +561,21 @@ def render_ml(df: pd.DataFrame) -> None:
             )
 
 
-if option == "Dashboard de estadísticas":
-    data = ensure_dataset()
-    if len(data):
-        render_dashboard(data)
-elif option == "Análisis por número":
-    data = ensure_dataset()
-    if len(data):
-        render_number_analysis(data)
-elif option == "Generar combinaciones":
-    data = ensure_dataset()
-    if len(data):
-        render_generator(data)
-elif option == "Comparar mi combinación":
-    data = ensure_dataset()
-    if len(data):
-        render_compare(data)
-elif option == "Mejores históricas":
-    data = ensure_dataset()
-    if len(data):
-        render_best_history(data)
-elif option == "Exportar análisis":
-    data = ensure_dataset()
-    if len(data):
-        render_export(data)
-elif option == "Actualizar datos":
-    data = ensure_dataset()
-    if len(data):
-        render_update(data)
-elif option == "Recomendación automática (ML)":
-    data = ensure_dataset()
-    if len(data):
-        render_ml(data)
+RENDERS = {
+    "Dashboard de estadísticas": render_dashboard,
+    "Análisis por número": render_number_analysis,
+    "Generar combinaciones": render_generator,
+    "Comparar mi combinación": render_compare,
+    "Mejores históricas": render_best_history,
+    "Exportar análisis": render_export,
+    "Actualizar datos": render_update,
+    "Recomendación automática (ML)": render_ml,
+}
+
+# Un único snapshot por ejecución del script: aunque el hilo publique una
+# versión nueva a mitad de render, esta página se dibuja entera con la misma.
+snapshot = load_refrescador().actual()
+if len(snapshot.datos) == 0:
+    st.error("No hay datos disponibles. Verifica la conexión a Snowflake y la tabla configurada.")
+else:
+    RENDERS[option](snapshot)
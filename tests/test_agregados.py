@@ -0,0 +1,50 @@
+"""Modo pushdown: los agregados SQL reproducen ``analisis_completo`` (SQLite y DuckDB)."""
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from agregados import analisis_pushdown, backend_duckdb, backend_sqlite
+from analizador import analisis_completo
+
+
+def _sorteos(n=120, semilla=7):
+    rng = np.random.default_rng(semilla)
+    numeros = [" ".join(map(str, sorted(rng.choice(45, 6, replace=False) + 1))) for _ in range(n)]
+    numeros[3] = "01,02  x 03 04 05 06"  # separadores mixtos y un token no numérico
+    return pd.DataFrame({"id_sorteo": np.arange(1, n + 1),
+                         "fecha_sorteo": pd.date_range("2021-01-02", periods=n, freq="3D").date,
+                         "numeros": numeros,
+                         "boliyapa": rng.integers(0, 10, n)})
+
+
+def _comparar(backend, df):
+    p = analisis_pushdown(backend)
+    assert p.pop("transferencia")["sorteos"] == len(df)
+    assert p == analisis_completo(df)
+
+
+def test_pushdown_sqlite_igual_a_local():
+    df = _sorteos()
+    conn = sqlite3.connect(":memory:")
+    df.astype({"fecha_sorteo": str}).to_sql("resultados", conn, index=False)
+    _comparar(backend_sqlite(conn), df)
+
+
+def test_pushdown_duckdb_igual_a_local():
+    duckdb = pytest.importorskip("duckdb")
+    df = _sorteos()
+    conn = duckdb.connect()
+    conn.register("origen", df.astype({"fecha_sorteo": "datetime64[ns]"}))
+    conn.execute("CREATE TABLE resultados AS SELECT * FROM origen")
+    _comparar(backend_duckdb(conn), df)
+
+
+def test_pushdown_sqlite_con_fechas_nulas():
+    df = _sorteos()
+    df["fecha_sorteo"] = df["fecha_sorteo"].astype(str)
+    df.loc[:2, "fecha_sorteo"] = None  # SQLite ordena los NULL primero, como el histórico local
+    conn = sqlite3.connect(":memory:")
+    df.to_sql("resultados", conn, index=False)
+    _comparar(backend_sqlite(conn), df)
@@ -0,0 +1,36 @@
+"""Backtest walk-forward: estado incremental exacto y resultado independiente de ``workers``."""
+import numpy as np
+import pandas as pd
+
+from analizador import analisis_completo
+from backtest import ESTRATEGIAS, backtest
+from estado import AnalysisState
+from matriz import DrawMatrix
+
+
+def _draws(n):
+    rng = np.random.default_rng(2)
+    numeros = [" ".join(map(str, sorted(rng.choice(np.arange(1, 46), 6, replace=False)))) for _ in range(n)]
+    return DrawMatrix.from_frame(pd.DataFrame({"id_sorteo": range(1, n + 1),
+                                               "fecha_sorteo": pd.date_range("2024-01-01", periods=n).date,
+                                               "numeros": numeros, "boliyapa": [i % 10 for i in range(n)]}))
+
+
+def test_add_draw_igual_a_recalcular():
+    dm = _draws(90)
+    estado = AnalysisState.from_draws(dm[:40])
+    for t in range(40, 90):
+        if t % 16 == 0:
+            assert estado.analisis_completo() == analisis_completo(dm[:t])
+        estado.add_draw(dm.numeros[t], fecha=dm.fecha_sorteo[t], boliyapa=int(dm.boliyapa[t]),
+                        id_sorteo=int(dm.id_sorteo[t]))
+    assert estado.analisis_completo() == analisis_completo(dm)
+
+
+def test_mismo_resultado_con_uno_o_varios_workers():
+    dm = _draws(130)
+    uno = backtest(dm, n_tickets=3, inicio=100, seed=7, workers=1)
+    varios = backtest(dm, n_tickets=3, inicio=100, seed=7, workers=3)
+    assert np.array_equal(uno["aciertos"], varios["aciertos"])
+    assert uno["estrategias"] == varios["estrategias"] and set(uno["estrategias"]) == set(ESTRATEGIAS)
+    assert uno["aciertos"].shape == (30, len(ESTRATEGIAS), 3)
@@ -0,0 +1,53 @@
+"""Caché binaria: escrituras concurrentes sin archivos a medias y una caché corrupta no rompe el arranque."""
+import threading
+
+import pandas as pd
+
+import db_connector as dbc
+
+
+def _frame(n):
+    return pd.DataFrame({"id_sorteo": range(1, n + 1),
+                         "fecha_sorteo": pd.date_range("2024-01-01", periods=n).date,
+                         "numeros": [" ".join(str((i + k) % 45 + 1) for k in range(0, 12, 2)) for i in range(n)],
+                         "boliyapa": [i % 10 for i in range(n)]})
+
+
+def test_escrituras_concurrentes(tmp_path, monkeypatch):
+    monkeypatch.setattr(dbc, "CACHE_BIN_FILE", tmp_path / "cache.npz")
+    frames = [_frame(200 + 50 * i) for i in range(4)]
+    errores, parar = [], threading.Event()
+
+    def escribir(df):
+        for _ in range(10):
+            dbc._guardar_binario(df)
+
+    def leer():
+        while not parar.is_set():
+            data = dbc._leer_binario()
+            if data is not None and len(data["numeros_u8"]) not in {len(f) for f in frames}:
+                errores.append(len(data["numeros_u8"]))
+
+    lector = threading.Thread(target=leer)
+    lector.start()
+    hilos = [threading.Thread(target=escribir, args=(f,)) for f in frames]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    parar.set()
+    lector.join()
+    assert not errores and dbc._leer_binario() is not None
+    assert [p.name for p in tmp_path.iterdir()] == ["cache.npz"]  # sin temporales
+
+
+def test_cache_corrupta_cae_al_json(tmp_path, monkeypatch):
+    monkeypatch.setattr(dbc, "CACHE_BIN_FILE", tmp_path / "cache.npz")
+    monkeypatch.setattr(dbc, "CACHE_FILE", tmp_path / "cache.json")
+    (tmp_path / "cache.npz").write_bytes(b"PK\x03\x04 truncado")
+    assert dbc._leer_binario() is None and dbc.load_cached_matrix() is None
+    assert dbc.load_cached() is None
+
+    dbc.save_json(tmp_path / "cache.json", [{"id_sorteo": 1, "fecha_sorteo": "2024-01-01",
+                                             "numeros": "1 2 3 4 5 6", "boliyapa": 3}])
+    assert dbc.load_cached()["id_sorteo"].tolist() == [1]
@@ -0,0 +1,76 @@
+"""Lectura por lotes y sincronización incremental contra SQLite (vía SQLAlchemy)."""
+import zlib
+
+import numpy as np
+import pytest
+
+sqlalchemy = pytest.importorskip("sqlalchemy")
+
+import db_connector as dbc
+from matriz import numeros_desde_texto
+
+FILAS = [(i, f"2024-01-{i:02d}", " ".join(str((i + k) % 45 + 1) for k in range(0, 12, 2)), i % 10, 1e6 + i)
+         for i in range(1, 26)]
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(dbc, "CACHE_BIN_FILE", tmp_path / "cache.npz")
+    monkeypatch.setattr(dbc, "CACHE_FILE", tmp_path / "cache.json")
+    monkeypatch.setattr(dbc, "_snowflake_configs", lambda: None)
+    eng = dbc.get_engine(f"sqlite:///{tmp_path / 'tinka.sqlite'}")
+
+    @sqlalchemy.event.listens_for(eng, "connect")
+    def _funciones(conn, _):  # las de MySQL que usa la firma de fila
+        conn.create_function("CRC32", 1, lambda x: zlib.crc32(str(x).encode()))
+        conn.create_function("CONCAT_WS", -1, lambda sep, *a: sep.join("" if v is None else str(v) for v in a))
+
+    with eng.begin() as c:
+        c.exec_driver_sql("CREATE TABLE resultados (id_sorteo INTEGER, fecha_sorteo TEXT, numeros TEXT, "
+                          "boliyapa INTEGER, jackpot REAL, created_at TEXT)")
+    yield eng
+    dbc.dispose_engine()
+
+
+def _insertar(eng, filas):
+    with eng.begin() as c:
+        c.exec_driver_sql("INSERT INTO resultados VALUES (?, ?, ?, ?, ?, NULL)", filas)
+
+
+def test_fetch_por_lotes_parsea_numeros(engine):
+    _insertar(engine, FILAS)
+    df = dbc.fetch_from_mysql(chunksize=4)
+    assert len(df) == len(FILAS)
+    assert df["id_sorteo"].dtype == np.int64
+    esperado = numeros_desde_texto([f[2] for f in FILAS])
+    assert np.array_equal(df.attrs["numeros_u8"], esperado)
+
+
+def test_sync_vacia_completa_e_incremental(engine):
+    r = dbc.sync_cache()
+    assert r["modo"] == "completa" and len(r["datos"]) == 0
+
+    _insertar(engine, FILAS[:10])
+    r = dbc.sync_cache()
+    assert r["modo"] == "completa" and len(r["datos"]) == 10
+    assert dbc.sync_cache()["modo"] == "sin_cambios"
+
+    _insertar(engine, FILAS[10:])
+    r = dbc.sync_cache()
+    assert (r["modo"], r["nuevos"], len(r["datos"])) == ("incremental", 15, 25)
+    assert np.array_equal(dbc.load_cached_matrix().numeros, numeros_desde_texto([f[2] for f in FILAS]))
+
+    with engine.begin() as c:  # edición de un sorteo ya cacheado: recarga completa
+        c.exec_driver_sql("UPDATE resultados SET numeros = '1 2 3 4 5 6' WHERE id_sorteo = 3")
+    r = dbc.sync_cache()
+    assert r["modo"] == "completa"
+    assert r["datos"]["numeros"].iloc[2] == "1 2 3 4 5 6"
+
+
+def test_engine_sqlite_en_memoria():
+    try:
+        eng = dbc.get_engine("sqlite://")  # SingletonThreadPool: sin pool_size/max_overflow
+        with eng.connect() as c:
+            assert c.exec_driver_sql("SELECT 1").scalar() == 1
+    finally:
+        dbc.dispose_engine()
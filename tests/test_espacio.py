@@ -0,0 +1,20 @@
+"""build_table: publicación atómica aunque varios procesos la construyan a la vez."""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from espacio import _meta_valida, build_table, todas_combinaciones
+
+
+def test_build_table_concurrente_y_reemplazo(tmp_path):
+    destino = tmp_path / "tabla"
+    with ThreadPoolExecutor(4) as ex:
+        list(ex.map(lambda _: build_table(destino, n=12, k=6), range(4)))
+    assert _meta_valida(destino, 12, 6)
+    assert np.array_equal(np.load(destino / "combos.npy"), todas_combinaciones(12, 6) + 1)
+    assert [p.name for p in tmp_path.iterdir()] == ["tabla"]  # sin temporales
+
+    (destino / "meta.json").write_text('{"version": 0}', encoding="utf-8")  # otra versión
+    build_table(destino, n=12, k=6)
+    assert _meta_valida(destino, 12, 6)
+    assert [p.name for p in tmp_path.iterdir()] == ["tabla"]
@@ -0,0 +1,62 @@
+"""AnalysisState.sync: cola incremental y reconstrucción si cambia un sorteo ya absorbido."""
+import numpy as np
+import pandas as pd
+
+from analizador import _motor_gaps, _resumen_coocurrencias, analisis_completo
+from estado import AnalysisState
+from matriz import DrawMatrix
+
+
+def _draws(n, editar=None):
+    numeros = [" ".join(str((i * 7 + k) % 45 + 1) for k in range(0, 18, 3)) for i in range(n)]
+    if editar is not None:
+        numeros[editar] = "1 2 3 4 5 6"
+    return DrawMatrix.from_frame(pd.DataFrame({"id_sorteo": range(1, n + 1),
+                                               "fecha_sorteo": pd.date_range("2024-01-01", periods=n).date,
+                                               "numeros": numeros, "boliyapa": [i % 10 for i in range(n)]}))
+
+
+def test_sync_incremental_y_edicion(tmp_path):
+    estado = AnalysisState.from_draws(_draws(20))
+    assert estado.sync(_draws(25)) == 5
+    assert estado.analisis_completo() == analisis_completo(_draws(25))
+
+    editado = _draws(25, editar=3)
+    assert not estado.cubre(editado)
+    assert estado.sync(editado) == 25  # mismo id final, sorteo viejo distinto: desde cero
+    assert estado.analisis_completo() == analisis_completo(editado)
+
+    estado.save(tmp_path / "estado.npz")
+    cargado = AnalysisState.load(tmp_path / "estado.npz")
+    assert cargado.cubre(editado) and cargado.sync(_draws(26, editar=3)) == 1
+
+
+def test_top_coocurrencias_incremental():
+    rng = np.random.default_rng(3)
+    estado = AnalysisState()
+    for t in range(150):
+        estado.add_draw(rng.choice(np.arange(1, 12), 6, replace=False))
+        if t % 7 == 0 or t > 140:  # saltos de varios sorteos y paso a paso
+            assert estado.resumen_coocurrencias() == _resumen_coocurrencias(estado.coocurrencias())
+
+
+def test_gaps_en_dias_ignoran_sorteos_sin_fecha():
+    dm = _draws(40)
+    fechas = dm.fecha_sorteo.copy()
+    fechas[[0, 5, 6, 17, 39]] = np.datetime64("NaT")
+    dm = DrawMatrix.from_arrays(dm.numeros, dm.id_sorteo, fechas, dm.boliyapa)
+    motor = _motor_gaps(dm)
+
+    ok = ~np.isnat(fechas)
+    for x in range(1, 46):
+        d = fechas[ok & dm.incidencia[:, x - 1]].astype(np.int64)
+        esperado = np.diff(d).mean() if len(d) >= 2 else np.nan
+        assert np.isclose(motor['dias']['media'][x - 1], esperado, equal_nan=True)
+        assert motor['dias']['max'][x - 1] == (np.diff(d).max() if len(d) >= 2 else -1)
+        assert np.isclose(motor['media_dias'][x - 1], esperado, equal_nan=True)
+        ultimo = fechas[ok][-1].astype(np.int64)
+        assert motor['actual_dias'][x - 1] == (ultimo - d[-1] if len(d) else -1)
+
+    local = analisis_completo(dm)
+    assert all(v is None or np.isfinite(v) for v in local['temporal']['gaps_prom_dias'].values())
+    assert AnalysisState.from_draws(dm).analisis_completo() == local
@@ -0,0 +1,91 @@
+"""Estrategias clásicas (cantidad exacta, sin repetidos, avisos) y score ML contra fuerza bruta."""
+from itertools import combinations
+import warnings
+
+import numpy as np
+import pytest
+
+import generador
+from generador import (
+    GeneracionIncompleta,
+    _meets_heuristics,
+    estrategia_equilibrio_hot_cold,
+    estrategia_frecuencia_pura,
+    estrategia_patrones_detectados,
+    estrategia_random_ponderado,
+    estrategia_temporal_inteligente,
+    mejores_combos_ml,
+    rankear_combos_ml,
+    score_combo_ml,
+    score_combos_ml,
+    top_combos_ml_exacto,
+)
+from espacio import todas_combinaciones
+
+_FREQ = {k: (k * 37) % 23 + 1 for k in range(1, 46)}
+_HOT, _COLD = list(range(1, 16)), list(range(31, 46))
+_PARES = [{'pair': [a, a + 7], 'freq': 5} for a in range(1, 21)]
+_TRIOS = [{'trio': [a, a + 5, a + 11], 'freq': 3} for a in range(1, 21)]
+
+
+@pytest.mark.parametrize("generar", [
+    lambda n, rng: estrategia_frecuencia_pura(_FREQ, n, rng),
+    lambda n, rng: estrategia_equilibrio_hot_cold(_FREQ, _HOT, _COLD, n, rng),
+    lambda n, rng: estrategia_temporal_inteligente(_FREQ, _HOT, n, rng),
+    lambda n, rng: estrategia_patrones_detectados(_PARES, _TRIOS, n, rng),
+    lambda n, rng: estrategia_random_ponderado(_FREQ, n, rng),
+])
+def test_cantidad_exacta_y_sin_repetidos(generar):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", GeneracionIncompleta)
+        combos = generar(3000, np.random.default_rng(5))
+    assert len(combos) == 3000
+    assert len({tuple(c) for c in combos}) == 3000
+    assert all(c == sorted(c) and len(set(c)) == 6 and _meets_heuristics(c) for c in combos)
+    assert generar(50, np.random.default_rng(9)) == generar(50, np.random.default_rng(9))
+
+
+def test_aviso_si_el_espacio_es_chico():
+    freq = {k: 10 for k in (3, 8, 14, 22, 27, 33, 41)}  # sólo 7 números: C(7, 6) = 7 combinaciones
+    validas = {c for c in combinations(sorted(freq), 6) if _meets_heuristics(list(c))}
+    with pytest.warns(GeneracionIncompleta, match="cumplen las restricciones"):
+        combos = estrategia_frecuencia_pura(freq, 20, np.random.default_rng(0))
+    assert {tuple(c) for c in combos} == validas
+
+
+def test_aviso_si_se_agota_el_presupuesto(monkeypatch):
+    fijas = np.array([[10, 15, 20, 25, 30, 35], [11, 14, 20, 25, 30, 35]])
+    monkeypatch.setattr(generador, "_lote_patrones", lambda p, t, lote, rng: fijas[np.arange(lote) % 2])
+    with pytest.warns(GeneracionIncompleta, match="intentos"):
+        combos = estrategia_patrones_detectados(_PARES, _TRIOS, 5, np.random.default_rng(0))
+    assert sorted(combos) == fijas.tolist()
+
+
+def _posterior(semilla):
+    rng = np.random.default_rng(semilla)
+    return {k: float(p) for k, p in zip(range(1, 46), rng.dirichlet(np.full(45, 2.0)) * 6)}
+
+
+def test_score_vectorizado_y_ranking():
+    probs = _posterior(1)
+    del probs[17]  # ausente: vale eps, como en la versión escalar
+    rng = np.random.default_rng(2)
+    combos = [sorted(rng.choice(np.arange(1, 46), 6, replace=False).tolist()) for _ in range(500)]
+    combos += [[1, 2, 3, 4, 5, 6], [40, 41, 42, 43, 44, 45], [2, 4, 6, 8, 10, 12]]
+    escalar = [score_combo_ml(c, probs) for c in combos]
+    assert np.allclose(score_combos_ml(combos, probs), escalar, rtol=0, atol=1e-9)
+
+    ranking = rankear_combos_ml(combos + combos[:50], probs, top_n=20)  # repetidos: una vez
+    esperado = sorted(range(len(combos)), key=lambda i: -escalar[i])[:20]
+    assert [c for c, _ in ranking] == [combos[i] for i in esperado]
+
+
+@pytest.mark.parametrize("probs", [_posterior(3), {k: 6 / 45 for k in range(1, 46)}])  # plano: muchos empates
+def test_top_exacto_igual_a_fuerza_bruta(probs):
+    todas = todas_combinaciones(45, 6) + 1
+    bruto = mejores_combos_ml(todas, probs, top_n=15)
+    exacto = top_combos_ml_exacto(probs, top_n=15)
+    assert [c for c, _ in exacto] == [c for c, _ in bruto]
+    assert np.allclose([s for _, s in exacto], [s for _, s in bruto], rtol=0, atol=1e-9)
+    previo = [c for c, _ in top_combos_ml_exacto(_posterior(4), top_n=15)]
+    assert top_combos_ml_exacto(probs, top_n=15, candidatas=previo) == exacto  # la semilla no cambia el resultado
@@ -0,0 +1,25 @@
+"""main._sincronizar: el estado en memoria cuenta los sorteos que incorpora."""
+import pandas as pd
+
+import main
+
+
+def _frame(n):
+    return pd.DataFrame({"id_sorteo": range(1, n + 1),
+                         "fecha_sorteo": pd.date_range("2024-01-01", periods=n).date,
+                         "numeros": [" ".join(str((i * 5 + k) % 45 + 1) for k in range(0, 18, 3)) for i in range(n)],
+                         "boliyapa": [i % 10 for i in range(n)]})
+
+
+def test_sincronizar_incorpora_en_memoria(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "STATE_FILE", tmp_path / "estado.npz")
+    monkeypatch.setattr(main, "_ESTADO", None)
+    filas = {"n": 20}
+    monkeypatch.setattr(main, "sync_cache", lambda: {"datos": _frame(filas["n"]), "modo": "incremental",
+                                                      "consultas": 1, "nuevos": 5})
+    _, r = main._sincronizar()
+    assert r["incorporados"] == 20 and (tmp_path / "estado.npz").exists()
+    estado = main._ESTADO
+    filas["n"] = 25
+    _, r = main._sincronizar()
+    assert r["incorporados"] == 5 and main._ESTADO is estado and estado.n_sorteos == 25
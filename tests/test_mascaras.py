@@ -0,0 +1,49 @@
+"""Máscaras de bits: popcount (bitwise_count y SWAR) y aciertos contra el conteo por conjuntos."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import mascaras
+from mascaras import codificar, decodificar, distribucion_aciertos, historial_ticket, popcount
+from matriz import DrawMatrix
+
+_RNG = np.random.default_rng(8)
+_TICKETS = [sorted(_RNG.choice(np.arange(1, 46), 6, replace=False).tolist()) for _ in range(300)]
+_SORTEOS = [sorted(_RNG.choice(np.arange(1, 46), 6, replace=False).tolist()) for _ in range(120)]
+
+
+def _dm():
+    return DrawMatrix.from_frame(pd.DataFrame({"id_sorteo": range(1, len(_SORTEOS) + 1),
+                                               "fecha_sorteo": pd.date_range("2024-01-01", periods=len(_SORTEOS)).date,
+                                               "numeros": [" ".join(map(str, s)) for s in _SORTEOS],
+                                               "boliyapa": 0}))
+
+
+def test_popcount_nativo_swar_y_fuerza_bruta(monkeypatch):
+    x = np.concatenate([_RNG.integers(0, 2**63, 5000, dtype=np.uint64) << np.uint64(1) | np.uint64(1),
+                        np.array([0, 2**64 - 1, 2**63], dtype=np.uint64)])
+    fuerza = [bin(int(v)).count("1") for v in x]
+    nativo = popcount(x) if hasattr(np, "bitwise_count") else None
+    monkeypatch.delattr(np, "bitwise_count", raising=False)
+    swar = popcount(x)
+    assert swar.tolist() == fuerza
+    if nativo is not None:
+        assert np.array_equal(nativo, swar)
+
+
+@pytest.mark.parametrize("swar", [False, True])
+def test_aciertos_contra_conjuntos(monkeypatch, swar):
+    if swar:
+        monkeypatch.delattr(np, "bitwise_count", raising=False)
+    fuerza = np.array([[len(set(t) & set(s)) for s in _SORTEOS] for t in _TICKETS])
+    assert np.array_equal(mascaras.aciertos(codificar(_TICKETS), codificar(_SORTEOS)), fuerza)
+    assert decodificar(codificar(_TICKETS)) == _TICKETS
+
+    dist = distribucion_aciertos(_TICKETS, _dm(), chunk=64)
+    esperado = np.stack([np.bincount(f, minlength=7) for f in fuerza])
+    assert np.array_equal(dist["por_ticket"], esperado) and dist["total"] == esperado.sum(axis=0).tolist()
+
+    h = historial_ticket(_TICKETS[0], _dm(), minimo=2)
+    assert h["distribucion"] == np.bincount(fuerza[0], minlength=7).tolist()
+    assert sorted(s["id_sorteo"] - 1 for s in h["sorteos"]) == np.flatnonzero(fuerza[0] >= 2).tolist()
+    assert all(s["aciertos"] == fuerza[0][s["id_sorteo"] - 1] for s in h["sorteos"])
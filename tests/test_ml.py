@@ -0,0 +1,29 @@
+"""Thompson por lotes: reproducible con ``rng``, sin repetidos y con la cantidad pedida."""
+import numpy as np
+
+from generador import _codificar, unicos_nuevos
+from ml import _posteriors, thompson_sampling_batch, thompson_sampling_pool
+
+_POSTS = _posteriors({k: 10 + (k * 7) % 13 for k in range(1, 46)}, 100.0, 15.0, 6 / 45)
+
+
+def test_batch_reproducible_y_valido():
+    a = thompson_sampling_batch(_POSTS, 1000, rng=np.random.default_rng(3))
+    b = thompson_sampling_batch(_POSTS, 1000, rng=np.random.default_rng(3))
+    assert np.array_equal(a, b) and a.shape == (1000, 6)
+    assert (np.diff(a, axis=1) > 0).all() and a.min() >= 1 and a.max() <= 45
+
+
+def test_pool_cantidad_exacta_sin_repetidos():
+    pool = thompson_sampling_pool(_POSTS, n_combos=20000, rng=np.random.default_rng(5))
+    assert len(pool) == 20000 and len({tuple(c) for c in pool}) == 20000
+    assert pool == thompson_sampling_pool(_POSTS, n_combos=20000, rng=np.random.default_rng(5))
+
+
+def test_unicos_nuevos_descarta_vistos_y_repetidos():
+    muestra = np.array([[1, 2, 3, 4, 5, 6], [2, 3, 4, 5, 6, 7], [1, 2, 3, 4, 5, 6], [3, 4, 5, 6, 7, 8]])
+    vistos = {int(_codificar(muestra[1:2])[0])}
+    nuevos = unicos_nuevos(muestra, vistos)
+    assert nuevos.tolist() == [[1, 2, 3, 4, 5, 6], [3, 4, 5, 6, 7, 8]]  # en orden de aparición
+    assert vistos == set(_codificar(muestra).tolist())
+    assert len(unicos_nuevos(muestra, vistos)) == 0
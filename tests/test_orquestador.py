@@ -0,0 +1,35 @@
+"""generar_pool: mezcla de fuentes fija, reproducible e independiente del número de procesos."""
+import numpy as np
+import pandas as pd
+
+from estado import AnalysisState
+from matriz import DrawMatrix
+from orquestador import REPARTO, _tareas, generar_pool
+
+
+def _entradas():
+    rng = np.random.default_rng(4)
+    numeros = [" ".join(map(str, sorted(rng.choice(np.arange(1, 46), 6, replace=False)))) for _ in range(200)]
+    dm = DrawMatrix.from_frame(pd.DataFrame({"id_sorteo": range(1, 201),
+                                             "fecha_sorteo": pd.date_range("2024-01-01", periods=200).date,
+                                             "numeros": numeros, "boliyapa": 0}))
+    estado = AnalysisState.from_draws(dm)
+    return (estado.frecuencias(), estado.frecuencias(50), estado.resumen_coocurrencias(),
+            estado.posteriors_ewma())
+
+
+def test_reparto_intercalado():
+    tareas = _tareas(4600)
+    cuotas = {}
+    for nombre, n in tareas:
+        cuotas[nombre] = cuotas.get(nombre, 0) + n
+    assert cuotas == {nombre: round(4600 * frac) for nombre, frac in REPARTO.items()}
+    assert {nombre for nombre, _ in tareas[:len(REPARTO)]} == set(REPARTO)  # un trozo de cada una primero
+
+
+def test_mismo_pool_con_uno_o_varios_procesos():
+    entradas = _entradas()
+    uno = generar_pool(*entradas, objetivo=2000, seed=11, workers=1)
+    varios = generar_pool(*entradas, objetivo=2000, seed=11, workers=3)
+    assert uno["pool"] == varios["pool"] and uno["por_estrategia"] == varios["por_estrategia"]
+    assert not uno["omitidas"] and len(uno["pool"]) > 1500
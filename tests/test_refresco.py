@@ -0,0 +1,93 @@
+"""Refrescador: el cambio de snapshot es atómico y un fallo conserva el anterior."""
+import threading
+import time
+
+import pandas as pd
+
+from matriz import DrawMatrix
+from refresco import Refrescador
+
+
+def _fuente(n):
+    df = pd.DataFrame({"id_sorteo": range(1, n + 1),
+                       "fecha_sorteo": pd.date_range("2024-01-01", periods=n).date,
+                       "numeros": [" ".join(str((i + k) % 45 + 1) for k in range(0, 12, 2)) for i in range(n)],
+                       "boliyapa": [i % 10 for i in range(n)]})
+    return df, DrawMatrix.from_frame(df)
+
+
+class FuenteFalsa:
+    def __init__(self):
+        self.n = 10
+        self.falla = False
+
+    def __call__(self):
+        if self.falla:
+            raise ConnectionError("BD caída")
+        return _fuente(self.n)
+
+
+def _preparar(snap):
+    time.sleep(0.01)  # ensancha la ventana en que un lector podría ver un estado a medias
+    return {"filas": len(snap.draws), "ids": int(snap.draws.id_sorteo[-1])}
+
+
+def test_revalidar_publica_version_nueva_de_una_vez():
+    fuente = FuenteFalsa()
+    ref = Refrescador(fuente, intervalo_s=3600, preparar=_preparar)
+    primero = ref.actual()
+    assert primero.extras["filas"] == 10
+
+    vistos, errores, parar = set(), [], threading.Event()
+
+    def lector():
+        while not parar.is_set():
+            snap = ref.actual()
+            if not (snap.extras["filas"] == len(snap.datos) == len(snap.draws)
+                    and snap.version == snap.draws.huella()):
+                errores.append(snap.version)
+            vistos.add(snap.version)
+
+    hilos = [threading.Thread(target=lector) for _ in range(4)]
+    for h in hilos:
+        h.start()
+    for n in range(11, 16):
+        fuente.n = n
+        assert ref.revalidar()
+    assert not ref.revalidar()  # misma versión: no se republica
+    parar.set()
+    for h in hilos:
+        h.join()
+
+    assert not errores
+    assert ref.actual().extras["filas"] == 15
+    assert primero.extras["filas"] == 10  # el snapshot viejo no se modificó
+    est = ref.estado()
+    assert (est["estado"], est["revalidaciones"], est["cambios"]) == ("ok", 6, 5)
+
+
+def test_fallo_de_la_fuente_conserva_el_snapshot():
+    fuente = FuenteFalsa()
+    ref = Refrescador(fuente, intervalo_s=3600, preparar=_preparar)
+    antes = ref.actual()
+    fuente.falla, fuente.n = True, 20
+    assert not ref.revalidar()
+    assert ref.actual() is antes
+    est = ref.estado()
+    assert est["estado"] == "error" and "BD caída" in est["ultimo_error"]
+
+
+def test_hilo_revalida_a_pedido():
+    fuente = FuenteFalsa()
+    ref = Refrescador(fuente, intervalo_s=3600, preparar=_preparar).iniciar()
+    try:
+        ref.actual()
+        fuente.n = 12
+        ref.solicitar()
+        limite = time.time() + 5
+        while ref.actual().extras["filas"] != 12 and time.time() < limite:
+            time.sleep(0.01)
+        assert ref.actual().extras["filas"] == 12
+    finally:
+        ref.detener()
+    assert not ref.estado()["activo"]
@@ -0,0 +1,46 @@
+"""Registro SQLite: alta, consulta, compactación y base en memoria si el archivo no admite escritura."""
+import sqlite3
+
+import registro
+from registro import agregar, compactar, consultar, resumen, tickets
+
+
+def _aislar(monkeypatch, tmp_path):
+    monkeypatch.setattr(registro, "COMBOS_FILE", tmp_path / "no_existe.json")
+    monkeypatch.setattr(registro, "_MEMORIA", None)
+    return tmp_path / "registro.sqlite"
+
+
+def test_agregar_consultar_y_compactar(tmp_path, monkeypatch):
+    db = _aislar(monkeypatch, tmp_path)
+    agregar({"estrategia": "a", "fecha": "2024-01-01T10:00:00", "combos": [[1, 2, 3, 4, 5, 6]]}, path=db)
+    agregar({"estrategia": "b", "fecha": "2024-02-01T10:00:00",
+             "ranked": [{"combo": [7, 8, 9, 10, 11, 12], "score": -1.0}]}, path=db)
+    agregar({"estrategia": "a", "fecha": "2024-03-01T10:00:00", "combos": [[2, 3, 4, 5, 6, 7]]}, path=db)
+
+    assert [r["fecha"][:7] for r in consultar(path=db)] == ["2024-01", "2024-02", "2024-03"]
+    assert [r["fecha"][:7] for r in consultar("a", path=db)] == ["2024-01", "2024-03"]
+    assert [r["fecha"][:7] for r in consultar(desde="2024-02-01", hasta="2024-03-01", path=db)] == ["2024-02"]
+    assert [r["fecha"][:7] for r in consultar(limite=2, path=db)] == ["2024-02", "2024-03"]
+    assert tickets(path=db) == [[1, 2, 3, 4, 5, 6], [7, 8, 9, 10, 11, 12], [2, 3, 4, 5, 6, 7]]
+    assert resumen(path=db) == {"a": {"registros": 2, "ultimo": "2024-03-01T10:00:00"},
+                                "b": {"registros": 1, "ultimo": "2024-02-01T10:00:00"}}
+
+    assert compactar("2024-02-15", path=db) == {"borrados": 2, "registros": 1}
+    assert tickets(path=db) == [[2, 3, 4, 5, 6, 7]]
+
+
+def test_archivo_de_solo_lectura_usa_memoria(tmp_path, monkeypatch):
+    db = _aislar(monkeypatch, tmp_path)
+    agregar({"estrategia": "a", "combos": [[1, 2, 3, 4, 5, 6]]}, path=db)
+    conectar = sqlite3.connect
+
+    def solo_lectura(destino, *args, **kwargs):
+        if destino == str(db):
+            return conectar(f"file:{db}?mode=ro", *args, uri=True, **kwargs)
+        return conectar(destino, *args, **kwargs)
+
+    monkeypatch.setattr(registro.sqlite3, "connect", solo_lectura)
+    agregar({"estrategia": "b", "combos": [[7, 8, 9, 10, 11, 12]]}, path=db)  # no lanza
+    assert [r["estrategia"] for r in consultar(path=db)] == ["a"]  # el archivo sigue intacto
+    assert [r[0] for r in registro._MEMORIA.execute("SELECT estrategia FROM combinaciones")] == ["b"]
@@ -0,0 +1,56 @@
+"""VirtualStore: LRU en memoria, volcado a un directorio propio y presupuesto de disco."""
+import gc
+import random
+
+import utils
+from utils import VirtualStore
+
+
+def _valor(semilla):
+    rnd = random.Random(semilla)
+    return "".join(rnd.choice("0123456789abcdef") for _ in range(2000))  # ~1 KB comprimido
+
+
+def test_lru_volcado_y_recarga(tmp_path):
+    vs = VirtualStore(max_bytes=2500, max_spill_bytes=10_000, spill_dir=tmp_path)
+    for k in "abc":
+        vs[k] = _valor(k)
+    st = vs.stats()
+    assert (st["entradas_memoria"], st["entradas_disco"], st["spills"]) == (2, 1, 1)
+    assert st["bytes_memoria"] <= 2500
+    vs.get("b")  # "c" pasa a ser el menos usado en memoria
+    vs["d"] = _valor("d")
+    assert "c" in vs and vs.stats()["entradas_disco"] == 2
+    assert vs["a"] == _valor("a")  # recarga desde disco y vuelve a memoria
+    assert vs.stats()["hits"] == 2 and vs.get("zz") is None and vs.stats()["misses"] == 1
+    assert vs.spill_dir.parent == tmp_path and vs.spill_dir.name.startswith("tinka_virtual_")
+
+
+def test_presupuesto_de_disco_y_limpieza(tmp_path):
+    vs = VirtualStore(max_bytes=1200, max_spill_bytes=2500, spill_dir=tmp_path)
+    for k in range(6):
+        vs[str(k)] = _valor(k)
+    st = vs.stats()
+    assert st["bytes_disco"] <= 2500 and st["entradas_disco"] == 2
+    assert st["descartes"] == 3  # los más viejos salen del disco
+    assert len(list(vs.spill_dir.iterdir())) == st["entradas_disco"]
+    assert vs.get("0") is None and vs["5"] == _valor(5)
+
+    otro = VirtualStore(max_bytes=1200, max_spill_bytes=2500, spill_dir=tmp_path)
+    otro["0"], otro["1"] = "x" * 10, _valor(1)
+    otro["2"] = _valor(2)
+    assert otro.spill_dir != vs.spill_dir  # mismas claves, sin pisarse
+    directorio = vs.spill_dir
+    del vs
+    gc.collect()
+    assert not directorio.exists() and otro.spill_dir.exists()
+
+
+def test_virtual_store_stats(monkeypatch, tmp_path):
+    monkeypatch.setattr(utils, "_VIRTUAL", None)
+    assert utils.virtual_store_stats() is None
+    vs = VirtualStore(spill_dir=tmp_path)
+    vs["k"] = {"a": 1}
+    monkeypatch.setattr(utils, "_VIRTUAL", vs)
+    st = utils.virtual_store_stats()
+    assert st["entradas_memoria"] == 1 and st["max_bytes"] == vs.max_bytes
@@ -1,28 +1,178 @@
 """Funciones auxiliares y utilidades comunes."""
 from __future__ import annotations
 
+from collections import OrderedDict
 from math import sqrt
 from pathlib import Path
 from typing import Dict, List, Optional
+import hashlib
 import json
 import os
+import shutil
+import tempfile
+import threading
+import weakref
+import zlib
 
-try:  # Importación opcional para la app Streamlit dentro de Snowflake.
-    import streamlit as st
-except Exception:  # pragma: no cover
-    st = None
+from config import VIRTUAL_STORE_MAX_BYTES, VIRTUAL_STORE_MAX_SPILL_BYTES
+
+_ST = False  # sin resolver todavía
+
+
+def _streamlit():
+    """``streamlit`` importado bajo demanda (``None`` si no está instalado)."""
+
+    global _ST
+    if _ST is False:
+        try:  # Importación opcional para la app Streamlit dentro de Snowflake.
+            import streamlit as st
+        except Exception:  # pragma: no cover
+            st = None
+        _ST = st
+    return _ST
 
 
 def ensure_dirs(path: Path) -> None:
     Path(path).parent.mkdir(parents=True, exist_ok=True)
 
 
-def _virtual_store() -> Optional[Dict[str, object]]:
-    """Almacén en memoria cuando no es posible escribir en disco."""
+class VirtualStore:
+    """Almacén acotado para los "archivos" que no se pudieron escribir en disco.
+
+    Los valores se guardan serializados (JSON + zlib) en un LRU con
+    presupuesto de ``max_bytes``; al excederlo, los menos usados se vuelcan a
+    un directorio propio de la instancia (``mkdtemp`` dentro de ``spill_dir``,
+    con su propio presupuesto; se borra al liberarla o al salir) y vuelven a
+    memoria al leerse.
+    Lo que no cabe en ningún lado se descarta. Es único por proceso: guarda
+    lo mismo que se habría escrito en ``data/``, así que compartirlo entre
+    sesiones equivale a compartir el disco.
+    """
+
+    def __init__(self, max_bytes: int = VIRTUAL_STORE_MAX_BYTES,
+                 max_spill_bytes: int = VIRTUAL_STORE_MAX_SPILL_BYTES, spill_dir: Optional[Path] = None):
+        self.max_bytes = max_bytes
+        self.max_spill_bytes = max_spill_bytes
+        self.spill_base = Path(spill_dir) if spill_dir else None
+        self.spill_dir: Optional[Path] = None  # se crea con el primer volcado
+        self._mem: "OrderedDict[str, bytes]" = OrderedDict()
+        self._disco: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._bytes_disco = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "spills": 0, "descartes": 0}
+
+    def _directorio(self) -> Path:
+        if self.spill_dir is None:
+            if self.spill_base is not None:
+                self.spill_base.mkdir(parents=True, exist_ok=True)
+            self.spill_dir = Path(tempfile.mkdtemp(prefix="tinka_virtual_", dir=self.spill_base))
+            weakref.finalize(self, shutil.rmtree, self.spill_dir, ignore_errors=True)
+        return self.spill_dir
+
+    def _ruta(self, key: str) -> Path:
+        return self._directorio() / (hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json.z")
+
+    def _quitar(self, key: str) -> None:
+        blob = self._mem.pop(key, None)
+        if blob is not None:
+            self._bytes -= len(blob)
+        size = self._disco.pop(key, None)
+        if size is not None:
+            self._bytes_disco -= size
+            self._ruta(key).unlink(missing_ok=True)
+
+    def _volcar(self, key: str, blob: bytes) -> None:
+        self._stats["evictions"] += 1
+        if len(blob) > self.max_spill_bytes:
+            self._stats["descartes"] += 1
+            return
+        while self._disco and self._bytes_disco + len(blob) > self.max_spill_bytes:
+            viejo, size = self._disco.popitem(last=False)
+            self._bytes_disco -= size
+            self._ruta(viejo).unlink(missing_ok=True)
+            self._stats["descartes"] += 1
+        try:
+            self._ruta(key).write_bytes(blob)
+        except OSError:
+            self._stats["descartes"] += 1
+            return
+        self._disco[key] = len(blob)
+        self._bytes_disco += len(blob)
+        self._stats["spills"] += 1
+
+    def _ajustar(self) -> None:
+        while self._mem and self._bytes > self.max_bytes:
+            key, blob = self._mem.popitem(last=False)
+            self._bytes -= len(blob)
+            self._volcar(key, blob)
 
-    if st is None:
+    def __setitem__(self, key: str, value) -> None:
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+        with self._lock:
+            self._quitar(key)
+            self._mem[key] = blob
+            self._bytes += len(blob)
+            self._ajustar()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._mem or key in self._disco
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            blob = self._mem.get(key)
+            if blob is not None:
+                self._mem.move_to_end(key)
+            elif key in self._disco:
+                try:
+                    blob = self._ruta(key).read_bytes()
+                except OSError:
+                    blob = None
+                self._quitar(key)
+                if blob is not None:  # vuelve a memoria (si no cabe, se vuelca de nuevo)
+                    self._mem[key] = blob
+                    self._bytes += len(blob)
+                    self._ajustar()
+            self._stats["hits" if blob is not None else "misses"] += 1
+        return default if blob is None else json.loads(zlib.decompress(blob).decode("utf-8"))
+
+    def __getitem__(self, key: str):
+        marca = object()
+        value = self.get(key, marca)
+        if value is marca:
+            raise KeyError(key)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        """Aciertos, fallos, desalojos, volcados y bytes retenidos en memoria y en disco."""
+        with self._lock:
+            return {**self._stats,
+                    "entradas_memoria": len(self._mem),
+                    "entradas_disco": len(self._disco),
+                    "bytes_memoria": self._bytes,
+                    "bytes_disco": self._bytes_disco,
+                    "max_bytes": self.max_bytes}
+
+
+_VIRTUAL: Optional[VirtualStore] = None
+_VIRTUAL_LOCK = threading.Lock()
+
+
+def _virtual_store() -> Optional[VirtualStore]:
+    """Almacén acotado, compartido por el proceso, cuando no es posible escribir en disco."""
+
+    global _VIRTUAL
+    if _streamlit() is None:
         return None
-    return st.session_state.setdefault("_virtual_files", {})
+    if _VIRTUAL is None:
+        with _VIRTUAL_LOCK:
+            if _VIRTUAL is None:
+                _VIRTUAL = VirtualStore()
+    return _VIRTUAL
+
+
+def virtual_store_stats() -> Optional[Dict[str, int]]:
+    return _VIRTUAL.stats() if _VIRTUAL is not None else None
 
 def parse_numbers(s: str) -> List[int]:
     nums = []
@@ -75,6 +225,6 @@ def load_json(path: Path, default=None):
             return default
 
     store = _virtual_store()
-    if store is not None and str(path) in store:
-        return store[str(path)]
+    if store is not None:
+        return store.get(str(path), default)
     return default
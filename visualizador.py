@@ -3,7 +3,6 @@ from __future__ import annotations
 from typing import Dict
 import base64
 from io import BytesIO
-import matplotlib.pyplot as plt
 from utils import ascii_bar
 
 def render_ascii_hist(freq_abs: Dict[int,int]) -> str:
@@ -14,6 +13,7 @@ def render_ascii_hist(freq_abs: Dict[int,int]) -> str:
     return "\n".join(lines)
 
 def plot_freq_png(freq_abs: Dict[int,int]) -> bytes:
+    import matplotlib.pyplot as plt  # pesado: sólo al exportar el reporte
     xs = list(sorted(freq_abs.keys()))
     ys = [freq_abs[k] for k in xs]
     fig, ax = plt.subplots(figsize=(10,4))